@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, BackgroundTasks, Body
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.models.schemas import ScrapyTriggerRequest, ScrapyTriggerResponse, ErrorResponse,SuccessResponse
 from app.models.data_model import TaskType
 from app.services.crawler_trigger import CrawlerTriggerService
@@ -18,7 +18,7 @@ router = APIRouter()
     })
 async def trigger_scraping(
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     request: ScrapyTriggerRequest = Body(..., description="爬虫任务参数")
 ):
     """触发网站爬虫任务"""
@@ -30,7 +30,7 @@ async def trigger_scraping(
         logger.info(f"已创建爬虫任务，ID: {task_id}")      
         # 添加后台任务执行爬虫
         background_tasks.add_task(
-            crawler_service.execute_task,
+            CrawlerTriggerService.execute_in_new_session,
             task_id=task_id
         )
         
@@ -57,7 +57,7 @@ async def trigger_scraping(
     })
 async def parse_html(
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     request: HtmlParseRequest = Body(..., description="HTML解析任务参数")
 ):
     """解析HTML片段获取信息"""
@@ -75,7 +75,7 @@ async def parse_html(
         )
 
         logger.info(f"已创建HTML解析任务，ID: {task_id}")
-        background_tasks.add_task(crawler_service.execute_task, task_id=task_id)
+        background_tasks.add_task(CrawlerTriggerService.execute_in_new_session, task_id=task_id)
 
         return SuccessResponse(
             data=ScrapyTriggerResponse(
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, BackgroundTasks, Body
 import time
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.models.schemas import SyncTriggerResponse, ScrapyTriggerResponse, ErrorResponse,SuccessResponse, SyncTriggerRequest
 from app.services.sync_trigger import SyncTriggerService
 from app.core.logger import logger
@@ -17,7 +17,7 @@ router = APIRouter()
 
 async def trigger_sync(
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     request: SyncTriggerRequest = Body(..., description="CRM同步数据")
     
 ):
@@ -33,7 +33,7 @@ async def trigger_sync(
         
         # 添加后台任务执行同步
         background_tasks.add_task(
-            sync_service.execute_task,
+            SyncTriggerService.execute_in_new_session,
             task_id=task_id
         )   
     
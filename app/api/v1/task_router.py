@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.models.data_model import Task, TaskStatus
-from app.models.schemas import TaskResponse,SuccessResponse,ErrorResponse
+from app.models.schemas import TaskResponse,SuccessResponse,ErrorResponse,ScrapyTriggerResponse
+from app.services.crawler_trigger import CrawlerTriggerService
 from app.core.logger import logger
+import time
 
 # 配置日志
 router = APIRouter(prefix="/tasks")
@@ -13,7 +15,7 @@ router = APIRouter(prefix="/tasks")
 #     status: TaskStatus = None,
 #     page: int = 1,
 #     page_size: int = 20,
-#     db: Session = Depends(get_db)
+#     db: AsyncSession = Depends(get_async_db)
 # ):
 #     """获取任务列表，支持按状态筛选和分页"""
 #     query = db.query(Task)
@@ -54,10 +56,10 @@ router = APIRouter(prefix="/tasks")
 
 async def get_task_detail(
     task_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取任务详细信息"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     
     if not task:
         logger.error(f"任务ID {task_id} 不存在")
@@ -77,5 +79,40 @@ async def get_task_detail(
             scraped_company_count=task.scraped_company_count or 0,
             scraped_lawyer_count=task.scraped_lawyer_count or 0,
             # 错误信息存储在单独字段
-            error_message=task.error_message
+            error_message=task.error_message,
+            result_info=task.result_info
         ))
+
+
+@router.post("/{task_id}/resume",
+    responses={
+        200: {"model": SuccessResponse[ScrapyTriggerResponse]},
+        400: {"model": ErrorResponse}
+    })
+async def resume_task(
+    task_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """从断点续爬未完成的爬虫任务，只处理未完成及失败的条目"""
+    crawler_service = CrawlerTriggerService(db_session=db)
+    try:
+        task = await crawler_service.resume_task(task_id)
+        background_tasks.add_task(
+            CrawlerTriggerService.execute_in_new_session,
+            task_id=task_id
+        )
+        return SuccessResponse(
+            data=ScrapyTriggerResponse(
+                task_id=task.id,
+                trigger_time=int(time.time()),
+                scrapy_id=task.scrapy_id,
+                scrapy_url=task.scrapy_url
+            )
+        )
+    except Exception as e:
+        logger.error(f"续爬任务失败(task_id={task_id}): {str(e)}")
+        return ErrorResponse(
+            code=400,
+            msg=str(f"续爬任务失败(task_id={task_id}): {str(e)}")
+        ), 400
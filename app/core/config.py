@@ -4,13 +4,15 @@ from pydantic import  SecretStr
 from dotenv import load_dotenv
 import json
 import os
-from typing import ClassVar, Dict
+from typing import ClassVar, Dict, Optional
 
 load_dotenv()
 class Settings(BaseSettings):
     PROJECT_NAME: str = "API Triggered Crawler"
     VERSION: str = "1.0.0"
     DATABASE_URL: str 
+    # 异步引擎URL，默认由DATABASE_URL推导（postgresql -> postgresql+asyncpg）
+    ASYNC_DATABASE_URL: Optional[str] = None
     DB_SCHEMA: str 
     OPENAI_API_KEY: SecretStr
     OPENAI_MODEL: str = "gpt-3.5-turbo"
@@ -33,6 +35,36 @@ class Settings(BaseSettings):
     CRM_LAWYER_FIELD_MAPPING: Dict[str, str] = {}
     # 法律事务所配置
     LAWSOCIETY_BASE_URL: str
+    # 爬虫限速配置，按scrapy_id配置，如{"crawler_lawscot": {"rate": 5, "max_in_flight": 10}}
+    CRAWLER_RATE_LIMITS: Dict[str, Dict[str, float]] = {}
+    # 共享HTTP连接池配置
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_POOL_LIMIT_PER_HOST: int = 10
+    HTTP_KEEPALIVE_TIMEOUT: float = 30
+    HTTP_DNS_CACHE_TTL: int = 300
+    # 爬虫HTTP磁盘缓存配置
+    CRAWLER_CACHE_ENABLED: bool = False
+    CRAWLER_CACHE_DIR: str = "./cache/http"
+    CRAWLER_CACHE_TTL: int = 3600  # 秒，过期后发送条件请求重新验证
+    CRAWLER_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    CRAWLER_CACHE_MAX_AGE: int = 7 * 24 * 3600  # 秒，超过该时间未使用的缓存条目被清理
+    # HTML解析进程数，0表示在事件循环线程内直接解析
+    CRAWLER_PARSE_WORKERS: int = 0
+    # 邮编经纬度缓存（SQLite文件）及进程内LRU条数
+    GEOCODE_CACHE_PATH: str = "./cache/geocode.sqlite3"
+    GEOCODE_CACHE_LRU_SIZE: int = 10000
+    # HTTP录制/回放：live（正常请求）、record（请求并录制响应）、replay（只从录制目录回放，不访问网络）
+    CRAWLER_HTTP_MODE: str = "live"
+    CRAWLER_REPLAY_DIR: str = "./fixtures/http"
+    # URL前缀改写，如{"https://": "http://127.0.0.1:8900/"}把请求指向本地fixture服务器
+    CRAWLER_HTTP_REWRITE: Dict[str, str] = {}
+    # 爬取结果写入方式：row逐条查询写入，bulk按批次集合查询并批量写入，copy经COPY载入临时表后合并（仅PostgreSQL），
+    # auto在公司数达到STORAGE_COPY_THRESHOLD时用copy、否则用bulk；bulk模式每批公司数
+    STORAGE_MODE: str = "row"
+    STORAGE_BULK_BATCH_SIZE: int = 500
+    STORAGE_COPY_THRESHOLD: int = 5000
+    # IN_PROGRESS任务超过该秒数未保存断点（update_date未刷新）视为执行进程已退出，允许续爬
+    TASK_STALE_SECONDS: int = 1800
     # CRM source 枚举
     CRAWLER_LAWSOCNI_ID: str
     CRAWLER_LAWSCOT_ID: str
@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base,sessionmaker
 from .config import settings
 
-# 创建数据库引擎
+# 创建数据库引擎（同步，供脚本及建表使用）
 
 engine = create_engine(
     settings.DATABASE_URL,
@@ -14,13 +16,61 @@ engine = create_engine(
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def async_database_url(url: str) -> URL:
+    """由同步数据库URL推导异步驱动URL：PostgreSQL使用asyncpg，SQLite使用aiosqlite"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == 'postgresql':
+        return url.set(drivername='postgresql+asyncpg')
+    if backend == 'sqlite':
+        return url.set(drivername='sqlite+aiosqlite')
+    return url
+
+
+def enable_sqlite_savepoints(engine) -> None:
+    """
+    pysqlite/aiosqlite自行管理事务，释放最外层SAVEPOINT时会直接提交，回滚批次不能撤销已释放的保存点。
+    改为由SQLAlchemy显式发出BEGIN，使入库时每条记录的保存点（begin_nested）在SQLite上同样生效
+    """
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, 'connect')
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sync_engine, 'begin')
+    def _emit_begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+
+# 异步引擎：服务与路由使用，数据库IO不阻塞运行爬虫和API请求的事件循环
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL),
+    pool_size=10,
+    max_overflow=20,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    pool_timeout=30
+)
+if async_engine.dialect.name == 'sqlite':
+    enable_sqlite_savepoints(async_engine)
+# 提交后不使对象过期：异步会话中访问过期属性会触发隐式IO
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # 创建基类模型
 Base = declarative_base()
 
 def get_db():
-    """依赖注入函数，用于获取数据库会话"""
+    """依赖注入函数，用于获取数据库会话（同步）"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """依赖注入函数，用于获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
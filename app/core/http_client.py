@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class HttpClientRegistry:
+    """进程级共享的HTTP客户端注册表
+
+    按站点(host)复用aiohttp会话，开启keep-alive、连接数限制与DNS缓存，
+    所有爬虫实例与任务共用，避免每次请求重复TCP+TLS握手。
+    在FastAPI lifespan中启动和关闭，脚本中首次使用时自动创建，并在asyncio.run结束前自动关闭。
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_guard: Optional[asyncio.Task] = None
+        self._sync_session: Optional[requests.Session] = None
+        self._sync_lock = threading.Lock()
+
+    async def start(self) -> None:
+        """绑定当前事件循环（应用启动时调用）"""
+        self._bind_loop(asyncio.get_running_loop())
+        logger.info(
+            f"HTTP连接池已启动: limit={settings.HTTP_POOL_LIMIT}, "
+            f"limit_per_host={settings.HTTP_POOL_LIMIT_PER_HOST}, dns_ttl={settings.HTTP_DNS_CACHE_TTL}s"
+        )
+
+    async def close(self) -> None:
+        """关闭所有共享会话（应用关闭时调用）"""
+        count = await self._close_sessions()
+        guard, self._loop_guard = self._loop_guard, None
+        if self._loop is asyncio.get_running_loop():
+            # 会话已关闭，结束守护任务；之后再获取会话时重新绑定
+            self._loop = None
+            if guard is not None and not guard.done():
+                guard.cancel()
+                await asyncio.gather(guard, return_exceptions=True)
+        if self._sync_session is not None:
+            self._sync_session.close()
+            self._sync_session = None
+        logger.info(f"HTTP连接池已关闭，共释放 {count} 个站点会话")
+
+    async def _close_sessions(self) -> int:
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        return len(sessions)
+
+    def _bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        if loop is not self._loop:
+            # aiohttp会话绑定事件循环，循环变化时（如脚本多次asyncio.run）旧会话无法复用，关闭后丢弃
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            for session in sessions:
+                self._close_stale_session(session, self._loop)
+            self._loop = loop
+            # asyncio.run在关闭循环前会取消所有未完成的任务，守护任务借此在循环仍可用时关闭其上的会话
+            self._loop_guard = loop.create_task(self._close_when_loop_ends(loop))
+
+    async def _close_when_loop_ends(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            await loop.create_future()
+        except asyncio.CancelledError:
+            if self._loop is loop:
+                await self._close_sessions()
+            raise
+
+    @staticmethod
+    def _close_stale_session(session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """关闭绑定在旧事件循环上、未在循环结束前关闭的会话
+
+        旧循环仍在其他线程运行时提交到该循环关闭；否则已无法调度连接关闭，只能丢弃会话，底层socket在连接对象回收时释放
+        """
+        if session.closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        session.detach()
+        logger.warning("共享HTTP会话所属的事件循环已结束，会话未能正常关闭；请在事件循环结束前调用http_clients.close()")
+
+    def get_session(self, url: str) -> aiohttp.ClientSession:
+        """获取URL所属站点的共享aiohttp会话"""
+        self._bind_loop(asyncio.get_running_loop())
+        host = urlparse(url).netloc.lower()
+        session = self._sessions.get(host)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.HTTP_POOL_LIMIT,
+                limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+                use_dns_cache=True,
+                ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL
+            )
+            # 共享会话不自动保存Cookie，避免不同任务间串用，需要Cookie的爬虫自行设置请求头
+            session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+            self._sessions[host] = session
+            logger.info(f"为站点 {host} 创建共享HTTP会话")
+        return session
+
+    def get_sync_session(self) -> requests.Session:
+        """获取共享的同步requests会话（带重试机制）"""
+        with self._sync_lock:
+            if self._sync_session is None:
+                session = requests.Session()
+                retry_strategy = Retry(
+                    total=5,  # 总重试次数
+                    backoff_factor=1,  # 退避因子（1s, 2s, 4s...）
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET"]
+                )
+                adapter = HTTPAdapter(
+                    max_retries=retry_strategy,
+                    pool_connections=settings.HTTP_POOL_LIMIT,
+                    pool_maxsize=settings.HTTP_POOL_LIMIT_PER_HOST
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sync_session = session
+            return self._sync_session
+
+
+http_clients = HttpClientRegistry()
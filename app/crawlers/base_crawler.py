@@ -1,41 +1,390 @@
 import time
-import random
-from typing import Optional, Dict, Any
+import json
+import asyncio
+import hashlib
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, List, Mapping, AsyncIterator
+import aiohttp
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
+from app.core.config import settings
+from app.core.http_client import http_clients
+from app.crawlers.checkpoint import CrawlCheckpoint
+from app.crawlers.http_cache import http_cache
+from app.crawlers.parse_pool import parse_pool
+from app.crawlers.replay import HttpReplay, has_credentials, redact_url
 from app.core.logger import logger
+from app.crawlers.rate_limiter import HostRateLimiter, rate_limiters
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 import requests.exceptions as requests_exceptions
 
+# 默认请求头
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+# 异步请求重试策略，与同步Session中urllib3 Retry的配置保持一致
+RETRY_TOTAL = 5
+RETRY_BACKOFF_FACTOR = 1
+RETRY_BACKOFF_MAX = 120
+RETRY_STATUS_FORCELIST = [429, 500, 502, 503, 504]
+RETRY_ALLOWED_METHODS = ["GET"]
+RETRY_AFTER_STATUS_CODES = [413, 429, 503]
+
+
+# 流式产出结束标记
+_STREAM_END = object()
+
+
 class BaseCrawler:
+    scrapy_id = None
+    # 子类原生支持边爬取边产出公司数据时置为True（实现_crawl_into_stream）
+    supports_streaming = False
+    # 子类支持增量爬取时置为True（按内容指纹跳过未变化的条目）
+    supports_incremental = False
+    # 子类支持断点续爬时置为True（记录搜索页发现的条目及其完成/失败状态）
+    supports_checkpoint = False
+    # 默认限速：每秒请求数与同一站点的最大在途请求数
+    # 可通过settings.CRAWLER_RATE_LIMITS按scrapy_id或scrapy_params中的rate_limit/max_in_flight覆盖
+    rate_limit = 2.0
+    max_concurrency = 5
+    # 异步请求需要重试的状态码
+    retry_status_forcelist = RETRY_STATUS_FORCELIST
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
         retry=retry_if_exception_type((requests_exceptions.Timeout, requests_exceptions.ConnectionError, requests_exceptions.HTTPError))
     )
-    def __init__(self, scrapy_url: str):
+    def __init__(self, scrapy_url: str, scrapy_params: dict = None):
         # 核心属性初始化
         self.scrapy_url = scrapy_url
+        self.scrapy_params = scrapy_params or {}
         self.logger = logger
-        
-        # 创建带重试机制的Session
-        self.session = requests.Session()
-        retry_strategy = Retry(
-            total=5,  # 总重试次数
-            backoff_factor=1,  # 退避因子（1s, 2s, 4s...）
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["GET"]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("https://", adapter)
-        self.session.mount("http://", adapter)
+        self.rate_limit, self.max_in_flight = self._resolve_rate_limit()
+        # 磁盘缓存开关及命中统计
+        self.use_cache = bool(self.scrapy_params.get('use_cache', settings.CRAWLER_CACHE_ENABLED))
+        self.cache_stats = {'hit': 0, 'revalidated': 0, 'miss': 0, 'bypassed': 0}
+        # HTTP录制/回放：scrapy_params中的http_mode覆盖配置；录制与回放时不经过磁盘缓存，保证每个请求都被录制/回放
+        self.http_replay = HttpReplay.for_crawler(self.scrapy_id, self.scrapy_params.get('http_mode'))
+        if self.http_replay.mode != 'live':
+            self.use_cache = False
+        # 增量爬取：known_fingerprints由任务执行前从数据库加载，内容未变化的条目直接跳过
+        self.incremental = self.supports_incremental and bool(self.scrapy_params.get('incremental', False))
+        self.known_fingerprints: Dict[str, str] = {}
+        self.incremental_stats = {'new': 0, 'changed': 0, 'unchanged': 0}
+        # 爬虫自定义的运行统计（如sweep模式各中心点的查询结果），任务完成时写入result_info['crawl']
+        self.crawl_stats: Dict[str, Any] = {}
+        # 流式模式：crawl_stream逐个产出公司，缓冲队列满时爬取暂停（背压）
+        self.streaming = bool(self.scrapy_params.get('streaming', False))
+        self.stream_buffer_size = int(self.scrapy_params.get('stream_buffer_size', 100))
+        self._stream_queue: Optional[asyncio.Queue] = None
+        # 断点续爬：需通过scrapy_params中的checkpoint=true开启（开启后任务改用流式存储）；续爬时由任务执行前从Task.checkpoint恢复
+        self.checkpoint: Optional[CrawlCheckpoint] = None
+        if self.supports_checkpoint and bool(self.scrapy_params.get('checkpoint', False)):
+            self.checkpoint = CrawlCheckpoint()
+
+        # 使用进程级共享的带重试机制的Session
+        self.session = http_clients.get_sync_session()
 
     async def crawl(self) -> Dict[str, Any]:
         """执行爬取操作，返回原始数据（需子类实现）"""
         raise NotImplementedError("子类必须实现crawl方法")
 
+    async def crawl_stream(self) -> AsyncIterator[Dict[str, Any]]:
+        """以异步生成器逐个产出公司数据（含其律师列表）
+
+        原生支持流式的爬虫在每家公司完成时立即产出，内存中只保留缓冲队列中的数据；
+        其他爬虫退化为执行crawl()后逐个产出
+        """
+        if not self.supports_streaming:
+            result = await self.crawl()
+            for company in result.get('companies', []):
+                yield company
+            return
+
+        queue = asyncio.Queue(maxsize=self.stream_buffer_size)
+        self._stream_queue = queue
+
+        async def produce():
+            try:
+                await self._crawl_into_stream()
+            finally:
+                await queue.put(_STREAM_END)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                company = await queue.get()
+                if company is _STREAM_END:
+                    break
+                yield company
+            # 传递爬取过程中的异常
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+            self._stream_queue = None
+
+    async def _crawl_into_stream(self) -> None:
+        """执行爬取并通过_emit_company产出公司数据（支持流式的子类实现）"""
+        raise NotImplementedError("支持流式的子类必须实现_crawl_into_stream方法")
+
+    async def _emit_company(self, company: Dict[str, Any]) -> None:
+        """流式产出一家公司，缓冲队列已满时等待消费方处理"""
+        await self._stream_queue.put(company)
+
+    @property
+    def is_streaming(self) -> bool:
+        """当前是否处于流式产出过程中"""
+        return self._stream_queue is not None
+
+    @staticmethod
+    def compute_fingerprint(payload: Any) -> str:
+        """计算条目内容的稳定指纹（原始文本按字节，结构化数据按排序后的JSON）"""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        elif not isinstance(payload, bytes):
+            payload = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def _check_fingerprint(self, item_key: str, fingerprint: str) -> bool:
+        """比对条目指纹并计入增量统计，返回True表示增量模式下内容未变化、可跳过"""
+        if not self.incremental:
+            return False
+        known = self.known_fingerprints.get(item_key)
+        if known is None:
+            self.incremental_stats['new'] += 1
+            return False
+        if known != fingerprint:
+            self.incremental_stats['changed'] += 1
+            return False
+        self.incremental_stats['unchanged'] += 1
+        return True
+
+    def _resume_items(self) -> Optional[List[str]]:
+        """断点中搜索页已完整解析时返回需要（重新）处理的条目，否则返回None（从搜索页开始）"""
+        if self.checkpoint is None:
+            return None
+        return self.checkpoint.start_run()
+
+    def _checkpoint_frontier(self, keys: List[str]) -> List[str]:
+        """记录搜索页发现的条目，返回其中需要处理的条目（跳过断点中已完成的条目）"""
+        if self.checkpoint is None:
+            return list(keys)
+        return self.checkpoint.add_frontier(keys)
+
+    def _checkpoint_frontier_complete(self) -> None:
+        """搜索页已完整解析，续爬时不再请求搜索页"""
+        if self.checkpoint is not None:
+            self.checkpoint.complete_frontier()
+
+    def _checkpoint_done(self, key: str) -> None:
+        """条目无需入库即已完成（如内容未变化），入库的条目由存储层在提交后标记"""
+        if self.checkpoint is not None:
+            self.checkpoint.mark_done(key)
+
+    def _checkpoint_failed(self, key: str) -> None:
+        """条目处理失败，续爬时重新抓取"""
+        if self.checkpoint is not None:
+            self.checkpoint.mark_failed(key)
+
+    def _resolve_rate_limit(self) -> tuple[float, int]:
+        """确定限速参数，优先级：scrapy_params > 配置文件(按scrapy_id) > 类默认值"""
+        configured = settings.CRAWLER_RATE_LIMITS.get(self.scrapy_id or '', {})
+        rate = self.scrapy_params.get('rate_limit', configured.get('rate', self.rate_limit))
+        max_in_flight = self.scrapy_params.get('max_in_flight', configured.get('max_in_flight', self.max_concurrency))
+        HostRateLimiter.validate(float(rate), int(max_in_flight))
+        return float(rate), int(max_in_flight)
+
+    def _get_rate_limiter(self, url: str) -> HostRateLimiter:
+        """获取目标站点共享的限速器"""
+        return rate_limiters.get(url, self.rate_limit, self.max_in_flight, owner=self)
+
+    async def close(self) -> None:
+        """任务结束时释放爬虫私有资源（共享连接池由应用生命周期管理）"""
+        rate_limiters.unregister(self)
+        if any(self.cache_stats.values()):
+            self.logger.info(f"{self.scrapy_id} HTTP缓存统计: {self.cache_stats}")
+        if self.http_replay.mode != 'live':
+            self.logger.info(f"{self.scrapy_id} HTTP {self.http_replay.mode}统计: {self.http_replay.stats}")
+
+    def _get_async_session(self, url: str) -> aiohttp.ClientSession:
+        """获取目标站点共享的aiohttp会话"""
+        return http_clients.get_session(url)
+
+    @staticmethod
+    def _retry_backoff(retry_count: int, retry_after: Optional[str] = None) -> float:
+        """计算第retry_count次重试前的等待秒数
+
+        与urllib3 Retry一致：优先使用Retry-After头，否则按
+        backoff_factor * 2^(n-1) 指数退避（首次重试不等待）
+        """
+        if retry_after:
+            try:
+                return max(float(retry_after), 0)
+            except ValueError:
+                try:
+                    return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+                except (TypeError, ValueError):
+                    pass
+        if retry_count <= 1:
+            return 0
+        return min(RETRY_BACKOFF_FACTOR * (2 ** (retry_count - 1)), RETRY_BACKOFF_MAX)
+
+    async def _fetch_async(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        method: str = "GET",
+        data: Any = None,
+        connect_timeout: int = 10,
+        read_timeout: int = 20
+    ) -> str:
+        """异步获取网页内容，可在事件循环中直接await
+
+        重试语义与同步Session一致：连接/超时错误及429/5xx状态码最多重试5次，
+        状态码重试仅针对GET请求；每次请求都经过站点共享限速器。
+        开启磁盘缓存时（scrapy_params中的use_cache或CRAWLER_CACHE_ENABLED）GET请求经过缓存：TTL内直接命中，过期后发送条件请求；
+        携带Cookie/Authorization请求头或URL中含凭据参数的请求不读写缓存，避免登录后的内容被其他任务命中或凭据落盘
+
+        参数:
+            url: 目标网页URL
+            headers: 请求头字典（可选）
+            method: HTTP方法
+            data: 请求体（POST时使用）
+            connect_timeout: 连接超时时间(秒)
+            read_timeout: 读取超时时间(秒)
+
+        返回:
+            网页内容字符串
+
+        异常:
+            aiohttp.ClientError / asyncio.TimeoutError: 重试耗尽后抛出
+        """
+        if headers is None:
+            headers = DEFAULT_HEADERS
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        if method.upper() != "GET" or not self.use_cache:
+            _, _, content = await self._send_with_retry(url, headers, method, data, timeout)
+            return content
+        if has_credentials(headers) or has_credentials(self._get_async_session(url).headers) or redact_url(url) != url:
+            self.cache_stats['bypassed'] += 1
+            _, _, content = await self._send_with_retry(url, headers, method, data, timeout)
+            return content
+
+        entry = await asyncio.to_thread(http_cache.lookup, url)
+        if entry and http_cache.is_fresh(entry):
+            self.cache_stats['hit'] += 1
+            return entry['body']
+
+        request_headers = {**headers, **http_cache.conditional_headers(entry)}
+        status, response_headers, content = await self._send_with_retry(url, request_headers, method, data, timeout)
+        if status == 304 and entry:
+            self.cache_stats['revalidated'] += 1
+            await asyncio.to_thread(http_cache.touch, url, entry)
+            return entry['body']
+
+        self.cache_stats['miss'] += 1
+        await asyncio.to_thread(
+            http_cache.store, url, content,
+            response_headers.get('ETag'), response_headers.get('Last-Modified')
+        )
+        return content
+
+    async def _stream_async(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        chunk_size: int = 64 * 1024,
+        connect_timeout: int = 10,
+        read_timeout: int = 60,
+        method: str = "GET",
+        data: Any = None,
+        idempotent: bool = False
+    ) -> AsyncIterator[bytes]:
+        """以分块方式流式读取响应体，适用于超大页面的边下载边解析
+
+        收到响应体之前按重试策略重试（重试状态码、连接错误及超时），开始读取响应体后出错直接抛出；不经过磁盘缓存。
+        非GET请求与_send_with_retry相同，只在连接阶段失败时重试；只读的POST查询可传idempotent=True按GET处理
+        """
+        if headers is None:
+            headers = DEFAULT_HEADERS
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        session = self._get_async_session(url)
+        retryable_method = idempotent or method.upper() in RETRY_ALLOWED_METHODS
+        retry_count = 0
+
+        while True:
+            started = False
+            try:
+                async with self._get_rate_limiter(url):
+                    async with self.http_replay.request(session, method, url, headers=headers, data=data, timeout=timeout) as response:
+                        status = response.status
+                        retry_after = response.headers.get("Retry-After") if status in RETRY_AFTER_STATUS_CODES else None
+                        if status not in self.retry_status_forcelist or not retryable_method or retry_count >= RETRY_TOTAL:
+                            response.raise_for_status()
+                            async for chunk in response.content.iter_chunked(chunk_size):
+                                started = True
+                                yield chunk
+                            return
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                retryable = not started and (retryable_method or isinstance(e, aiohttp.ClientConnectorError))
+                if not retryable or retry_count >= RETRY_TOTAL:
+                    self.logger.error(f"请求失败: {url}，{str(e) or type(e).__name__}")
+                    raise
+                retry_after = None
+                status = type(e).__name__
+
+            retry_count += 1
+            delay = self._retry_backoff(retry_count, retry_after)
+            self.logger.warning(f"流式请求异常 {status}，{delay:.1f}秒后第{retry_count}次重试: {url}")
+            await asyncio.sleep(delay)
+
+    async def _send_with_retry(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        method: str,
+        data: Any,
+        timeout: aiohttp.ClientTimeout
+    ) -> tuple[int, Mapping[str, str], str]:
+        """发送请求并按重试策略处理失败，返回(状态码, 响应头（大小写不敏感）, 响应内容)"""
+        session = self._get_async_session(url)
+        retry_count = 0
+
+        while True:
+            try:
+                async with self._get_rate_limiter(url):
+                    async with self.http_replay.request(session, method, url, headers=headers, data=data, timeout=timeout) as response:
+                        status = response.status
+                        retry_after = response.headers.get("Retry-After") if status in RETRY_AFTER_STATUS_CODES else None
+                        retryable_status = (status in self.retry_status_forcelist
+                                            and method.upper() in RETRY_ALLOWED_METHODS
+                                            and retry_count < RETRY_TOTAL)
+                        if not retryable_status:
+                            response.raise_for_status()
+                            return status, response.headers.copy(), await response.text()
+
+                # 退避等待放在限速器之外，不占用在途名额
+                retry_count += 1
+                delay = self._retry_backoff(retry_count, retry_after)
+                self.logger.warning(f"状态码 {status}，{delay:.1f}秒后第{retry_count}次重试: {url}")
+                await asyncio.sleep(delay)
+
+            except aiohttp.ClientResponseError as e:
+                self.logger.error(f"HTTP错误: {str(e)}，状态码: {e.status}")
+                raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # 非幂等方法仅在连接阶段失败时重试
+                retryable = method.upper() in RETRY_ALLOWED_METHODS or isinstance(e, aiohttp.ClientConnectorError)
+                if not retryable or retry_count >= RETRY_TOTAL:
+                    self.logger.error(f"请求失败: {url}，{str(e) or type(e).__name__}")
+                    raise
+                retry_count += 1
+                delay = self._retry_backoff(retry_count)
+                self.logger.warning(f"请求异常 {type(e).__name__}，{delay:.1f}秒后第{retry_count}次重试: {url}")
+                await asyncio.sleep(delay)
+
     def _get_page_content(self, url: str, headers: Optional[Dict[str, str]] = None, connect_timeout: int = 10, read_timeout: int = 20) -> str:
         """获取网页内容，带重试和反反爬机制
 
@@ -53,10 +402,10 @@ class BaseCrawler:
         """
         # 设置默认请求头
         if headers is None:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
+            headers = DEFAULT_HEADERS
 
+        # 按站点共享的速率限速，替代原先每个线程内的随机延迟
+        self._get_rate_limiter(url).wait_blocking()
         try:
             # 发送请求（使用合并的超时参数）
             response = self.session.get(
@@ -65,9 +414,6 @@ class BaseCrawler:
                 timeout=(connect_timeout, read_timeout)  # 分别设置连接和读取超时
             )
             response.raise_for_status()  # 触发HTTP错误状态码异常
-
-            # 随机延迟避免反爬（0.5-2秒）
-            time.sleep(random.uniform(0.5, 2.0))
             return response.text
 
         except requests.exceptions.HTTPError as e:
@@ -81,6 +427,10 @@ class BaseCrawler:
         """解析HTML内容"""
         return BeautifulSoup(html_content, "html.parser")
 
+    async def _parse_in_pool(self, parser_id: str, content: str) -> Any:
+        """使用解析进程池解析页面内容（parser_id见parse_pool.PARSERS），返回普通数据"""
+        return await parse_pool.parse(parser_id, content)
+
     def handle_error(self, failure):
         """统一错误处理"""
         request = failure.request
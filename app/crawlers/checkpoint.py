@@ -0,0 +1,86 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from app.core.logger import logger
+
+
+class CrawlCheckpoint:
+    """爬取断点
+
+    记录搜索页发现的全部条目（frontier，如公司ID/详情页URL）、已完成的条目与失败的条目。
+    搜索页完整解析后frontier才视为完整，续爬时可跳过搜索页；否则续爬重新解析搜索页并跳过已完成的条目。
+    条目数据入库提交后（或无需入库，如增量模式下内容未变化）才标记为完成；
+    失败的条目不会被标记为完成，续爬时与未处理的条目一起重新抓取。
+    """
+
+    def __init__(self, frontier: Optional[Iterable[str]] = None, done: Optional[Iterable[str]] = None,
+                 failed: Optional[Iterable[str]] = None, frontier_complete: bool = False):
+        self.frontier: List[str] = []
+        self.frontier_complete = frontier_complete
+        self._frontier_keys = set()
+        self.done = set(done or [])
+        self.failed = set(failed or [])
+        self.add_frontier(frontier or [])
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "CrawlCheckpoint":
+        """从Task.checkpoint中恢复断点"""
+        data = data or {}
+        return cls(data.get('frontier'), data.get('done'), data.get('failed'), bool(data.get('frontier_complete')))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可存入Task.checkpoint的字典（每次返回新对象，保证JSON列的变更被检测到）"""
+        return {
+            'frontier': list(self.frontier),
+            'frontier_complete': self.frontier_complete,
+            'done': sorted(self.done),
+            'failed': sorted(self.failed),
+            'updated_at': int(time.time())
+        }
+
+    def add_frontier(self, keys: Iterable[str]) -> List[str]:
+        """记录新发现的条目（保持发现顺序并去重），返回其中尚未完成、需要处理的条目"""
+        todo = []
+        for key in keys:
+            if key not in self._frontier_keys:
+                self._frontier_keys.add(key)
+                self.frontier.append(key)
+            if key not in self.done:
+                todo.append(key)
+        return todo
+
+    def complete_frontier(self) -> None:
+        """搜索页已完整解析"""
+        self.frontier_complete = True
+
+    def mark_done(self, key: str) -> None:
+        """条目已处理完成；本轮已失败的条目保持失败状态"""
+        if key not in self.failed:
+            self.done.add(key)
+
+    def mark_failed(self, key: str) -> None:
+        self.failed.add(key)
+        self.done.discard(key)
+
+    def pending(self) -> List[str]:
+        """尚未完成的条目（包括失败的条目），按发现顺序返回"""
+        return [key for key in self.frontier if key not in self.done]
+
+    def start_run(self) -> Optional[List[str]]:
+        """开始一轮爬取：清空上一轮的失败记录（失败条目本轮重新处理）；
+        frontier完整时返回需要处理的条目，否则返回None（需要重新解析搜索页）
+        """
+        if self.frontier or self.done:
+            logger.info(f"断点续爬: 共 {len(self.frontier)} 个条目（搜索页{'已' if self.frontier_complete else '未'}完整解析），"
+                        f"已完成 {len(self.done)}，失败 {len(self.failed)}")
+        self.failed.clear()
+        if not self.frontier_complete:
+            return None
+        return self.pending()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'frontier': len(self.frontier),
+            'done': len(self.done),
+            'failed': len(self.failed),
+            'pending': len(self.pending())
+        }
@@ -4,20 +4,45 @@ import time
 import aiohttp
 import random
 import asyncio
+import math
+import ijson
+from contextlib import aclosing
 from urllib.parse import urlencode
-from typing import Optional, Dict, List,Any
+from typing import Optional, Dict, List,Any, Tuple, Set, AsyncIterator
 from app.core.config import settings
 from app.core.logger import logger
 from app.crawlers.base_crawler import BaseCrawler
 from app.services.data_cleaning import DataCleaningService
+from app.services.geocode_cache import geocode_cache
+
+# 英国范围（南纬, 西经, 北纬, 东经），sweep模式bbox参数可直接传"uk"
+UK_BBOX = (49.9, -8.2, 60.9, 1.8)
+# 每纬度约69英里
+MILES_PER_DEGREE = 69.0
+
+
+class _ChunkReader:
+    """把响应体的分块迭代器包装为ijson异步解码所需的read接口"""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b''
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b''
+
 
 class CrawlerAdviserFinder(BaseCrawler):
     source_name = "crawler_adviser_finder" # Immigration Advice Authority 
     scrapy_id = "crawler_adviser_finder"
+    supports_streaming = True
     
     def __init__(self, scrapy_url: str, scrapy_params: dict):
-        super().__init__(scrapy_url)
-        self.session = aiohttp.ClientSession()
+        super().__init__(scrapy_url, scrapy_params)
               
         #获取基础配置 
         self.google_maps_api_key = settings.AF_GOOGLE_MAPS_API_KEY
@@ -26,74 +51,167 @@ class CrawlerAdviserFinder(BaseCrawler):
         self.google_url =settings.AF_GOOGLE_BASE_URL
         # 获取参数，使用默认值如果未提供
         self.advisers: List[Dict[str, Any]] = []
-        self.scrapy_params = scrapy_params or {}
         self.postcode = self.scrapy_params.get('postcode')
         self.distance = self.scrapy_params.get('distance', 50)
         self.fee_charging = self.scrapy_params.get('feeCharging', 'Both')
         self.type_of_advice = self.scrapy_params.get('typeOfAdvice', 'All Levels')
         self.asylum_or_immigration = self.scrapy_params.get('asylumOrImmigration', 'All Categories')
         self.action_id = self.scrapy_params.get('action_id', '131;a')
+        # sweep模式：用网格圆覆盖bbox区域，并发查询后按注册号去重
+        self.bbox = self.scrapy_params.get('bbox')
+        self.sweep_stats = {'centres': 0, 'failed': 0, 'raw': 0, 'unique': 0}
+        if self.bbox:
+            self.crawl_stats['sweep'] = self.sweep_stats
         
         
     async def crawl(self) -> Dict[str, Any]:
-        """执行爬取操作，返回标准化的移民顾问数据"""
-        logger.info(f"开始爬取{self.source_name}数据，postcode:{self.postcode}, 半径: {self.distance}英里")
+        """执行爬取操作，返回标准化的移民顾问数据；查询失败时抛出异常，任务记为失败"""
         try:
-            # 获取经纬度
-            lat, lng = await self._get_lat_lng_from_postcode(self.postcode)
-            if not lat or not lng:
-                logger.error("无法获取经纬度，爬取终止")
-                return {'advisers': []}
-
-            # 发送API请求
-            response_data = await self._fetch_adviser_list(lat, lng)
-            if not response_data or 'actions' not in response_data or len(response_data['actions']) == 0:
-                logger.warning("API响应为空或格式不正确")
-                return {'advisers': []}
-            
-            # 获取API响应
-            advisers = self._parse_adviser_list(response_data)
-            logger.info(f"爬取完成，共找到 {len(advisers)} 条移民顾问数据")
-            return {'companies': advisers}
+            await self._run_crawl()
+        except Exception as e:
+            logger.error(f"爬取过程发生错误: {str(e)}", exc_info=True)
+            raise
+        return {'companies': self.advisers, **self.crawl_stats}
 
+    async def _crawl_into_stream(self) -> None:
+        """流式爬取：顾问条目边解码边产出"""
+        try:
+            await self._run_crawl()
         except Exception as e:
             logger.error(f"爬取过程发生错误: {str(e)}", exc_info=True)
-            return {'advisers': [], 'error': str(e)}
-            
+            raise
+
+    async def _run_crawl(self) -> None:
+        if self.bbox:
+            await self._run_sweep()
+            return
+        logger.info(f"开始爬取{self.source_name}数据，postcode:{self.postcode}, 半径: {self.distance}英里")
+        # 获取经纬度
+        lat, lng = await self._get_lat_lng_from_postcode(self.postcode)
+        if not lat or not lng:
+            raise RuntimeError(f"无法获取邮编 {self.postcode} 的经纬度，爬取终止")
+        count = await self._collect_advisers(lat, lng)
+        if count is None:
+            raise RuntimeError(f"邮编 {self.postcode} 的顾问查询失败")
+        logger.info(f"爬取完成，共找到 {count} 条移民顾问数据")
+
+    async def _run_sweep(self) -> None:
+        """sweep模式：按网格中心点并发查询整个区域，结果按注册号去重"""
+        bbox = UK_BBOX if isinstance(self.bbox, str) and self.bbox.lower() == 'uk' else tuple(float(v) for v in self.bbox)
+        if len(bbox) != 4:
+            raise ValueError(f"bbox参数需要4个数值(南纬, 西经, 北纬, 东经)或\"uk\": {self.bbox}")
+        centres = self._build_sweep_grid(bbox, float(self.distance))
+        self.sweep_stats['centres'] = len(centres)
+        logger.info(f"开始sweep爬取{self.source_name}数据，区域: {bbox}, 半径: {self.distance}英里, 共 {len(centres)} 个中心点")
+
+        # 所有中心点同时提交，并发与速率由站点限速器控制；去重只保留键，流式模式下不保留顾问数据
+        seen: Set[Any] = set()
+        counts = await asyncio.gather(*(self._collect_advisers(lat, lng, seen) for lat, lng in centres))
+        self.sweep_stats['failed'] = sum(1 for count in counts if count is None)
+        self.sweep_stats['raw'] = sum(count for count in counts if count)
+        self.sweep_stats['unique'] = len(seen)
+        if self.sweep_stats['failed'] == len(centres):
+            raise RuntimeError(f"sweep全部 {len(centres)} 个中心点查询失败")
+        logger.info(f"sweep爬取完成: {self.sweep_stats}")
+
+    async def _collect_advisers(self, lat: float, lng: float, seen: Optional[Set[Any]] = None) -> Optional[int]:
+        """查询一个中心点，顾问条目逐个解码后产出（流式）或加入结果列表，返回解码条数，请求失败返回None
+
+        传入seen时按注册号去重（相邻网格圆有重叠），无注册号时按名称+地址去重
+        """
+        count = 0
+        try:
+            async for adviser in self._iter_adviser_list(lat, lng):
+                count += 1
+                if seen is not None:
+                    key = adviser['redundant_info']['registration_number'] or (adviser['name'], adviser['company_address'])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                if self.is_streaming:
+                    await self._emit_company(adviser)
+                else:
+                    self.advisers.append(adviser)
+            return count
+        except aiohttp.ClientError as e:
+            logger.error(f"API请求失败: {str(e)}")
+        except asyncio.TimeoutError:
+            logger.error(f"API请求超时: ({lat}, {lng})")
+        except ijson.JSONError as e:
+            logger.error(f"API响应不是有效的JSON格式: {str(e)}")
+        except Exception as e:
+            # sweep模式下各中心点并发执行，单个中心点的异常（如响应结构变化）不能中断整个sweep
+            logger.error(f"处理中心点 ({lat}, {lng}) 的顾问数据失败: {str(e)}", exc_info=True)
+        return None
+
+    @staticmethod
+    def _build_sweep_grid(bbox: Tuple[float, float, float, float], radius: float) -> List[Tuple[float, float]]:
+        """用半径为radius英里的圆覆盖bbox区域，返回圆心列表(纬度, 经度)
+
+        圆心按行排列，行距为radius*√2（圆的内接正方形边长）；每行的经度间距按球面距离计算，
+        使网格单元离赤道较近一侧的角点（同样的经度差在低纬度对应的距离更长）恰好落在圆上，相邻圆无缝覆盖
+        """
+        south, west, north, east = bbox
+        if radius <= 0 or south >= north or west >= east:
+            raise ValueError(f"无效的sweep区域或半径: bbox={bbox}, radius={radius}")
+        # 圆的角半径及半行距（弧度），地球半径与MILES_PER_DEGREE一致
+        angle = radius / (MILES_PER_DEGREE * 180 / math.pi)
+        half_row = angle / math.sqrt(2)
+        lat_step = math.degrees(2 * half_row)
+        rows = max(1, math.ceil((north - south) / lat_step))
+        centres = []
+        for row in range(rows):
+            lat = min(south + (row + 0.5) * lat_step, 89.0)
+            centre = math.radians(lat)
+            edge = centre - math.copysign(half_row, centre) if abs(centre) > half_row else 0.0
+            # 球面余弦定理：圆心到离赤道较近一侧角点的距离等于radius时的经度差
+            cos_half_lng = (math.cos(angle) - math.sin(centre) * math.sin(edge)) / (math.cos(centre) * math.cos(edge))
+            lng_step = math.degrees(2 * math.acos(max(-1.0, min(1.0, cos_half_lng))))
+            cols = max(1, math.ceil((east - west) / lng_step))
+            for col in range(cols):
+                centres.append((round(lat, 5), round(west + (col + 0.5) * lng_step, 5)))
+        return centres
 
     async def _get_lat_lng_from_postcode(self, postcode: str) -> tuple[Optional[float], Optional[float]]:
-        """通过Google Maps Geocoding API获取邮编对应的经纬度"""
-        if not self.google_maps_api_key:
-            logger.error("未配置GOOGLE_MAPS_API_KEY环境变量")
-            return None, None
+        """获取邮编对应的经纬度：优先查询本地缓存，未命中时调用Google Maps Geocoding API"""
         if not postcode:
             logger.error("Postcode parameter is required")
             return None, None
+        cached = geocode_cache.get(postcode)
+        if cached is not None:
+            logger.info(f"邮编 {postcode} 命中经纬度缓存: {cached}")
+            return cached
+        if not self.google_maps_api_key:
+            logger.error("未配置GOOGLE_MAPS_API_KEY环境变量")
+            return None, None
         params = {
             "address":postcode,
             "key": self.google_maps_api_key
         }
         try:
-            async with self.session.get(self.google_url, params=params) as resp:
+            session = self._get_async_session(self.google_url)
+            async with self._get_rate_limiter(self.google_url), self.http_replay.request(session, 'GET', self.google_url, params=params) as resp:
                 if resp.status == 200:
                     data = await resp.json()
                     location = data['results'][0]['geometry']['location']
-                    return float(location['lat']), float(location['lng'])
+                    lat, lng = float(location['lat']), float(location['lng'])
+                    geocode_cache.put(postcode, lat, lng)
+                    return lat, lng
                 logger.error(f"获取经纬度失败，状态码: {resp.status}")
                 return None, None
         except (KeyError, IndexError, ValueError) as e:
             logger.error(f"解析经纬度失败: {str(e)}")
             return None, None
-        finally:
-            # 确保会话关闭
-            if not self.session.closed:
-                await self.session.close()
 
   
 
 
-    async def _fetch_adviser_list(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
-        """发送符合原始请求格式的POST请求"""
+    async def _iter_adviser_list(self, lat: float, lng: float) -> AsyncIterator[Dict[str, Any]]:
+        """发送符合原始请求格式的POST请求，逐个产出解析后的顾问数据
+
+        响应体不整体加载为dict，而是用ijson增量解码actions[].returnValue.returnValue[]，
+        每解码完一个条目就转换并产出，内存占用与单个条目相当而非整个响应
+        """
         message = {
             "actions": [{
                 "id":self.action_id,
@@ -157,93 +275,59 @@ class CrawlerAdviserFinder(BaseCrawler):
         # 构建API URL
         api_url = f"{self.base_url}/s/sfsites/aura?r=4&aura.ApexAction.execute=1"
 
+        # 经共享的流式请求发送：速率由站点限速器控制，收到响应体之前的超时、连接错误及429/5xx按重试策略重试
+        # （查询为只读请求，按幂等请求处理）；开始解码后出错不再重试，由调用方记为失败的中心点
+        chunks = self._stream_async(api_url, headers=headers, method='POST', data=encoded_data, idempotent=True)
+        async with aclosing(chunks):
+            items = ijson.items_async(_ChunkReader(chunks), 'actions.item.returnValue.returnValue.item', use_float=True)
+            async for item in items:
+                adviser = self._parse_adviser_item(item)
+                if adviser is not None:
+                    yield adviser
+
+    def _parse_adviser_item(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """将单个returnValue条目转换为顾问数据，条目无效时返回None"""
         try:
-            # 添加随机延迟
-            await asyncio.sleep(random.uniform(0.1, 0.5))
+            # 确保关键路径存在，避免KeyError
+            acc_obj = item.get('accObj', {})
+            loc_obj = item.get('locObj', {})
+            billing_address = acc_obj.get('BillingAddress', {})
+            primary_location_r = acc_obj.get('Primary_Location__r', {})
 
-            # 使用aiohttp发送异步POST请求
-            async with aiohttp.ClientSession() as session:
-                async with session.post(api_url, data=encoded_data, headers=headers) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            # 提取并处理顾问信息
+            return {
+                # 基本信息
+                'name': acc_obj.get('BusinessName__c'),
+                'areas_of_law': [cat.strip() for cat in acc_obj.get('Categories__c', '').split(';')] if acc_obj.get('Categories__c') else [],
 
-        except aiohttp.ClientError as e:
-            logger.error(f"API请求失败: {str(e)}")
-        except json.JSONDecodeError:
-            logger.error("API响应不是有效的JSON格式")
-        except Exception as e:
-            logger.error(f"请求处理发生错误: {str(e)}")
-        return None
+                # 联系方式
+                'company_phone': acc_obj.get('Phone') or loc_obj.get('Phone_Number__c'),
+                'company_email': primary_location_r.get('Primary_Email__c'),
+                'domains': DataCleaningService.clean_domain(acc_obj.get('Website', '').strip()),
+                'source_name':self.source_name,
+                'company_address': billing_address.get('street') or loc_obj.get('Street__c'),
 
+                # 其他信息
+                'redundant_info': {
+                    # 平台索引信息
+                    'registration_number': acc_obj.get('Organisation_Reference_Number__c'),
 
+                    # 地理信息
+                    'latitude': loc_obj.get('Latitude__c'),
+                    'longitude': loc_obj.get('Longitude__c'),
+                    'distance': item.get('distance'),
+                    'distance_from_location': item.get('distanceFromLocation'),
 
-    def _parse_adviser_list(self, response_data: Dict[str, Any]) -> List[dict]:
-        """解析API响应数据，提取顾问信息"""
-        try:
-            advisers = []
-            # 遍历所有action节点
-            if 'actions' in response_data:
-                for action in response_data['actions']:
-                    # 检查action是否包含非空的returnValue
-                    if ('returnValue' in action and 
-                        isinstance(action['returnValue'], dict) and
-                        'returnValue' in action['returnValue'] and 
-                        isinstance(action['returnValue']['returnValue'], list) and
-                        len(action['returnValue']['returnValue']) > 0):
-                        
-                        # 遍历returnValue中的每个条目
-                        for item in action['returnValue']['returnValue']:
-                            try:
-                                # 确保关键路径存在，避免KeyError
-                                acc_obj = item.get('accObj', {})
-                                loc_obj = item.get('locObj', {})
-                                billing_address = acc_obj.get('BillingAddress', {})
-                                primary_location_r = acc_obj.get('Primary_Location__r', {})
-                                
-                                # 提取并处理顾问信息
-                                adviser = {
-                                    # 基本信息
-                                    'name': acc_obj.get('BusinessName__c'),
-                                    'areas_of_law': [cat.strip() for cat in acc_obj.get('Categories__c', '').split(';')] if acc_obj.get('Categories__c') else [],
-                                    
-                                    # 联系方式
-                                    'company_phone': acc_obj.get('Phone') or loc_obj.get('Phone_Number__c'),
-                                    'company_email': primary_location_r.get('Primary_Email__c'),
-                                    'domains': DataCleaningService.clean_domain(acc_obj.get('Website', '').strip()),
-                                    'source_name':self.source_name,
-                                    'company_address': billing_address.get('street') or loc_obj.get('Street__c'),
-                                    
-                                    # 其他信息
-                                    'redundant_info': {
-                                        # 平台索引信息
-                                        'registration_number': acc_obj.get('Organisation_Reference_Number__c'),
-                                        
-                                        # 地理信息
-                                        'latitude': loc_obj.get('Latitude__c'),
-                                        'longitude': loc_obj.get('Longitude__c'),
-                                        'distance': item.get('distance'),
-                                        'distance_from_location': item.get('distanceFromLocation'),
-                                        
-                                        # 其他信息
-                                        'organisation_level': acc_obj.get('Level__c'),
-                                        'fee_type': acc_obj.get('Fee_Paying_Type__c'),
-                                        
-                                        # 地址信息
-                                        'city': billing_address.get('city') or loc_obj.get('City__c'), 
-                                        'state': billing_address.get('state'),
-                                        'postal_code': billing_address.get('postalCode') or loc_obj.get('Postcode__c'),
-                                    }
-                                }
-                                advisers.append(adviser)
-                            except Exception as e:
-                                logger.warning(f"Skipping invalid item: {str(e)}")
-            
-            logger.info(f"Successfully parsed {len(advisers)} adviser records")
-            self.advisers = advisers  # 更新实例变量
-            return advisers
+                    # 其他信息
+                    'organisation_level': acc_obj.get('Level__c'),
+                    'fee_type': acc_obj.get('Fee_Paying_Type__c'),
 
+                    # 地址信息
+                    'city': billing_address.get('city') or loc_obj.get('City__c'),
+                    'state': billing_address.get('state'),
+                    'postal_code': billing_address.get('postalCode') or loc_obj.get('Postcode__c'),
+                }
+            }
         except Exception as e:
-            logger.error(f"Error parsing API response: {str(e)}")
-            return []
-
-
+            logger.warning(f"Skipping invalid item: {str(e)}")
+            return None
@@ -6,6 +6,8 @@ from lxml import html
 from typing import Dict, Any, List
 from app.core.logger import logger
 from app.crawlers.base_crawler import BaseCrawler
+from app.crawlers.scheduler import CrawlScheduler
+from app.models.data_model import CRAWL_META_KEY
 
 
 
@@ -13,12 +15,19 @@ class CrawlerLawscot(BaseCrawler):
     """Lawscot网站爬虫实现，遵循项目标准爬虫接口"""
     source_name = "crawler_lawscot" #Law Society of Scotland
     scrapy_id = "crawler_lawscot"
+    supports_streaming = True
+    supports_incremental = True
+    supports_checkpoint = True
     base_url = "https://www.lawscot.org.uk/umbraco/surface/Imis"
 
     def __init__(self, scrapy_url: str, scrapy_params: dict = None):
-        super().__init__(scrapy_url)
-        self.scrapy_params = scrapy_params or {}
-        self.firm_data: List[Dict[str, Any]] = []
+        super().__init__(scrapy_url, scrapy_params)
+        # 按公司ID索引的公司条目，律师数据按ID直接关联
+        self.firm_data: Dict[str, Dict[str, Any]] = {}
+        # 公司与律师请求共享的并发预算，默认与站点在途上限一致
+        self.max_concurrency = int(self.scrapy_params.get('max_concurrency', self.max_in_flight))
+        self._scheduler: CrawlScheduler = None
+        self._firms_completed = 0
 
 
     def _parse_html(self, html_content: str) -> html.HtmlElement:
@@ -43,27 +52,8 @@ class CrawlerLawscot(BaseCrawler):
         """
         logger.info(f"开始爬取 {self.source_name} 网站，URL: {self.scrapy_url}")
         try:
-            # 获取搜索页面内容
-            html_content = await self._fetch_page_content(self.scrapy_url)
-            tree = self._parse_html(html_content)
+            await self._run_crawl()
 
-            # 提取公司ID
-            firm_ids = self._extract_firm_ids(tree)
-            if not firm_ids:
-                logger.warning("未提取到任何公司ID，爬取终止")
-                return {'companies': [], 'lawyers': []}
-
-            logger.info(f"成功提取到 {len(firm_ids)} 个公司ID，开始异步爬取详情页")
-            # 创建任务列表并并发执行
-            semaphore = asyncio.Semaphore(5)
-            async def sem_task(firm_id):
-                async with semaphore:
-                    return await self._fetch_and_parse_detail(firm_id)
-            
-            tasks = [sem_task(firm_id) for firm_id in firm_ids]
-            await asyncio.gather(*tasks)
-            logger.info(f"{self.source_name} 网站爬取完成，共获取 {len(self.firm_data)} 家公司数据")
-            
             result = self._format_output()
             total_lawyers = sum(len(company.get('lawyers', [])) for company in result['companies'])
             logger.info(f"爬取结果：{len(result['companies'])}家公司，{total_lawyers}名律师准备存储")
@@ -73,12 +63,47 @@ class CrawlerLawscot(BaseCrawler):
             logger.error(f"爬取过程发生错误: {str(e)}", exc_info=True)
             raise
 
+    async def _crawl_into_stream(self) -> None:
+        """流式爬取：每家公司的律师全部处理完成后立即产出"""
+        logger.info(f"开始流式爬取 {self.source_name} 网站，URL: {self.scrapy_url}")
+        try:
+            await self._run_crawl()
+        except Exception as e:
+            logger.error(f"爬取过程发生错误: {str(e)}", exc_info=True)
+            raise
+
+    async def _run_crawl(self) -> None:
+        """获取搜索页公司ID，并调度公司详情与律师详情的抓取"""
+        # 断点续爬时直接使用断点中未完成的公司ID，不再请求搜索页
+        firm_ids = self._resume_items()
+        if firm_ids is None:
+            # 获取搜索页面内容
+            html_content = await self._fetch_page_content(self.scrapy_url)
+            tree = self._parse_html(html_content)
+
+            # 提取公司ID
+            firm_ids = self._extract_firm_ids(tree)
+            if not firm_ids:
+                logger.warning("未提取到任何公司ID，爬取终止")
+                return
+            logger.info(f"成功提取到 {len(firm_ids)} 个公司ID，开始异步爬取详情页")
+            firm_ids = self._checkpoint_frontier(firm_ids)
+            self._checkpoint_frontier_complete()
+        elif not firm_ids:
+            logger.info("断点中的公司已全部完成，无需续爬")
+            return
+        # 公司详情与律师详情由同一调度器执行，共享并发预算并在公司间轮转
+        self._scheduler = CrawlScheduler(self.max_concurrency)
+        for firm_id in firm_ids:
+            self._scheduler.submit('firms', lambda firm_id=firm_id: self._fetch_and_parse_detail(firm_id))
+        await self._scheduler.run()
+        logger.info(f"{self.source_name} 网站爬取完成，共处理 {self._firms_completed} 家公司数据")
+        if self.incremental:
+            logger.info(f"增量爬取统计: {self.incremental_stats}")
+
     async def _fetch_page_content(self, url: str) -> str:
         """异步获取页面内容"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            None, self._get_page_content, url
-        )
+        return await self._fetch_async(url)
 
     def _extract_firm_ids(self, tree: html.HtmlElement) -> List[str]:
         """使用XPath提取公司ID"""
@@ -86,7 +111,8 @@ class CrawlerLawscot(BaseCrawler):
             self.logger.warning("无法从页面提取公司ID，树结构为空")
             return []
         xpath_expr = "//button[contains(@class, 'print')]/@data-list-item-id"
-        return tree.xpath(xpath_expr)
+        # 去重并保持页面顺序
+        return list(dict.fromkeys(tree.xpath(xpath_expr)))
 
     async def _fetch_and_parse_detail(self, firm_id: str) -> None:
         """异步获取并解析公司详情页"""
@@ -94,13 +120,20 @@ class CrawlerLawscot(BaseCrawler):
             url = f"{self.base_url}/GetLegalFirmDetail?id={firm_id}"
             content = await self._fetch_page_content(url)
             data = json.loads(content)
-            await self._parse_firm_data(data, firm_id)
+            fingerprint = self.compute_fingerprint(data)
+            if self._check_fingerprint(firm_id, fingerprint):
+                logger.info(f"公司ID {firm_id} 内容未变化，跳过律师及入库处理")
+                self._checkpoint_done(firm_id)
+                return
+            await self._parse_firm_data(data, firm_id, fingerprint)
         except json.JSONDecodeError:
             logger.error(f"公司ID {firm_id} 响应不是有效的JSON")
+            self._checkpoint_failed(firm_id)
         except Exception as e:
             logger.error(f"处理公司ID {firm_id} 失败: {str(e)}")
+            self._checkpoint_failed(firm_id)
 
-    async def _parse_firm_data(self, data: Dict[str, Any], firm_id: str) -> None:
+    async def _parse_firm_data(self, data: Dict[str, Any], firm_id: str, fingerprint: str = None) -> None:
         """解析公司JSON数据并提取信息"""
         # 提取公司基本信息
         total_solicitors = data.get('TotalSolicitorCount')
@@ -152,18 +185,21 @@ class CrawlerLawscot(BaseCrawler):
             'firm_id': firm_id,
             'base_info': company_data,
             'parsed_solicitors': [],
-            'expected_solicitors': len(lawyer_ids)
+            'expected_solicitors': len(lawyer_ids),
+            'pending_solicitors': len(lawyer_ids),
+            'fingerprint': fingerprint
         }
-        self.firm_data.append(firm_entry)
-        # 异步处理律师数据
+        self.firm_data[firm_id] = firm_entry
+        if not lawyer_ids:
+            await self._on_firm_complete(firm_entry)
+        # 律师请求提交到调度器，按公司分组与其他公司的请求轮转执行
         if lawyer_ids:
-            logger.info(f"开始处理公司 {firm_id} 的 {len(lawyer_ids)} 个律师数据")
-            lawyer_tasks = [
-                asyncio.create_task(self._fetch_and_parse_lawyer(firm_id, lawyer_id))
-                for lawyer_id in lawyer_ids
-            ]
-            await asyncio.gather(*lawyer_tasks)
-            logger.info(f"公司 {firm_id} 的律师数据处理完成")
+            logger.info(f"提交公司 {firm_id} 的 {len(lawyer_ids)} 个律师数据任务")
+            for lawyer_id in lawyer_ids:
+                self._scheduler.submit(
+                    firm_id,
+                    lambda lawyer_id=lawyer_id: self._fetch_and_parse_lawyer(firm_id, lawyer_id)
+                )
                     
 
     async def _fetch_and_parse_lawyer(self, firm_id: str, lawyer_id: str) -> None:    
@@ -171,22 +207,37 @@ class CrawlerLawscot(BaseCrawler):
         try:
             logger.info(f"开始异步获取律师 {lawyer_id} 详情")
             url = f"{self.base_url}/GetSolicitorDetail?id={lawyer_id}"
-            # 使用异步HTTP客户端而非同步方法
             content = await self._fetch_page_content(url)
             if not content:
                 logger.error(f"律师 {lawyer_id} 详情页为空")
+                self._checkpoint_failed(firm_id)
                 return
             
             data = json.loads(content)
             self._parse_lawyer_data(data, firm_id)
         except Exception as e:
             logger.error(f"律师 {lawyer_id} 处理失败: {str(e)}", exc_info=True)
+            # 律师获取失败时公司数据仍会入库，但公司保持失败状态，续爬时重新抓取
+            self._checkpoint_failed(firm_id)
+        finally:
+            firm_entry = self.firm_data.get(firm_id)
+            if firm_entry:
+                firm_entry['pending_solicitors'] -= 1
+                if firm_entry['pending_solicitors'] == 0:
+                    await self._on_firm_complete(firm_entry)
+
+    async def _on_firm_complete(self, firm_entry: Dict[str, Any]) -> None:
+        """公司及其律师全部处理完成；流式模式下立即产出并释放内存"""
+        self._firms_completed += 1
+        if self.is_streaming:
+            del self.firm_data[firm_entry['firm_id']]
+            await self._emit_company(self._format_company(firm_entry))
 
     def _parse_lawyer_data(self, data: Dict[str, Any], firm_id: str) -> None:
         """解析律师JSON数据并提取信息"""
         try:
             # 查找对应公司条目
-            firm_entry = next((f for f in self.firm_data if f['firm_id'] == firm_id), None)
+            firm_entry = self.firm_data.get(firm_id)
             if not firm_entry:
                 logger.error(f"找不到公司 {firm_id} 的条目，律师数据无法关联")
                 return
@@ -220,31 +271,35 @@ class CrawlerLawscot(BaseCrawler):
 
     def _format_output(self) -> Dict[str, List[Dict[str, Any]]]:
         """格式化输出为项目标准格式"""
-        companies = []
-        for firm in self.firm_data:
-            # 处理域名格式
-            domain = firm['base_info']['domains'] or ''
-            if domain:
-                parsed_url = urlparse(domain)
-                domain = parsed_url.netloc or parsed_url.path.split('/')[0]
-                domain = domain.lstrip('www.')
-
-            company = {
-                'name': firm['base_info']['name'],
-                'company_email': firm['base_info']['company_email'],
-                'company_phone': firm['base_info']['company_phone'],
-                'company_address': firm['base_info']['company_address'],
-                'domains': domain,
-                'areas_of_law': firm['base_info']['areas_of_law'],
-                'total_solicitors': firm['base_info']['total_solicitors'],
-                'scottish_partners': firm['base_info']['scottish_partners'],
-                'redundant_info':firm['base_info']['redundant_info'],
-                'source_name':self.source_name,
-                'lawyers': firm['parsed_solicitors']
-            }
-            companies.append(company)
+        companies = [self._format_company(firm) for firm in self.firm_data.values()]
         logger.info(f"数据格式化完成，共 {len(companies)} 家公司，{sum(len(c['lawyers']) for c in companies)} 名律师")
 
         return {'companies': companies}
 
-   
\ No newline at end of file
+    def _format_company(self, firm: Dict[str, Any]) -> Dict[str, Any]:
+        """将单个公司条目格式化为项目标准格式"""
+        # 处理域名格式
+        domain = firm['base_info']['domains'] or ''
+        if domain:
+            parsed_url = urlparse(domain)
+            domain = parsed_url.netloc or parsed_url.path.split('/')[0]
+            domain = domain.lstrip('www.')
+
+        return {
+            'name': firm['base_info']['name'],
+            'company_email': firm['base_info']['company_email'],
+            'company_phone': firm['base_info']['company_phone'],
+            'company_address': firm['base_info']['company_address'],
+            'domains': domain,
+            'areas_of_law': firm['base_info']['areas_of_law'],
+            'total_solicitors': firm['base_info']['total_solicitors'],
+            'scottish_partners': firm['base_info']['scottish_partners'],
+            'redundant_info':firm['base_info']['redundant_info'],
+            'source_name':self.source_name,
+            'lawyers': firm['parsed_solicitors'],
+            # 律师未全部获取成功时不记录指纹，保证下次增量爬取会重新处理该公司
+            CRAWL_META_KEY: {
+                'item_key': firm['firm_id'],
+                'fingerprint': firm['fingerprint'] if len(firm['parsed_solicitors']) >= firm['expected_solicitors'] else None
+            }
+        }
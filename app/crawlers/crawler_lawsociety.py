@@ -2,38 +2,161 @@ import asyncio
 import json
 import re
 from app.models.schemas import PageType
-from typing import Dict, Any, List
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
 from app.core.logger import logger
 from app.crawlers.base_crawler import BaseCrawler
+from app.crawlers.extraction import ExtractionSpec, FieldSpec, first_text, text_list
 from app.services.data_cleaning import DataCleaningService
-from lxml import html
+from lxml import html, etree
 from app.models.data_model import PageType
 from app.services.data_storage import DataStorageService
 import aiohttp
-import httpx 
 from app.core.config import settings
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, urlencode
+
+def _first_attr(name: str):
+    """取第一个元素的属性值，无元素时返回空字符串"""
+    def post(elements: List[html.HtmlElement]) -> str:
+        return elements[0].get(name, '') if elements else ''
+    return post
+
+
+def _first_number(values: List[str]) -> int:
+    """从第一个文本结果中提取数字，无结果时返回0"""
+    return DataCleaningService.extract_number(values[0]) if values else 0
+
+
+def _website_domain(elements: List[html.HtmlElement]) -> str:
+    """从网站链接中提取域名"""
+    original_website = elements[0].get('href', '') if elements else None
+    return DataCleaningService.extract_domain(original_website) if original_website else ''
+
+
+def _first_email(values: List[str]) -> str:
+    """取第一个非空的邮箱，移除mailto:前缀（如果存在）"""
+    for value in values:
+        if value.strip():
+            return value.replace('mailto:', '').strip()
+    return ''
+
+
+def _join_address(values: List[str]) -> str:
+    return ', '.join([part.strip() for part in values if part.strip()])
+
+
+def _admission_date(values: List[str]) -> str:
+    """提取AdmissionDate，转换为DD/MM/YYYY格式 (假设原格式是DD/MM/YY)"""
+    match = re.search(r'(\d{2}/\d{2}/\d{2})', first_text(values))
+    admission_date = match.group(1) if match else ''
+    if admission_date and len(admission_date) == 8:
+        admission_date = admission_date[:6] + '20' + admission_date[6:]
+    return admission_date
+
+
+def _accreditation_list(values: List[str]) -> List[str]:
+    return [acc.strip().replace('\n', '').replace('  ', ' ') for acc in values if acc.strip()]
+
+
+def _split_areas(values: List[str]) -> List[str]:
+    return first_text(values).split(", ")
+
 
 class CrawlerLawsociety(BaseCrawler):
     """HTML片段解析爬虫，处理不同类型页面的HTML片段"""
     source_name = "crawler_lawsociety"
     scrapy_id = "crawler_lawsociety"
+    # 503表示Cookie失效，直接提示更新而不重试
+    retry_status_forcelist = [429, 500, 502, 504]
+
+    # 页面字段规则，类定义时编译一次，解析时对每个条目一次性提取
+    _company_elements = etree.XPath("//section[contains(@class, 'solicitor-outer')]")
+    company_list_spec = ExtractionSpec({
+        'name': FieldSpec(".//a[@class='token']/text()", first_text),
+        'company_address': FieldSpec("(.//li[contains(span/text(), 'Address')])[1]/text()[last()]", first_text),
+        'company_phone': FieldSpec("(.//li[contains(span/text(), 'Telephone')])[1]/text()[last()]", first_text),
+        # 邮箱在data-email属性中
+        'company_email': FieldSpec("(.//a[@class='show-email'])[1]", _first_attr('data-email')),
+        'domains': FieldSpec(".//li[contains(span/text(), 'Website')]/a", _website_domain),
+        # 执业领域：初始显示的领域 + 更多领域
+        'areas_of_law': FieldSpec((
+            "(.//div[contains(@class, 'info-panel') and .//span[contains(text(), 'Areas of practice')]])[1]"
+            "//ul[contains(@class, 'initial')]/li/text()",
+            "(.//div[contains(@class, 'info-panel') and .//span[contains(text(), 'Areas of practice')]])[1]"
+            "//div[contains(@class, 'more-holder')]/ul/li/text()"
+        )),
+        'accreditations': FieldSpec(
+            "(.//div[contains(@class, 'info-panel') and .//span[contains(text(), 'Accreditations')]])[1]"
+            "//ul[contains(@class, 'initial')]/li/text()"
+        ),
+        'office_num': FieldSpec(
+            "(.//ul[contains(@class, 'more-info-list')])[1]//li[contains(.//i/@class, 'icon-office-blue')]/a/text()",
+            _first_number
+        ),
+        'total_solicitors': FieldSpec(
+            "(.//ul[contains(@class, 'more-info-list')])[1]//li[contains(.//i/@class, 'icon-people-blue')]/a/text()",
+            _first_number
+        ),
+    })
+    _lawyer_elements = etree.XPath("//div[contains(@class, 'lawyer-item')]")
+    lawyer_list_spec = ExtractionSpec({
+        'name': FieldSpec(".//h3[@class='lawyer-name']/text()", first_text),
+        'telephone': FieldSpec(".//div[@class='phone']/text()", first_text),
+        'email_addresses': FieldSpec(".//div[@class='email']/text()", first_text),
+        'practice_areas': FieldSpec(".//div[@class='practice-areas']/text()", _split_areas),
+        'company_name': FieldSpec(".//strong[contains(text(), 'at')]/following-sibling::a/text()", first_text),
+    })
+    lawyer_detail_spec = ExtractionSpec({
+        'name': FieldSpec("//h1/text()", first_text),
+        'email_addresses': FieldSpec(
+            "//dt[text()='Email']/following-sibling::dd[1]/a[starts-with(@href, 'mailto:')]/@href | "
+            "//dt[text()='Email']/following-sibling::dd[1]/a/@data-email",
+            _first_email
+        ),
+        'telephone': FieldSpec("//dt[text()='Telephone']/following-sibling::dd[1]/text()", first_text),
+        'address': FieldSpec("//dd[@class='address']/text()[normalize-space()]", _join_address),
+        'practice_areas': FieldSpec(
+            "//section[.//h2[normalize-space(text())='Areas of practice']]//ul[@class='two-cols']/li/text()[normalize-space()]",
+            text_list
+        ),
+        'admission_date': FieldSpec(
+            "//p[contains(., 'Admitted as a solicitor:')]/span[@class='related']/text()", _admission_date
+        ),
+        'roles': FieldSpec("//dl[@class='multi-line ul']/dd/ul/li/text()", text_list),
+        'languages': FieldSpec(
+            "//section[.//h2[normalize-space(text())='Languages spoken']]//ul[@class='three-cols']/li/text()", text_list
+        ),
+        'accreditations': FieldSpec(
+            "//em[@class='highlight' and text()='Accredited']/parent::li/text()", _accreditation_list
+        ),
+        'company_name': FieldSpec("//strong[contains(text(), 'at')]/following-sibling::a/text()", first_text),
+    })
 
 
     def __init__(self, db=None, scrapy_url: str = None, scrapy_params: dict = None):
-        super().__init__(scrapy_url)
+        super().__init__(scrapy_url, scrapy_params)
         self.db = db
         self.base_url = settings.LAWSOCIETY_BASE_URL
-        self.scrapy_params = scrapy_params or {}
         self.page_type = self.scrapy_params.get('page_type')
         self.html_chunk = self.scrapy_params.get('html_chunk')
         self.results = {'companies': [], 'lawyers': []}
+        # 按归一化公司名称索引results中的公司，列表页与详情页解析共用，律师按名称直接关联
+        self._company_index: Dict[str, Dict[str, Any]] = {}
+        # 仅由律师数据创建、尚无公司详细信息的公司键
+        self._placeholder_keys = set()
         self.parse_method_map = {
             PageType.COMPANY_LIST: self._parse_company_list,
             PageType.COMPANY_DETAIL: self._parse_company_detail,
             PageType.LAWYER_LIST: self._parse_lawyer_list,
             PageType.LAWYER_DETAIL: self._parse_lawyer_detail
         }
+        # 列表页在解析进程池中解析，返回的数据由对应方法收集
+        self.collect_method_map = {
+            PageType.COMPANY_LIST: self._collect_companies,
+            PageType.LAWYER_LIST: self._collect_list_lawyers
+        }
+        # 分页预取的并发数
+        self.page_concurrency = int(self.scrapy_params.get('page_concurrency', self.max_in_flight))
         raw_cookie = self.scrapy_params.get('cookies', '')
         self.cookies = self._filter_large_cookies(raw_cookie)
         
@@ -62,7 +185,7 @@ class CrawlerLawsociety(BaseCrawler):
             # 根据页面类型选择处理方式
             if self.page_type in [PageType.COMPANY_LIST, PageType.LAWYER_LIST]:
                 # 列表页启用分页爬取
-                await self._handle_pagination(self.scrapy_url, parse_method)
+                await self._handle_pagination(self.scrapy_url, self.collect_method_map[self.page_type])
             else:
                 # 详情页直接解析HTML片段
                 tree = html.fromstring(self.html_chunk)
@@ -140,13 +263,13 @@ class CrawlerLawsociety(BaseCrawler):
     
 
     async def _fetch_page(self, url: str) -> str:
-        """发送HTTP请求，使用过滤后的Cookie（httpx实现）"""
+        """发送HTTP请求，使用过滤后的Cookie（复用共享连接池）"""
         try:
             # 将过滤后的Cookie转换为字符串
             cookie_str = '; '.join([f'{k}={v}' for k, v in self.cookies.items()])
             logger.info(f"请求URL: {url}, Cookie: {cookie_str}")
 
-            # 配置请求头
+            # 配置请求头（共享会话不自动管理Cookie，仅使用此处手动设置的Cookie）
             headers = {
                 'Host': 'solicitors.lawsociety.org.uk',
                 'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
@@ -159,29 +282,16 @@ class CrawlerLawsociety(BaseCrawler):
                 'Connection': 'keep-alive',
                 'Cookie': cookie_str
             }
+            return await self._fetch_async(url, headers=headers, read_timeout=30)
 
-            # 创建httpx异步客户端，禁用默认Cookie管理
-            async with httpx.AsyncClient(
-                cookies=httpx.Cookies(),  # 空CookieJar，禁用自动Cookie处理
-                timeout=30.0,
-                limits=httpx.Limits(max_keepalive_connections=5),
-                follow_redirects=True
-            ) as client:
-                response = await client.get(
-                    url,
-                    headers=headers
-                )
-                response.raise_for_status()
-                return response.text
-
-        except httpx.HTTPStatusError as e:
+        except aiohttp.ClientResponseError as e:
      
-            if e.response.status_code == 503:
+            if e.status == 503:
                 # 针对503错误添加特殊处理逻辑
                 raise ValueError(f"请求失败：服务器暂时不可用(503)，请更新Cookies")
             else:
-                raise ValueError(f"请求失败：状态码{e.response.status_code}")
-        except httpx.RequestError as e:
+                raise ValueError(f"请求失败：状态码{e.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             # 网络层面错误保持不变
             raise ValueError(f"请求发生网络错误: {str(e)}")
     
@@ -198,112 +308,180 @@ class CrawlerLawsociety(BaseCrawler):
         # 动态调用对应解析方法
         return await self.parse_method_map[page_type](soup)
     
-    async def _handle_pagination(self, initial_url: str, parse_method) -> None:
-        "处理分页逻辑，循环获取所有页面数据"
-        current_url = initial_url
+    async def _handle_pagination(self, initial_url: str, collect_method) -> None:
+        """处理分页逻辑，获取所有页面数据
+
+        首页的分页栏中有页码链接时，按页码构造其余页面URL并在并发上限内批量预取，按页码顺序收集。
+        有明确的末页链接时预取到末页即结束；否则分页栏通常只显示当前页附近的页码窗口，
+        预取完可见的页码后从最后一页继续按"下一页"链接爬取。
+        没有页码链接时按"下一页"链接逐页爬取，但在收集当前页的同时已开始请求下一页。
+        页面解析在解析进程池中执行（未配置进程数时在当前线程执行）
+        """
+        logger.info(f"正在爬取第 1 页: {initial_url}")
+        page = await self._fetch_and_parse_page(initial_url)
         page_num = 1
-        
-        while current_url:
-            logger.info(f"正在爬取第 {page_num} 页: {current_url}")
-            
-            # 获取页面内容
-            html_content = await self._fetch_page(current_url)
-            tree = html.fromstring(html_content)
-            
-            # 调用解析方法处理当前页数据
-            parse_method(tree)
-            
-            # 提取下一页URL
-            next_page = self._extract_next_page_url(tree)
-            current_url = urljoin(self.base_url, next_page) if next_page else None
-            page_num += 1
+        collected = False
+
+        if page['page_param'] and page['total_pages'] > 1:
+            total_pages = page['total_pages']
+            if page['last_page_known']:
+                logger.info(f"识别到共 {total_pages} 页，并发预取剩余页面（并发数 {self.page_concurrency}）")
+            else:
+                logger.info(f"分页栏可见 {total_pages} 页，并发预取后继续按下一页链接爬取（并发数 {self.page_concurrency}）")
+            collect_method(page['records'])
+            page_urls = [self._build_page_url(initial_url, page['page_param'], num) for num in range(2, total_pages + 1)]
+            last_page_known = page['last_page_known']
+            page = await self._fetch_pages_in_order(page_urls, collect_method)
+            if last_page_known:
+                return
+            page_num = total_pages
+            collected = True
+
+        while page is not None:
+            # 先根据下一页URL立即发起请求，再收集当前页，使网络与处理重叠
+            next_page = page['next_page']
+            next_url = urljoin(self.base_url, next_page) if next_page else None
+            next_task = asyncio.create_task(self._fetch_and_parse_page(next_url)) if next_url else None
+
+            if not collected:
+                collect_method(page['records'])
+            collected = False
+
+            page = None
+            if next_task is not None:
+                page_num += 1
+                logger.info(f"正在爬取第 {page_num} 页: {next_url}")
+                page = await next_task
+
+    async def _fetch_and_parse_page(self, url: str) -> Dict[str, Any]:
+        """获取并解析列表页，返回条目数据与分页信息"""
+        html_content = await self._fetch_page(url)
+        return await self._parse_in_pool(f"lawsociety_{PageType(self.page_type).value}", html_content)
+
+    async def _fetch_pages_in_order(self, page_urls: List[str], collect_method) -> Dict[str, Any]:
+        """在并发窗口内预取并解析页面，并严格按页码顺序收集，返回最后一页的解析结果"""
+        window = deque()
+        url_iter = iter(enumerate(page_urls, start=2))
+
+        def fill_window():
+            while len(window) < self.page_concurrency:
+                item = next(url_iter, None)
+                if item is None:
+                    return
+                page_num, url = item
+                window.append((page_num, url, asyncio.create_task(self._fetch_and_parse_page(url))))
+
+        fill_window()
+        page = None
+        try:
+            while window:
+                page_num, url, task = window.popleft()
+                page = await task
+                fill_window()
+                logger.info(f"收集第 {page_num} 页: {url}")
+                collect_method(page['records'])
+        finally:
+            for _, _, task in window:
+                task.cancel()
+        return page
+
+    @staticmethod
+    def _extract_total_pages(tree: html.HtmlElement) -> Tuple[Optional[str], int, bool]:
+        """
+        从分页链接中读取页码参数名与页数，返回(参数名, 页数, 是否为末页)
+
+        有末页链接（Last）时页数取其页码；否则取可见页码链接中的最大值，之后可能还有页面。
+        无法识别时返回(None, 0, False)
+        """
+        links = tree.xpath("//*[contains(@class, 'pagination') or contains(@class, 'paging')]//a[@href]")
+        page_param, total_pages, last_page = None, 0, None
+        for link in links:
+            for key, values in parse_qs(urlparse(link.get('href')).query).items():
+                if key.lower() == 'page' and values and values[0].isdigit():
+                    page_param = key
+                    total_pages = max(total_pages, int(values[0]))
+                    if CrawlerLawsociety._is_last_page_link(link):
+                        last_page = int(values[0])
+        if last_page is not None:
+            return page_param, last_page, True
+        return page_param, total_pages, False
+
+    @staticmethod
+    def _is_last_page_link(link: html.HtmlElement) -> bool:
+        """末页链接：文本或aria-label为Last，或class中含last"""
+        label = (link.text_content() or link.get('aria-label') or '').strip().lower()
+        classes = re.split(r'[\s_-]+', (link.get('class') or '').lower())
+        return label.startswith('last') or label in ('»»', '>>', '>|') or 'last' in classes
+
+    @staticmethod
+    def _build_page_url(url: str, page_param: str, page: int) -> str:
+        """在URL中设置页码参数"""
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query, keep_blank_values=True)
+        query = {k: v for k, v in query.items() if k.lower() != page_param.lower()}
+        query[page_param] = [str(page)]
+        return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
            
     
-    def _extract_next_page_url(self, tree: html.HtmlElement) -> str:
+    @staticmethod
+    def _extract_next_page_url(tree: html.HtmlElement) -> str:
         "从页面中提取下一页URL"
         next_link = tree.xpath("//a[contains(text(), 'Next') or contains(@class, 'next-page')]/@href")
         return next_link[0] if next_link else None
 
     def _parse_company_list(self, tree: html.HtmlElement) -> None:
         """解析公司列表页面，提取公司基本信息"""
+        self._collect_companies(self._extract_companies(tree))
+
+    @classmethod
+    def _extract_companies(cls, tree: html.HtmlElement) -> List[Dict[str, Any]]:
+        """提取公司列表页中的公司数据（纯函数，可在解析进程中执行）"""
         # 获取所有公司条目
-        company_elements = tree.xpath("//section[contains(@class, 'solicitor-outer')]")
+        company_elements = cls._company_elements(tree)
         logger.info(f"找到 {len(company_elements)} 个公司条目")
 
+        companies = []
         for elem in company_elements:
-            # 提取公司名称
-            name = DataCleaningService.safe_extract(elem, ".//a[@class='token']/text()").strip()
+            # 按声明式规则一次性提取全部字段
+            fields = cls.company_list_spec.extract(elem)
+            name = fields['name']
             if not name:
                 logger.warning("未提取到公司名称，跳过此条目")
                 continue
 
-            # 提取地址信息
-            address_elem = elem.xpath(".//li[contains(span/text(), 'Address')]")
-            company_address = DataCleaningService.safe_extract(address_elem[0], "./text()[last()]") if address_elem else ""
-
-            # 提取联系电话
-            phone_elem = elem.xpath(".//li[contains(span/text(), 'Telephone')]")
-            company_phone = DataCleaningService.safe_extract(phone_elem[0], "./text()[last()]") if phone_elem else ""
-
-            # 提取邮箱地址（data-email属性）
-            email_elem = elem.xpath(".//a[@class='show-email']")
-            company_email = email_elem[0].get('data-email', '') if email_elem else ""
-
-            # 提取网站域名
-            website_elem = elem.xpath(".//li[contains(span/text(), 'Website')]/a")
-            original_website = website_elem[0].get('href', '') if website_elem else None
-            domains = DataCleaningService.extract_domain(original_website) if original_website else ''
-
-            # 提取执业领域（Areas of practice）
-            areas_panel = elem.xpath(".//div[contains(@class, 'info-panel') and .//span[contains(text(), 'Areas of practice')]]")
-            areas_of_law = []
-            if areas_panel:
-                # 提取初始显示的领域
-                initial_areas = areas_panel[0].xpath(".//ul[contains(@class, 'initial')]/li/text()")
-                # 提取更多领域
-                more_areas = areas_panel[0].xpath(".//div[contains(@class, 'more-holder')]/ul/li/text()")
-                areas_of_law = initial_areas + more_areas
-
-            # 提取认证信息（Accreditations）
-            accreditations_panel = elem.xpath(".//div[contains(@class, 'info-panel') and .//span[contains(text(), 'Accreditations')]]")
-            accreditations = []
-            if accreditations_panel:
-                accreditations = accreditations_panel[0].xpath(".//ul[contains(@class, 'initial')]/li/text()")
-
-            # 提取办公室数量和律师数量
-            more_info_list = elem.xpath(".//ul[contains(@class, 'more-info-list')]")
-            office_num = 0
-            total_solicitors_num = 0
-            if more_info_list:
-                # 提取办公室数量
-                office_link = more_info_list[0].xpath(".//li[contains(.//i/@class, 'icon-office-blue')]/a/text()")
-                if office_link:
-                    office_num =  DataCleaningService.extract_number(office_link[0])
-
-                # 提取律师数量
-                solicitor_link = more_info_list[0].xpath(".//li[contains(.//i/@class, 'icon-people-blue')]/a/text()")
-                if solicitor_link:
-                    total_solicitors_num =  DataCleaningService.extract_number(solicitor_link[0])
-
             # 构建公司数据
-            company_data = {
+            companies.append({
                 'name': name,
-                'company_email': company_email,
-                'company_phone': company_phone,
-                'company_address': company_address,
-                'areas_of_law': areas_of_law,
-                'total_solicitors': total_solicitors_num,
-                'domains': domains,
+                'company_email': fields['company_email'],
+                'company_phone': fields['company_phone'],
+                'company_address': fields['company_address'],
+                'areas_of_law': fields['areas_of_law'],
+                'total_solicitors': fields['total_solicitors'],
+                'domains': fields['domains'],
                 'redundant_info': {
-                    'accreditations': accreditations,
-                    'office_num': office_num
+                    'accreditations': fields['accreditations'],
+                    'office_num': fields['office_num']
                 },
-                'source_name': self.source_name
-            }
-            self.results['companies'].append(company_data)
+                'source_name': cls.source_name
+            })
+        return companies
+
+    def _collect_companies(self, companies: List[Dict[str, Any]]) -> None:
+        """收集解析出的公司数据"""
+        for company_data in companies:
+            key = DataCleaningService.normalize_company_key(company_data['name'])
+            if key in self._placeholder_keys:
+                # 该公司此前仅由律师数据创建，补全公司信息并保留已关联的律师
+                self._placeholder_keys.discard(key)
+                self._company_index[key].update(company_data)
+            else:
+                # 同名公司的不同办公室分别保留，律师关联到首个同名公司
+                company_data['lawyers'] = []
+                self.results['companies'].append(company_data)
+                self._company_index.setdefault(key, company_data)
 
             # self.firm_data.append(company_data)
-            logger.debug(f"已解析公司: {name}, 律师数量: {total_solicitors_num}")
+            logger.debug(f"已解析公司: {company_data['name']}, 律师数量: {company_data['total_solicitors']}")
 
     
     async def _parse_company_detail(self, soup):
@@ -312,98 +490,62 @@ class CrawlerLawsociety(BaseCrawler):
 
     def _parse_lawyer_list(self, tree: html.HtmlElement) -> None:
         """解析律师列表页面"""
-        # 实现律师列表解析逻辑
-        lawyer_elements = tree.xpath("//div[contains(@class, 'lawyer-item')]")
-        for elem in lawyer_elements:
-            lawyer = {
-                'name': DataCleaningService.safe_extract(elem, ".//h3[@class='lawyer-name']/text()"),
-                'telephone': DataCleaningService.safe_extract(elem, ".//div[@class='phone']/text()"),
-                'email_addresses': DataCleaningService.safe_extract(elem, ".//div[@class='email']/text()"),
-                'practice_areas': DataCleaningService.safe_extract(elem, ".//div[@class='practice-areas']/text()").split(", "),
-                'source_name': self.source_name
-            }
-            # 律师列表通常关联到公司，这里需要根据实际情况调整
-            if not self.results['companies']:
-                self.results['companies'].append({
-                    'name': 'Unknown Company',
-                    'source_name': self.source_name,
-                    'lawyers': [lawyer]
-                })
-            else:
-                self.results['companies'][0]['lawyers'].append(lawyer)
+        self._collect_list_lawyers(self._extract_list_lawyers(tree))
+
+    @classmethod
+    def _extract_list_lawyers(cls, tree: html.HtmlElement) -> List[Dict[str, Any]]:
+        """提取律师列表页中的律师数据（纯函数，可在解析进程中执行）"""
+        lawyers = []
+        for elem in cls._lawyer_elements(tree):
+            lawyer = cls.lawyer_list_spec.extract(elem)
+            lawyer['source_name'] = cls.source_name
+            lawyers.append(lawyer)
+        return lawyers
+
+    def _collect_list_lawyers(self, lawyers: List[Dict[str, Any]]) -> None:
+        """收集律师列表页解析出的律师数据"""
+        for lawyer in lawyers:
+            # 按律师条目中的所属公司关联，无法识别公司时归入Unknown Company
+            company_name = lawyer.pop('company_name', '') or 'Unknown Company'
+            self._get_or_create_company(company_name)['lawyers'].append(lawyer)
 
     def _parse_lawyer_detail(self, tree: html.HtmlElement) -> None:
         """解析律师详情页面"""
-        # 提取律师姓名
-        name = DataCleaningService.safe_extract(tree, "//h1/text()").strip()
-
-        # 提取邮箱地址
-        email_values = tree.xpath(
-            "//dt[text()='Email']/following-sibling::dd[1]/a[starts-with(@href, 'mailto:')]/@href | "
-            "//dt[text()='Email']/following-sibling::dd[1]/a/@data-email"
-        )
-        email_addresses = ''
-        for value in email_values:
-            if value.strip():
-                # 移除mailto:前缀（如果存在）
-                email_addresses = value.replace('mailto:', '').strip()
-                break
-        
-
-        # 提取电话
-        telephone = DataCleaningService.safe_extract(tree, "//dt[text()='Telephone']/following-sibling::dd[1]/text()").strip()
+        self._collect_lawyer_detail(self._extract_lawyer_detail(tree))
 
-        # 提取地址
-        address_parts = tree.xpath("//dd[@class='address']/text()[normalize-space()]")
-        address = ', '.join([part.strip() for part in address_parts if part.strip()])
-
-        # 提取执业领域
-        areas_of_practice = []
-        area_sections = tree.xpath("//section[.//h2[normalize-space(text())='Areas of practice']]//ul[@class='two-cols']/li/text()[normalize-space()]") #//ul[@class='three-cols']/li
-        areas_of_practice = [text.strip() for text in area_sections if text.strip()]
-
-        # 提取AdmissionDate
-        admission_text = DataCleaningService.safe_extract(tree, "//p[contains(., 'Admitted as a solicitor:')]/span[@class='related']/text()")
-        admission_date = re.search(r'(\d{2}/\d{2}/\d{2})', admission_text).group(1) if admission_text else ''
-        # 转换为DD/MM/YYYY格式 (假设原格式是DD/MM/YY)
-        if admission_date and len(admission_date) == 8:
-            admission_date = admission_date[:6] + '20' + admission_date[6:]
-
-        # 提取Roles
-        roles = tree.xpath("//dl[@class='multi-line ul']/dd/ul/li/text()")
-        roles = [role.strip() for role in roles if role.strip()]
-
-        # 提取Languages
-        languages = tree.xpath("//section[.//h2[normalize-space(text())='Languages spoken']]//ul[@class='three-cols']/li/text()")
-        languages = [lang.strip() for lang in languages if lang.strip()]
-
-        # 提取accreditations
-        accreditations = tree.xpath("//em[@class='highlight' and text()='Accredited']/parent::li/text()")
-        accreditations = [acc.strip().replace('\n', '').replace('  ', ' ') for acc in accreditations if acc.strip()]
-
-        # 提取company_name
-        company_name = DataCleaningService.safe_extract(tree, "//strong[contains(text(), 'at')]/following-sibling::a/text()").strip()
+    @classmethod
+    def _extract_lawyer_detail(cls, tree: html.HtmlElement) -> Dict[str, Any]:
+        """提取律师详情页数据（纯函数，可在解析进程中执行）"""
+        # 按声明式规则一次性提取全部字段
+        fields = cls.lawyer_detail_spec.extract(tree)
 
         # 构建律师数据
-        lawyer = {
-            'name': name,
-            'email_addresses': email_addresses,
-            'telephone': telephone,
-            'address': address,
-            'practice_areas': areas_of_practice,
-            'source_name': self.source_name,
+        return {
+            'name': fields['name'],
+            'email_addresses': fields['email_addresses'],
+            'telephone': fields['telephone'],
+            'address': fields['address'],
+            'practice_areas': fields['practice_areas'],
+            'source_name': cls.source_name,
             'redundant_info': {
-                'AdmissionDate': admission_date,
-                'Roles': roles,
-                'Languages': languages,
-                'accreditations': accreditations,
-                'company_name': company_name
+                'AdmissionDate': fields['admission_date'],
+                'Roles': fields['roles'],
+                'Languages': fields['languages'],
+                'accreditations': fields['accreditations'],
+                'company_name': fields['company_name']
             }
         }
 
-        # 查找或创建公司
-        company = next((c for c in self.results['companies'] if c['name'] == company_name), None)
-        if not company:
+    def _collect_lawyer_detail(self, lawyer: Dict[str, Any]) -> None:
+        """收集律师详情数据并关联到所属公司"""
+        company_name = lawyer['redundant_info']['company_name']
+        self._get_or_create_company(company_name)['lawyers'].append(lawyer)
+
+    def _get_or_create_company(self, company_name: str) -> Dict[str, Any]:
+        """按归一化名称查找公司，不存在时创建仅含名称的公司"""
+        key = DataCleaningService.normalize_company_key(company_name)
+        company = self._company_index.get(key)
+        if company is None:
             company = {
                 'name': company_name,
                 'source_name': self.source_name,
@@ -411,5 +553,29 @@ class CrawlerLawsociety(BaseCrawler):
                 'lawyers': []
             }
             self.results['companies'].append(company)
-        company['lawyers'].append(lawyer)
+            self._company_index[key] = company
+            self._placeholder_keys.add(key)
+        return company
+
+
+def _parse_listing_page(content: str, extract) -> Dict[str, Any]:
+    """解析列表页：条目数据与分页信息"""
+    tree = html.fromstring(content)
+    page_param, total_pages, last_page_known = CrawlerLawsociety._extract_total_pages(tree)
+    return {
+        'records': extract(tree),
+        'next_page': CrawlerLawsociety._extract_next_page_url(tree),
+        'page_param': page_param,
+        'total_pages': total_pages,
+        'last_page_known': last_page_known
+    }
+
+
+def parse_company_list_page(content: str) -> Dict[str, Any]:
+    """解析进程池使用的公司列表页解析器"""
+    return _parse_listing_page(content, CrawlerLawsociety._extract_companies)
+
 
+def parse_lawyer_list_page(content: str) -> Dict[str, Any]:
+    """解析进程池使用的律师列表页解析器"""
+    return _parse_listing_page(content, CrawlerLawsociety._extract_list_lawyers)
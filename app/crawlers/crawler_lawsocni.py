@@ -1,22 +1,89 @@
 import re
 import asyncio
-from lxml import html
-from typing import Dict, Any, List
+from lxml import html, etree
+from typing import Dict, Any, List, AsyncIterator
 from urllib.parse import urlparse 
 from app.core.logger import logger
 from app.crawlers.base_crawler import BaseCrawler
+from app.crawlers.extraction import ExtractionSpec, FieldSpec, first_text, text_list
+from app.models.data_model import CRAWL_META_KEY
 import urllib.parse
 
+def _mailto_value(values: List[str]) -> str:
+    """提取mailto链接中的邮箱地址"""
+    if values:
+        return values[0].split(':', 1)[-1].strip()
+    return ''
+
+
+def _tel_value(values: List[str]) -> str:
+    """提取tel链接中的电话号码"""
+    if values:
+        return values[0].split(':', 1)[1] if ':' in values[0] else ""
+    return ''
+
+
+def _clean_address(values: List[str]) -> str:
+    """合并地址文本节点并清理格式"""
+    # 合并文本节点并移除所有空白字符（包括换行和制表符）
+    address_parts = [re.sub(r'\s+', ' ', elem.strip()) for elem in values if elem.strip()]
+    address = ' '.join(address_parts)
+    # 处理逗号前后的空格
+    address = re.sub(r'\s*,\s*', ', ', address)
+    # 处理连字符前后的空格（保留数字间的空格）
+    return re.sub(r'(?<!\d)\s+-\s+(?!\d)', '-', address)
+
+
+def _format_solicitor_names(values: List[str]) -> List[str]:
+    """该网站律师名字返回的全大写，进行调整以提高可读"""
+    formatted_names = []
+    for elem in values:
+        raw_name = elem.strip()
+        if not raw_name:
+            continue  
+        # 正则匹配名字和后缀（支持多种格式："NAME SUFFIX", "NAME, SUFFIX", "NAME (SUFFIX)"）
+        match = re.match(
+            r'^(?P<name>[\w\s\-\']+?)(?:\s+|\,|\()(?P<suffix>[A-Z]{2,4}(?:\s+[A-Z]{2,4})?)?\)?$',
+            raw_name
+        )
+        if match:
+            name_parts = match.group('name').split()
+            suffix = match.group('suffix') or ""
+            # 格式化名字
+            formatted_name = " ".join([part.capitalize() for part in name_parts])
+            # 追加后缀（去空格并保留原始格式）
+            if suffix:
+                formatted_name += f" {suffix.strip()}"  
+            formatted_names.append(formatted_name)
+    return [name for name in formatted_names if name]
+
+
 class CrawlerLawsocni(BaseCrawler):
     """Lawsocni网站爬虫实现，遵循项目标准爬虫接口"""
     source_name = "crawler_lawsocni" #Law Society of Northern lreland
     scrapy_id = "crawler_lawsocni"
+    supports_streaming = True
+    supports_incremental = True
+    supports_checkpoint = True
+    # 公司详情页字段规则，类定义时编译一次
+    detail_spec = ExtractionSpec({
+        'name': FieldSpec("//div[contains(@class, 'section-heading')]/h1/span/text()", first_text),
+        'email': FieldSpec("//a[contains(., 'Send Enquiry')]/@href", _mailto_value),
+        'phone': FieldSpec("//a[contains(., 'Call Now')]/@href", _tel_value),
+        'website': FieldSpec("//a[contains(., 'Visit the Website')]/@href", first_text),
+        'address': FieldSpec("//address/text()", _clean_address),
+        'solicitors': FieldSpec("//span[@class='font-bold ']/text()", _format_solicitor_names),  #这里Xpath的空格要保留，源站就是这样的
+        'areas_of_expertise': FieldSpec(
+            "//span[contains(@class, 'font-bold') and contains(@class, 'leading-[24px]')]/text()", text_list
+        ),
+    })
 
 
     def __init__(self, scrapy_url: str, scrapy_params: dict = None):
-        super().__init__(scrapy_url)
-        self.scrapy_params = scrapy_params or {}
+        super().__init__(scrapy_url, scrapy_params)
         self.firm_data: List[Dict[str, Any]] = []
+        # 流式解析搜索列表页：边下载边提取详情页URL，提前开始抓取详情
+        self.stream_list = bool(self.scrapy_params.get('stream_list', True))
     
     def _parse_html(self, html_content: str) -> html.HtmlElement:
         """使用lxml解析HTML内容，返回HtmlElement对象"""
@@ -32,49 +99,83 @@ class CrawlerLawsocni(BaseCrawler):
             'lawyers': [...]
         }
         """
-       
-        
+        try:
+            await self._run_crawl()
+            return self._format_output()
+
+        except Exception as e:
+            logger.error(f"爬取过程发生错误: {str(e)}", exc_info=True)
+            raise
+
+    async def _crawl_into_stream(self) -> None:
+        """流式爬取：每个详情页解析完成后立即产出公司数据"""
+        try:
+            await self._run_crawl()
+        except Exception as e:
+            logger.error(f"爬取过程发生错误: {str(e)}", exc_info=True)
+            raise
+
+    async def _run_crawl(self) -> None:
+        """获取搜索列表页中的详情页URL并并发抓取详情"""
+        # 断点续爬时直接使用断点中未完成的详情页URL，不再请求搜索页
+        firm_urls = self._resume_items()
+        if firm_urls is not None:
+            logger.info(f"从断点续爬 {self.source_name}，共 {len(firm_urls)} 个详情页待处理")
+            tasks = [self._fetch_and_parse_detail(url) for url in firm_urls]
+            await asyncio.gather(*tasks)
+            logger.info(f"{self.source_name} 网站续爬完成，共处理 {len(tasks)} 个详情页")
+            return
+
         parsed_url = urllib.parse.urlparse(self.scrapy_url)
         query_params = urllib.parse.parse_qs(parsed_url.query)
         
         # 严格判断是否存在limit参数
-        
-        try:
-            if 'limit' not in query_params:
-            # 构建新参数
-                query_params['limit'] = ['9999']
-                new_query = urllib.parse.urlencode(query_params, doseq=True)
-                # 重构完整URL（自动处理?和&的拼接）
-                modified_url = urllib.parse.urlunparse(
-                    (parsed_url.scheme, parsed_url.netloc, parsed_url.path,
-                    parsed_url.params, new_query, parsed_url.fragment)
-                )
-                self.logger.info(f"Added limit=9999 to URL: {modified_url}")
-            else:
-                modified_url = self.scrapy_url
-                self.logger.info(f"URL already contains limit parameter: {modified_url}")
-            # 获取搜索页面内容
-            logger.info(f"开始爬取 {self.source_name} 请求网站，URL: {self.scrapy_url}，实际请求：{modified_url}")
-            html_content = self._get_page_content(modified_url)
+        if 'limit' not in query_params:
+        # 构建新参数
+            query_params['limit'] = ['9999']
+            new_query = urllib.parse.urlencode(query_params, doseq=True)
+            # 重构完整URL（自动处理?和&的拼接）
+            modified_url = urllib.parse.urlunparse(
+                (parsed_url.scheme, parsed_url.netloc, parsed_url.path,
+                parsed_url.params, new_query, parsed_url.fragment)
+            )
+            self.logger.info(f"Added limit=9999 to URL: {modified_url}")
+        else:
+            modified_url = self.scrapy_url
+            self.logger.info(f"URL already contains limit parameter: {modified_url}")
+        # 获取搜索页面内容
+        logger.info(f"开始爬取 {self.source_name} 请求网站，URL: {self.scrapy_url}，实际请求：{modified_url}")
+        if self.stream_list:
+            # 每解析出一个详情页URL立即创建抓取任务（并发与速率由站点限速器控制）
+            tasks = []
+            async for firm_url in self._stream_firm_urls(modified_url):
+                for url in self._checkpoint_frontier([firm_url]):
+                    tasks.append(asyncio.create_task(self._fetch_and_parse_detail(url)))
+            self._checkpoint_frontier_complete()
+            if not tasks:
+                logger.warning("未提取到任何公司URL，爬取终止")
+                return
+            logger.info(f"列表页解析完成，共 {len(tasks)} 个公司URL，等待详情页爬取完成")
+        else:
+            html_content = await self._fetch_async(modified_url)
             tree = self._parse_html(html_content)
 
             # 提取公司详情页URL
             firm_urls = self._extract_firm_urls(tree)
             if not firm_urls:
                 logger.warning("未提取到任何公司URL，爬取终止")
-                return {'companies': [], 'lawyers': []}
+                return
 
             logger.info(f"成功提取到 {len(firm_urls)} 个公司URL，开始异步爬取详情页")
-            # 创建任务列表并并发执行
+            firm_urls = self._checkpoint_frontier(firm_urls)
+            self._checkpoint_frontier_complete()
+            # 创建任务列表并并发执行（并发与速率由站点限速器控制）
             tasks = [self._fetch_and_parse_detail(url) for url in firm_urls]
-            await asyncio.gather(*tasks)
+        await asyncio.gather(*tasks)
 
-            logger.info(f"{self.source_name} 网站爬取完成，共获取 {len(self.firm_data)} 家公司数据")
-            return self._format_output()
-
-        except Exception as e:
-            logger.error(f"爬取过程发生错误: {str(e)}", exc_info=True)
-            raise
+        logger.info(f"{self.source_name} 网站爬取完成，共处理 {len(tasks)} 个详情页")
+        if self.incremental:
+            logger.info(f"增量爬取统计: {self.incremental_stats}")
 
     def _extract_firm_urls(self, tree: html.HtmlElement) -> List[str]:
         """使用XPath提取公司详情页URL"""
@@ -84,49 +185,69 @@ class CrawlerLawsocni(BaseCrawler):
         xpath_expr = "//a[contains(@class, 'print')]/@href"
         return tree.xpath(xpath_expr)
 
+    async def _stream_firm_urls(self, url: str) -> AsyncIterator[str]:
+        """流式下载并增量解析搜索列表页，逐个产出公司详情页URL
+
+        与_extract_firm_urls的XPath规则一致（class包含print的a标签的href），
+        已处理完的元素立即从树中移除，内存占用与列表页大小无关
+        """
+        parser = etree.HTMLPullParser(events=('end',))
+
+        def drain_events():
+            for _, elem in parser.read_events():
+                if elem.tag == 'a' and 'print' in (elem.get('class') or ''):
+                    href = elem.get('href')
+                    if href is not None:
+                        yield href
+                # 结束事件按文档顺序触发，子元素均已处理，可安全释放当前元素及其之前的兄弟节点
+                elem.clear(keep_tail=True)
+                parent = elem.getparent()
+                if parent is not None:
+                    while elem.getprevious() is not None:
+                        del parent[0]
+
+        async for chunk in self._stream_async(url):
+            parser.feed(chunk)
+            for href in drain_events():
+                yield href
+        parser.close()
+        for href in drain_events():
+            yield href
+
     async def _fetch_and_parse_detail(self, firm_url: str) -> None:
         """异步获取并解析公司详情页"""
         try:
-            # 使用线程池执行同步的网络请求，避免阻塞事件循环
-            loop = asyncio.get_event_loop()
-            html_content = await loop.run_in_executor(
-                None, self._get_page_content, firm_url
-            )
-            tree = self._parse_html(html_content)
-            firm_info = self._parse_detail_page(tree, firm_url)
+            html_content = await self._fetch_async(firm_url)
+            fingerprint = self.compute_fingerprint(html_content)
+            if self._check_fingerprint(firm_url, fingerprint):
+                logger.info(f"详情页 {firm_url} 内容未变化，跳过解析及入库处理")
+                self._checkpoint_done(firm_url)
+                return
+            # 解析在解析进程池中执行（未配置进程数时在当前线程执行）
+            firm_info = await self._parse_in_pool('lawsocni_detail', html_content)
             if firm_info:
-                self.firm_data.append(firm_info)
+                firm_info['firm_url'] = firm_url
+                firm_info['fingerprint'] = fingerprint
+                if self.is_streaming:
+                    await self._emit_company(self._format_company(firm_info))
+                else:
+                    self.firm_data.append(firm_info)
+            else:
+                logger.warning(f"无法提取公司名称，URL: {firm_url}")
+                # 详情页无有效公司数据，重试也不会改变结果
+                self._checkpoint_done(firm_url)
         except Exception as e:
             logger.error(f"处理详情页 {firm_url} 失败: {str(e)}")
+            self._checkpoint_failed(firm_url)
 
-    def _parse_detail_page(self, tree, firm_url: str) -> Dict[str, Any]:
-        """解析公司详情页数据"""
-        # 提取公司基本信息
-        firm_names = tree.xpath("//div[contains(@class, 'section-heading')]/h1/span/text()")
-        firm_name = firm_names[0].strip() if firm_names else ""
-        if not firm_name:
-            logger.warning(f"无法提取公司名称，URL: {firm_url}")
+    @classmethod
+    def _extract_detail(cls, tree) -> Dict[str, Any]:
+        """按声明式规则一次性提取公司详情页全部字段，无公司名称时返回空字典"""
+        firm_info = cls.detail_spec.extract(tree)
+        if not firm_info['name']:
             return {}
-
-        # 提取联系信息
-        firm_email = self._extract_email(tree)
-        firm_phone = self._extract_phone(tree)
-        firm_website = self._extract_website(tree)
-        firm_address, city = self._extract_address(tree)
-        solicitors = self._extract_solicitors(tree)
-        areas_of_expertise = self._extract_expertise(tree)
-        
-
-        return {
-            'name': firm_name,
-            'email': firm_email,
-            'phone': firm_phone,
-            'website': firm_website,
-            'address': firm_address,
-            'solicitors': solicitors,
-            'areas_of_expertise': areas_of_expertise,
-            'city': city  # 添加城市信息
-        }
+        firm_info['city'] = cls._extract_city_from_address(firm_info['address'])  # 添加城市信息
+        return firm_info
 
     def _format_output(self) -> Dict[str, List[Dict[str, Any]]]:
         """格式化输出为项目标准格式"""
@@ -134,90 +255,46 @@ class CrawlerLawsocni(BaseCrawler):
         # lawyers = []
 
         for firm in self.firm_data:
-            website = firm['website']
-            domain = ""
-            if website:
-                parsed_url = urlparse(website)
-                domain = parsed_url.netloc or parsed_url.path.split('/')[0]
-                domain = domain.lstrip('www.')
-            
-            
-            # 公司数据
-            company = {
-                'name': firm['name'],
-                'company_email': firm['email'],
-                'company_phone': firm['phone'],
-                'company_address': firm['address'],
-                'domains': domain,
-                'areas_of_law': firm['areas_of_expertise'],
-                'source_name':self.source_name,
-                'redundant_info': {
-                    'city': firm['city']  # 添加城市信息
-                },
-                'lawyers': [{
-                    'name': lawyer_name,
-                    'practice_areas': firm['areas_of_expertise'],
-                    'source_name':self.source_name
-                    
-                }  for lawyer_name in firm['solicitors'] if lawyer_name.strip()]
-            }
+            company = self._format_company(firm)
             companies.append(company)
             logger.info(f"格式化公司数据: {company['name']}, 律师数量: {len(company['lawyers'])}")
         logger.info(f"数据格式化完成，共 {len(companies)} 家公司，{sum(len(c['lawyers']) for c in companies)} 名律师")
         return {'companies': companies}
 
+    def _format_company(self, firm: Dict[str, Any]) -> Dict[str, Any]:
+        """将单个公司详情格式化为项目标准格式"""
+        website = firm['website']
+        domain = ""
+        if website:
+            parsed_url = urlparse(website)
+            domain = parsed_url.netloc or parsed_url.path.split('/')[0]
+            domain = domain.lstrip('www.')
 
-    # 辅助提取方法
-    def _safe_extract(self, tree: html.HtmlElement, xpath: str) -> str:
-        """安全提取单个元素文本"""
-        elements = tree.xpath(xpath)
-        if elements:
-            return elements[0].strip() if isinstance(elements[0], str) else elements[0].text.strip()
-        return ''
-    
-    def _extract_website(self, tree: html.HtmlElement) -> str:
-        """提取网站地址"""
-        try:
-            links = tree.xpath("//a[contains(., 'Visit the Website')]/@href")
-            if links:
-                return links[0].strip()
-            return ''
-        except Exception as e:
-            self.logger.error(f"提取网站链接失败: {str(e)}")
-            return ''
-    def _extract_email(self, tree: html.HtmlElement) -> str:
-        """提取邮箱地址"""
-        mailto_links = tree.xpath("//a[contains(., 'Send Enquiry')]/@href")
-        if mailto_links:
-            mailto_link = mailto_links[0]
-            return mailto_link.split(':', 1)[-1].strip()
-        return ''
+        # 公司数据
+        return {
+            'name': firm['name'],
+            'company_email': firm['email'],
+            'company_phone': firm['phone'],
+            'company_address': firm['address'],
+            'domains': domain,
+            'areas_of_law': firm['areas_of_expertise'],
+            'source_name':self.source_name,
+            'redundant_info': {
+                'city': firm['city']  # 添加城市信息
+            },
+            'lawyers': [{
+                'name': lawyer_name,
+                'practice_areas': firm['areas_of_expertise'],
+                'source_name':self.source_name
+                
+            }  for lawyer_name in firm['solicitors'] if lawyer_name.strip()],
+            CRAWL_META_KEY: {'item_key': firm['firm_url'], 'fingerprint': firm['fingerprint']}
+        }
 
-    def _extract_phone(self, tree: html.HtmlElement) -> str:
-        """使用XPath提取电话"""
-        tel_links = tree.xpath("//a[contains(., 'Call Now')]/@href")
-        if tel_links:
-            return tel_links[0].split(':', 1)[1] if ':' in tel_links[0] else ""
-        return ''
 
-    def _extract_address(self, tree: html.HtmlElement) -> str:
-        """使用XPath提取地址并清理格式"""
-        try:
-            import re
-            address_elements = tree.xpath("//address/text()")
-            # 合并文本节点并移除所有空白字符（包括换行和制表符）
-            address_parts = [re.sub(r'\s+', ' ', elem.strip()) for elem in address_elements if elem.strip()]
-            address = ' '.join(address_parts)
-            # 处理逗号前后的空格
-            address = re.sub(r'\s*,\s*', ', ', address)
-            # 处理连字符前后的空格（保留数字间的空格）
-            address = re.sub(r'(?<!\d)\s+-\s+(?!\d)', '-', address)
-            city = self._extract_city_from_address(address)
-            return address, city
-        except Exception as e:
-            self.logger.error(f"提取地址失败: {str(e)}")
-            return ''
-    def _extract_city_from_address(self, address: str) -> str:
+    # 辅助提取方法
+    @staticmethod
+    def _extract_city_from_address(address: str) -> str:
         """从地址字符串中提取城市名"""
         if not address:
             return ''
@@ -237,34 +314,8 @@ class CrawlerLawsocni(BaseCrawler):
                 city = address_parts[city_index-1]
             return city
         return ''
-    def _extract_solicitors(self, tree: html.HtmlElement) -> List[str]:
-        """提取律师列表"""
-        elements = tree.xpath("//span[@class='font-bold ']/text()") #这里Xpath的空格要保留，源站就是这样的
-        # 该网站律师名字返回的全大写，进行调整以提高可读
-        formatted_names = []
-        for elem in elements:
-            raw_name = elem.strip()
-            if not raw_name:
-                continue  
-            # 正则匹配名字和后缀（支持多种格式："NAME SUFFIX", "NAME, SUFFIX", "NAME (SUFFIX)"）
-            match = re.match(
-            r'^(?P<name>[\w\s\-\']+?)(?:\s+|\,|\()(?P<suffix>[A-Z]{2,4}(?:\s+[A-Z]{2,4})?)?\)?$',
-            raw_name
-        )
-            if match:
-                name_parts = match.group('name').split()
-                suffix = match.group('suffix') or ""
-                # 格式化名字
-                formatted_name = " ".join([part.capitalize() for part in name_parts])
-                # 追加后缀（去空格并保留原始格式）
-                if suffix:
-                    formatted_name += f" {suffix.strip()}"  
-                formatted_names.append(formatted_name)
-    
-        return [name for name in formatted_names if name]
-       
 
-    def _extract_expertise(self, tree: html.HtmlElement) -> List[str]:
-        """提取专业领域列表"""
-        elements = tree.xpath("//span[contains(@class, 'font-bold') and contains(@class, 'leading-[24px]')]/text()")
-        return [elem.strip() for elem in elements if elem.strip()]
\ No newline at end of file
+
+def parse_detail_page(content: str) -> Dict[str, Any]:
+    """解析进程池使用的公司详情页解析器：原始HTML -> 公司字段字典"""
+    return CrawlerLawsocni._extract_detail(html.fromstring(content))
@@ -0,0 +1,70 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+from lxml import etree
+
+
+def first_text(values: List[Any]) -> str:
+    """取第一个结果的文本并去除首尾空白（与DataCleaningService.safe_extract一致），无结果时返回空字符串"""
+    if not values:
+        return ''
+    value = values[0]
+    if isinstance(value, str):
+        return value.strip()
+    return (value.text or '').strip()
+
+
+def text_list(values: List[Any]) -> List[str]:
+    """所有文本结果去除首尾空白，丢弃空字符串"""
+    return [value.strip() for value in values if value.strip()]
+
+
+class FieldSpec:
+    """单个字段的提取规则
+
+    Args:
+        xpath: XPath表达式；传入多个表达式时按顺序拼接各自的结果
+        post: 后处理函数，接收XPath结果列表，返回字段值；未指定时返回原始结果列表
+        default: 后处理结果为空（None、空字符串或空列表）时使用的默认值
+    """
+
+    __slots__ = ('xpaths', 'post', 'default')
+
+    def __init__(self, xpath: Union[str, Sequence[str]], post: Optional[Callable[[List[Any]], Any]] = None,
+                 default: Any = None):
+        self.xpaths = (xpath,) if isinstance(xpath, str) else tuple(xpath)
+        self.post = post
+        self.default = default
+
+
+class ExtractionSpec:
+    """声明式字段提取规则集合
+
+    字段的XPath表达式在创建时编译为etree.XPath对象，通常作为爬虫的类属性定义，
+    每个进程只编译一次；extract对每个元素一次性提取全部字段，避免逐字段重复解析表达式。
+    """
+
+    def __init__(self, fields: Dict[str, FieldSpec]):
+        self.fields = fields
+        self._compiled = [
+            (name, [etree.XPath(xpath) for xpath in field.xpaths], field)
+            for name, field in fields.items()
+        ]
+
+    def extract(self, element: etree._Element) -> Dict[str, Any]:
+        """对单个元素（或整棵树）提取全部字段"""
+        data = {}
+        for name, xpaths, field in self._compiled:
+            if len(xpaths) == 1:
+                values = xpaths[0](element)
+            else:
+                values = []
+                for xpath in xpaths:
+                    values.extend(xpath(element))
+            value = field.post(values) if field.post is not None else values
+            if field.default is not None and (value is None or value == '' or value == []):
+                value = field.default
+            data[name] = value
+        return data
+
+    def extract_all(self, elements: List[etree._Element]) -> List[Dict[str, Any]]:
+        """对多个元素逐个提取全部字段"""
+        return [self.extract(element) for element in elements]
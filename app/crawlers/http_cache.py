@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class HttpCache:
+    """爬虫HTTP响应的磁盘缓存（按内容寻址）
+
+    目录结构:
+        index/<sha256(url)>.json  URL元数据：url、etag、last_modified、fetched_at、body_sha
+        objects/<sha256(body)>    响应体，相同内容只存一份
+
+    在TTL内直接返回缓存；过期后携带If-None-Match/If-Modified-Since发起条件请求，
+    304时沿用缓存内容。总大小超过上限时按最近使用时间淘汰响应体；
+    超过max_age未使用的条目及响应体已被淘汰的索引每隔一段时间清理一次。
+    """
+
+    # 两次按时间清理之间的最小间隔（秒）
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, root: str, ttl: int, max_bytes: int, max_age: int):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._last_pruned = 0.0
+        self._index_dir = self.root / "index"
+        self._objects_dir = self.root / "objects"
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+    @staticmethod
+    def _sha256(value: bytes) -> str:
+        return hashlib.sha256(value).hexdigest()
+
+    def _index_path(self, url: str) -> Path:
+        return self._index_dir / f"{self._sha256(url.encode('utf-8'))}.json"
+
+    def _object_path(self, body_sha: str) -> Path:
+        return self._objects_dir / body_sha
+
+    def _ensure_dirs(self) -> None:
+        self._index_dir.mkdir(parents=True, exist_ok=True)
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+        if self._total_bytes is None:
+            self._total_bytes = sum(p.stat().st_size for p in self._objects_dir.iterdir())
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """读取URL的缓存条目（含响应体），不存在或响应体已被淘汰时返回None"""
+        index_path = self._index_path(url)
+        try:
+            entry = json.loads(index_path.read_text(encoding='utf-8'))
+            body = self._object_path(entry['body_sha']).read_text(encoding='utf-8')
+        except (OSError, ValueError, KeyError):
+            return None
+        entry['body'] = body
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """缓存是否仍在TTL内"""
+        return time.time() - entry.get('fetched_at', 0) < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """构建条件请求头"""
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """保存响应体及校验信息"""
+        data = body.encode('utf-8')
+        body_sha = self._sha256(data)
+        with self._lock:
+            self._ensure_dirs()
+            object_path = self._object_path(body_sha)
+            if not object_path.exists():
+                tmp_path = object_path.with_suffix('.tmp')
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, object_path)
+                self._total_bytes += len(data)
+            else:
+                os.utime(object_path)
+            self._write_index(url, {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': time.time(),
+                'body_sha': body_sha
+            })
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            if time.time() - self._last_pruned >= self.PRUNE_INTERVAL:
+                self._prune()
+
+    def touch(self, url: str, entry: Dict[str, Any]) -> None:
+        """304响应后刷新缓存的获取时间"""
+        with self._lock:
+            self._ensure_dirs()
+            meta = {k: v for k, v in entry.items() if k != 'body'}
+            meta['fetched_at'] = time.time()
+            self._write_index(url, meta)
+            try:
+                os.utime(self._object_path(meta['body_sha']))
+            except OSError:
+                pass
+
+    def _write_index(self, url: str, meta: Dict[str, Any]) -> None:
+        index_path = self._index_path(url)
+        tmp_path = index_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(meta), encoding='utf-8')
+        os.replace(tmp_path, index_path)
+
+    def _evict(self) -> None:
+        """按最近使用时间淘汰响应体，直到总大小降到上限的90%"""
+        target = self.max_bytes * 0.9
+        objects = sorted(
+            (p for p in self._objects_dir.iterdir() if p.suffix != '.tmp'),
+            key=lambda p: p.stat().st_mtime
+        )
+        removed = 0
+        for path in objects:
+            if self._total_bytes <= target:
+                break
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._total_bytes -= size
+            removed += 1
+        # 响应体被淘汰的索引在lookup时视为未命中，由_prune定期清理
+        logger.info(f"HTTP缓存超过上限，淘汰 {removed} 个响应体，当前大小 {self._total_bytes} 字节")
+
+    def _prune(self) -> None:
+        """清理超过max_age未使用的响应体（使用时刷新mtime），以及获取时间超过max_age或响应体已不存在的索引"""
+        self._last_pruned = time.time()
+        cutoff = self._last_pruned - self.max_age
+        removed_objects = removed_index = 0
+        for path in list(self._objects_dir.iterdir()):
+            try:
+                stat = path.stat()
+                if stat.st_mtime < cutoff:
+                    path.unlink()
+                    removed_objects += 1
+                    if path.suffix != '.tmp':
+                        self._total_bytes -= stat.st_size
+            except OSError:
+                continue
+        for path in list(self._index_dir.iterdir()):
+            try:
+                if path.suffix == '.tmp':
+                    stale = path.stat().st_mtime < cutoff
+                else:
+                    entry = json.loads(path.read_text(encoding='utf-8'))
+                    stale = entry.get('fetched_at', 0) < cutoff or not self._object_path(entry['body_sha']).exists()
+                if stale:
+                    path.unlink()
+                    removed_index += 1
+            except (OSError, ValueError, KeyError):
+                path.unlink(missing_ok=True)
+                removed_index += 1
+        if removed_objects or removed_index:
+            logger.info(f"HTTP缓存清理: 删除 {removed_objects} 个响应体、{removed_index} 个索引，当前大小 {self._total_bytes} 字节")
+
+
+http_cache = HttpCache(
+    root=settings.CRAWLER_CACHE_DIR,
+    ttl=settings.CRAWLER_CACHE_TTL,
+    max_bytes=settings.CRAWLER_CACHE_MAX_BYTES,
+    max_age=settings.CRAWLER_CACHE_MAX_AGE
+)
@@ -0,0 +1,73 @@
+import asyncio
+import importlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Union
+from app.core.config import settings
+from app.core.logger import logger
+
+# 解析器ID -> "模块路径:函数名"
+# 解析函数必须是模块顶层函数：接收原始页面内容（bytes或str），返回可序列化的普通dict/list，
+# 子进程按路径导入，不传递爬虫实例或lxml对象
+PARSERS: Dict[str, str] = {
+    'lawsocni_detail': 'app.crawlers.crawler_lawsocni:parse_detail_page',
+    'lawsociety_company_list': 'app.crawlers.crawler_lawsociety:parse_company_list_page',
+    'lawsociety_lawyer_list': 'app.crawlers.crawler_lawsociety:parse_lawyer_list_page',
+}
+
+_resolved: Dict[str, Callable[[Union[bytes, str]], Any]] = {}
+
+
+def _resolve_parser(parser_id: str) -> Callable[[Union[bytes, str]], Any]:
+    parser = _resolved.get(parser_id)
+    if parser is None:
+        if parser_id not in PARSERS:
+            raise ValueError(f"未注册的解析器: {parser_id}")
+        module_path, func_name = PARSERS[parser_id].split(':')
+        parser = getattr(importlib.import_module(module_path), func_name)
+        _resolved[parser_id] = parser
+    return parser
+
+
+def run_parser(parser_id: str, content: Union[bytes, str]) -> Any:
+    """执行解析器（在子进程或当前线程中）"""
+    return _resolve_parser(parser_id)(content)
+
+
+class ParsePool:
+    """HTML解析进程池
+
+    抓取仍在事件循环中进行，解析（html.fromstring与XPath提取）交给子进程，
+    避免大量详情页同时到达时解析阻塞所有在途请求。
+    进程数为0时在当前线程内直接解析（与未使用进程池时的行为一致）。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(0, int(workers))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                logger.info(f"HTML解析进程池已启动，进程数: {self.workers}")
+            return self._executor
+
+    async def parse(self, parser_id: str, content: Union[bytes, str]) -> Any:
+        """解析页面内容，返回解析器产出的普通数据"""
+        if self.workers == 0:
+            return run_parser(parser_id, content)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), run_parser, parser_id, content)
+
+    def shutdown(self) -> None:
+        """关闭进程池（应用关闭时调用）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("HTML解析进程池已关闭")
+
+
+parse_pool = ParsePool(settings.CRAWLER_PARSE_WORKERS)
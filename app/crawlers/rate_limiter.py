@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional, Set, Tuple
+from urllib.parse import urlparse
+from app.core.logger import logger
+
+
+class HostRateLimiter:
+    """单个站点的令牌桶限速器
+
+    同时限制请求速率（requests/sec）与在途请求数（max_in_flight），
+    同一站点的所有爬虫实例、所有任务共享同一个限速器
+    """
+
+    def __init__(self, host: str, rate: float, max_in_flight: int):
+        self.validate(rate, max_in_flight)
+        self.host = host
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        # 令牌计算只做简单的算术，用线程锁保护即可同时服务同步与异步调用
+        self._token_lock = threading.Lock()
+        self._in_flight = 0
+        self._slot_condition: Optional[asyncio.Condition] = None
+        self._slot_loop: Optional[asyncio.AbstractEventLoop] = None
+        # 唤醒等待者的任务需保留引用，否则可能在执行前被回收
+        self._wake_tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def validate(rate: float, max_in_flight: int) -> None:
+        """校验限速参数：速率为0时令牌永远无法补充（且计算等待时间会除零），在途上限小于1时请求永远无法发出"""
+        if not rate > 0:
+            raise ValueError(f"rate_limit必须大于0: {rate}")
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight必须不小于1: {max_in_flight}")
+
+    @property
+    def _capacity(self) -> float:
+        # 桶容量即允许的突发请求数，至少为1
+        return max(1.0, self.rate)
+
+    def configure(self, rate: float, max_in_flight: int) -> None:
+        """调整限速参数，对已在等待的请求同样生效"""
+        self.validate(rate, max_in_flight)
+        if rate == self.rate and max_in_flight == self.max_in_flight:
+            return
+        logger.info(f"调整站点 {self.host} 限速: {self.rate}->{rate} req/s, 在途上限 {self.max_in_flight}->{max_in_flight}")
+        raised = max_in_flight > self.max_in_flight
+        with self._token_lock:
+            self.rate = rate
+            self.max_in_flight = max_in_flight
+            self._tokens = min(self._tokens, self._capacity)
+        if raised:
+            self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        """在途上限提高后唤醒所有等待名额的请求；可能在其他线程中调用，唤醒提交到条件变量所属的事件循环执行"""
+        condition, loop = self._slot_condition, self._slot_loop
+        if condition is None or loop is None or loop.is_closed():
+            return
+
+        async def notify_all() -> None:
+            async with condition:
+                condition.notify_all()
+
+        def schedule() -> None:
+            task = loop.create_task(notify_all())
+            self._wake_tasks.add(task)
+            task.add_done_callback(self._wake_tasks.discard)
+
+        try:
+            loop.call_soon_threadsafe(schedule)
+        except RuntimeError:
+            # 事件循环已关闭，没有需要唤醒的等待者
+            pass
+
+    def _reserve_token(self) -> float:
+        """预占一个令牌，返回取得该令牌前需要等待的秒数"""
+        with self._token_lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def _get_slot_condition(self) -> asyncio.Condition:
+        # asyncio同步原语绑定事件循环，循环变化时（如脚本多次asyncio.run）重建
+        loop = asyncio.get_running_loop()
+        if self._slot_condition is None or self._slot_loop is not loop:
+            self._slot_condition = asyncio.Condition()
+            self._slot_loop = loop
+            self._in_flight = 0
+        return self._slot_condition
+
+    async def acquire(self) -> None:
+        """占用一个在途名额并取得一个令牌"""
+        condition = self._get_slot_condition()
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < self.max_in_flight)
+            self._in_flight += 1
+        try:
+            await asyncio.sleep(self._reserve_token())
+        except BaseException:
+            await self.release()
+            raise
+
+    async def release(self) -> None:
+        """归还在途名额"""
+        condition = self._get_slot_condition()
+        async with condition:
+            self._in_flight -= 1
+            condition.notify()
+
+    def wait_blocking(self) -> None:
+        """同步请求使用：阻塞当前线程直到取得令牌（不计在途名额）"""
+        time.sleep(self._reserve_token())
+
+    async def __aenter__(self) -> "HostRateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.release()
+
+
+class RateLimiterRegistry:
+    """按站点(host)维护进程内共享的限速器
+
+    同一站点被多个爬虫以不同参数使用时，限速器取其中最严格的速率与在途上限，
+    而不是由最后一个调用者决定；爬虫注销（或被回收）后按剩余爬虫的参数重新计算
+    """
+
+    def __init__(self):
+        self._limiters: Dict[str, HostRateLimiter] = {}
+        # 每个站点各使用者请求的(rate, max_in_flight)，使用者被回收后自动移除
+        self._requested: Dict[str, "weakref.WeakKeyDictionary[Any, Tuple[float, int]]"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, rate: float, max_in_flight: int, owner: Any) -> HostRateLimiter:
+        """获取URL所属站点的限速器，并登记owner请求的限速参数"""
+        HostRateLimiter.validate(rate, max_in_flight)
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = HostRateLimiter(host, rate, max_in_flight)
+                self._limiters[host] = limiter
+                self._requested[host] = weakref.WeakKeyDictionary()
+            # 每次都重新计算：被回收的使用者不会主动注销，其收紧的参数在下次获取时放宽
+            requested = self._requested[host]
+            requested[owner] = (rate, max_in_flight)
+            self._apply(limiter, requested)
+        return limiter
+
+    def unregister(self, owner: Any) -> None:
+        """owner不再使用任何站点，放宽由它收紧的限速参数"""
+        with self._lock:
+            for host, requested in self._requested.items():
+                if requested.pop(owner, None) is not None:
+                    self._apply(self._limiters[host], requested)
+
+    @staticmethod
+    def _apply(limiter: HostRateLimiter, requested: "weakref.WeakKeyDictionary[Any, Tuple[float, int]]") -> None:
+        limits = list(requested.values())
+        if limits:
+            limiter.configure(min(rate for rate, _ in limits), min(max_in_flight for _, max_in_flight in limits))
+
+
+rate_limiters = RateLimiterRegistry()
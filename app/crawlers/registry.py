@@ -0,0 +1,73 @@
+import importlib
+from typing import Any, Dict, Iterable, Optional, Type
+from app.core.logger import logger
+from app.crawlers.base_crawler import BaseCrawler
+
+
+class CrawlerRegistry:
+    """爬虫注册表：scrapy_id -> 爬虫类
+
+    应用启动时按ScrapyId预先导入全部爬虫模块，任务分发只需一次字典查找，
+    请求路径上不再有模块导入开销；未实现的scrapy_id在启动日志与创建任务时即可发现。
+    爬虫能力（流式、增量、断点续爬、最大并发）由爬虫类属性声明。
+    """
+
+    def __init__(self):
+        self._crawlers: Dict[str, Type[BaseCrawler]] = {}
+        self._loaded = False
+
+    @staticmethod
+    def _class_name(scrapy_id: str) -> str:
+        """按命名约定由scrapy_id得到类名，如crawler_adviser_finder -> CrawlerAdviserFinder"""
+        if '_' in scrapy_id:
+            return "Crawler" + "".join(part.capitalize() for part in scrapy_id.split('_')[1:])
+        return f"Crawler{scrapy_id.capitalize()}"
+
+    def register(self, scrapy_id: str, crawler_class: Type[BaseCrawler]) -> None:
+        if not (isinstance(crawler_class, type) and issubclass(crawler_class, BaseCrawler)):
+            raise TypeError(f"{crawler_class!r} 不是BaseCrawler的子类")
+        self._crawlers[scrapy_id] = crawler_class
+
+    def load(self, scrapy_ids: Optional[Iterable[str]] = None) -> None:
+        """导入并注册爬虫类，默认加载ScrapyId中的全部爬虫；模块或类不存在时记录警告并跳过"""
+        if scrapy_ids is None:
+            from app.models.data_model import ScrapyId
+            scrapy_ids = [scrapy_id.value for scrapy_id in ScrapyId]
+        for scrapy_id in scrapy_ids:
+            scrapy_id = getattr(scrapy_id, 'value', scrapy_id)
+            if scrapy_id in self._crawlers:
+                continue
+            try:
+                module = importlib.import_module(f"app.crawlers.{scrapy_id}")
+                self.register(scrapy_id, getattr(module, self._class_name(scrapy_id)))
+            except (ImportError, AttributeError, TypeError) as e:
+                logger.warning(f"爬虫 {scrapy_id} 加载失败，已跳过: {str(e)}")
+        self._loaded = True
+        logger.info(f"已加载爬虫: {', '.join(self._crawlers) or '无'}")
+
+    def get(self, scrapy_id: str) -> Type[BaseCrawler]:
+        """按scrapy_id获取爬虫类，未注册时抛出ValueError"""
+        if not self._loaded:
+            # 未经应用启动流程（如脚本中直接执行任务）时在首次使用时加载
+            self.load()
+        crawler_class = self._crawlers.get(scrapy_id)
+        if crawler_class is None:
+            raise ValueError(f"未注册的爬虫: {scrapy_id}")
+        return crawler_class
+
+    def capabilities(self, scrapy_id: str) -> Dict[str, Any]:
+        """爬虫声明的能力"""
+        crawler_class = self.get(scrapy_id)
+        return {
+            'streaming': crawler_class.supports_streaming,
+            'incremental': crawler_class.supports_incremental,
+            'checkpoint': crawler_class.supports_checkpoint,
+            'max_concurrency': crawler_class.max_concurrency,
+            'rate_limit': crawler_class.rate_limit,
+        }
+
+    def __contains__(self, scrapy_id: str) -> bool:
+        return scrapy_id in self._crawlers
+
+
+crawler_registry = CrawlerRegistry()
@@ -0,0 +1,225 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Mapping, Optional, Union
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+from app.core.config import settings
+from app.core.logger import logger
+
+HTTP_MODES = ('live', 'record', 'replay')
+# 录制时不保存的响应头：响应体已解压，长度与传输编码不再适用
+_SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+# URL中的凭据参数（如Google Geocoding的key），不写入录制文件，也不参与录制键
+CREDENTIAL_PARAMS = frozenset(('key', 'api_key', 'apikey', 'access_token', 'token', 'client_secret', 'secret',
+                               'password', 'signature', 'sig'))
+# 携带这些请求头的请求返回的是登录后的内容，不录制
+CREDENTIAL_HEADERS = frozenset(('cookie', 'authorization', 'proxy-authorization'))
+
+
+def canonical_url(url: Union[str, URL], params: Optional[Mapping[str, Any]] = None) -> str:
+    """合并查询参数并统一URL编码，作为录制键的一部分"""
+    url = URL(str(url))
+    if params:
+        url = url.update_query(params)
+    return str(url)
+
+
+def redact_url(url: Union[str, URL]) -> str:
+    """去除URL中的凭据参数，录制文件与录制键只使用去除后的URL"""
+    url = URL(str(url))
+    query = [(name, value) for name, value in url.query.items() if name.lower() not in CREDENTIAL_PARAMS]
+    return str(url.with_query(query)) if len(query) != len(url.query) else str(url)
+
+
+def has_credentials(headers: Optional[Mapping[str, str]]) -> bool:
+    """请求头中是否有非空的Cookie/Authorization"""
+    return any(name.lower() in CREDENTIAL_HEADERS and value for name, value in (headers or {}).items())
+
+
+def request_key(method: str, url: str, data: Any = None) -> str:
+    """请求的录制键：sha256(方法 + 去除凭据参数的规范化URL + 请求体)"""
+    if data is None:
+        body = b''
+    elif isinstance(data, bytes):
+        body = data
+    elif isinstance(data, str):
+        body = data.encode('utf-8')
+    else:
+        body = json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    digest = hashlib.sha256(f"{method.upper()} {redact_url(canonical_url(url))}\n".encode('utf-8'))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class ReplayStore:
+    """录制的HTTP响应（每个爬虫一个目录）
+
+    目录结构:
+        <key>.json  元数据：method、url、status、headers
+        <key>.body  响应体（解压后的原始字节）
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            entry = json.loads((self.root / f"{key}.json").read_text(encoding='utf-8'))
+            entry['body'] = (self.root / f"{key}.body").read_bytes()
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, key: str, method: str, url: str, status: int, headers: Mapping[str, str], body: bytes) -> None:
+        meta = {
+            'method': method.upper(),
+            'url': url,
+            'status': status,
+            'headers': [[name, value] for name, value in headers.items() if name.lower() not in _SKIPPED_HEADERS],
+        }
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            (self.root / f"{key}.body").write_bytes(body)
+            # 元数据最后写入（原子替换），存在元数据即表示录制完整
+            tmp_path = self.root / f"{key}.json.{os.getpid()}.tmp"
+            tmp_path.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, self.root / f"{key}.json")
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.root.glob('*.body')) if self.root.exists() else 0
+
+
+class _ReplayContent:
+    """响应体读取接口（对应aiohttp的response.content）"""
+
+    def __init__(self, body: bytes):
+        self._buffer = io.BytesIO(body)
+
+    async def read(self, n: int = -1) -> bytes:
+        return self._buffer.read(n)
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        while True:
+            chunk = self._buffer.read(n)
+            if not chunk:
+                return
+            yield chunk
+
+
+class ReplayResponse:
+    """由录制内容构造的响应，提供爬虫用到的aiohttp.ClientResponse接口"""
+
+    def __init__(self, method: str, url: str, status: int, headers: CIMultiDict, body: bytes):
+        self.method = method.upper()
+        self.url = URL(url)
+        self.status = status
+        self.reason = 'Replayed' if status < 400 else 'Replayed error'
+        self.headers = CIMultiDictProxy(headers)
+        self.content = _ReplayContent(body)
+        self._body = body
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any]) -> 'ReplayResponse':
+        return cls(entry['method'], entry['url'], entry['status'], CIMultiDict(entry['headers']), entry['body'])
+
+    @property
+    def charset(self) -> str:
+        mimetype = aiohttp.helpers.parse_mimetype(self.headers.get('Content-Type', ''))
+        return mimetype.parameters.get('charset') or 'utf-8'
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        return self._body.decode(encoding or self.charset, errors='replace')
+
+    async def json(self, **kwargs) -> Any:
+        return json.loads(self._body.decode(self.charset))
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            request_info = aiohttp.RequestInfo(self.url, self.method, CIMultiDictProxy(CIMultiDict()), self.url)
+            raise aiohttp.ClientResponseError(request_info, (), status=self.status, message=self.reason,
+                                              headers=self.headers)
+
+
+class HttpReplay:
+    """爬虫HTTP请求的录制/回放层
+
+    live:   正常发送请求（可按CRAWLER_HTTP_REWRITE将URL前缀改写到本地fixture服务器）
+    record: 发送真实请求，并把响应（状态码、响应头、解压后的响应体）录制到爬虫的回放目录
+    replay: 不访问网络，从回放目录返回录制的响应；未录制的请求返回404
+
+    录制键由方法、规范化URL与请求体决定，与请求头、Cookie无关。
+    URL中的凭据参数（CREDENTIAL_PARAMS）不写入录制文件也不参与录制键；
+    携带Cookie或Authorization请求头的请求照常发送但不录制（响应为登录后的内容），回放时按未录制处理。
+    """
+
+    def __init__(self, mode: str, store: ReplayStore):
+        if mode not in HTTP_MODES:
+            raise ValueError(f"无效的http_mode: {mode}，可选: {', '.join(HTTP_MODES)}")
+        self.mode = mode
+        self.store = store
+        self.stats = {'requests': 0, 'bytes': 0, 'recorded': 0, 'replayed': 0, 'missed': 0, 'unrecorded': 0}
+
+    @classmethod
+    def for_crawler(cls, scrapy_id: Optional[str], mode: Optional[str] = None) -> 'HttpReplay':
+        return cls(mode or settings.CRAWLER_HTTP_MODE, ReplayStore(Path(settings.CRAWLER_REPLAY_DIR) / (scrapy_id or 'default')))
+
+    @staticmethod
+    def rewrite_url(url: str) -> str:
+        """按CRAWLER_HTTP_REWRITE改写URL前缀（如把https://指向本地fixture服务器）"""
+        for prefix, replacement in settings.CRAWLER_HTTP_REWRITE.items():
+            if url.startswith(prefix):
+                return replacement + url[len(prefix):]
+        return url
+
+    @asynccontextmanager
+    async def request(
+        self,
+        session: aiohttp.ClientSession,
+        method: str,
+        url: str,
+        params: Optional[Mapping[str, Any]] = None,
+        data: Any = None,
+        **kwargs
+    ) -> AsyncIterator[Union[aiohttp.ClientResponse, ReplayResponse]]:
+        """发送请求（或回放录制内容），用法与session.request一致：async with ... as response"""
+        self.stats['requests'] += 1
+        full_url = canonical_url(url, params)
+        stored_url = redact_url(full_url)
+
+        if self.mode == 'replay':
+            entry = self.store.get(request_key(method, full_url, data))
+            if entry is None:
+                self.stats['missed'] += 1
+                logger.warning(f"未录制的请求: {method.upper()} {stored_url}")
+                yield ReplayResponse(method, full_url, 404, CIMultiDict(), b'')
+                return
+            self.stats['replayed'] += 1
+            self.stats['bytes'] += len(entry['body'])
+            yield ReplayResponse.from_entry(entry)
+            return
+
+        async with session.request(method, self.rewrite_url(full_url), data=data, **kwargs) as response:
+            if self.mode == 'live':
+                yield response
+                return
+            if has_credentials(kwargs.get('headers')) or has_credentials(session.headers):
+                self.stats['unrecorded'] += 1
+                logger.warning(f"请求携带登录凭据，不录制: {method.upper()} {stored_url}")
+                yield response
+                return
+            body = await response.read()
+            self.stats['bytes'] += len(body)
+            # 同一请求重试时后一次响应覆盖前一次，回放得到的是最终响应
+            self.store.put(request_key(method, full_url, data), method, stored_url, response.status, response.headers, body)
+            self.stats['recorded'] += 1
+            yield ReplayResponse(method, full_url, response.status, CIMultiDict(response.headers), body)
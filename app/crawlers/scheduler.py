@@ -0,0 +1,84 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Set
+from app.core.logger import logger
+
+
+class CrawlScheduler:
+    """分层爬取调度器
+
+    所有请求（如公司详情与其下属律师详情）共享同一个在途预算：固定数量的worker
+    从按分组（如公司ID）划分的队列中轮转取任务，任务执行中可以继续提交子任务。
+    峰值并发恒等于worker数，大公司的律师请求不会饿死其他公司。
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._queues: "OrderedDict[str, Deque[Callable[[], Awaitable]]]" = OrderedDict()
+        self._running = 0
+        self._condition = asyncio.Condition()
+        # 事件循环只弱引用任务，唤醒任务需保留引用直到完成，否则可能在执行前被回收
+        self._notify_tasks: Set[asyncio.Task] = set()
+        self.stats: Dict[str, int] = {'submitted': 0, 'completed': 0, 'failed': 0, 'peak_running': 0}
+
+    def submit(self, group: str, job: Callable[[], Awaitable]) -> None:
+        """提交任务（返回协程的无参函数）到指定分组队列"""
+        queue = self._queues.get(group)
+        if queue is None:
+            queue = deque()
+            self._queues[group] = queue
+        queue.append(job)
+        self.stats['submitted'] += 1
+        # 非阻塞唤醒空闲worker
+        task = asyncio.get_running_loop().create_task(self._notify())
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._notify_tasks.discard)
+
+    async def _notify(self) -> None:
+        async with self._condition:
+            self._condition.notify_all()
+
+    def _next_job(self):
+        """按分组轮转取下一个任务"""
+        if not self._queues:
+            return None
+        group, queue = self._queues.popitem(last=False)
+        job = queue.popleft()
+        if queue:
+            # 该分组仍有任务，移到队尾等待下一轮
+            self._queues[group] = queue
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._condition:
+                job = self._next_job()
+                while job is None:
+                    if self._running == 0:
+                        # 队列为空且没有执行中的任务（不会再有新任务），全部完成
+                        self._condition.notify_all()
+                        return
+                    await self._condition.wait()
+                    job = self._next_job()
+                self._running += 1
+                self.stats['peak_running'] = max(self.stats['peak_running'], self._running)
+            try:
+                await job()
+                self.stats['completed'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"调度任务执行失败: {str(e)}", exc_info=True)
+            finally:
+                async with self._condition:
+                    self._running -= 1
+                    self._condition.notify_all()
+
+    async def run(self) -> None:
+        """启动worker并等待所有任务（包括执行中新提交的子任务）完成"""
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        logger.info(f"调度完成: {self.stats}")
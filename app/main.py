@@ -1,8 +1,13 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.v1.crawler_router import router as crawler_router
 from app.api.v1.sync_router import router as sync_router
 from app.api.v1.task_router import router as task_router
 from app.core.config import settings
+from app.core.database import async_engine
+from app.core.http_client import http_clients
+from app.crawlers.parse_pool import parse_pool
+from app.crawlers.registry import crawler_registry
 from app.core.logger import setup_logging
 from app.core.exception_handler import http_exception_handler
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -13,8 +18,19 @@ import uvicorn
 # 初始化命令: alembic init alembic
 # 修改alembic.ini配置后执行: alembic revision --autogenerate -m "init" && alembic upgrade head
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时加载爬虫并创建共享HTTP连接池，关闭时释放连接池、解析进程池与数据库连接"""
+    crawler_registry.load()
+    await http_clients.start()
+    yield
+    await http_clients.close()
+    parse_pool.shutdown()
+    await async_engine.dispose()
+
 # 初始化FastAPI应用
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="API Triggered Crawler with CRM Integration",
@@ -1,5 +1,5 @@
 from enum import Enum
-from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, BigInteger, Text
+from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, BigInteger, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.config import settings
 from datetime import datetime
@@ -27,6 +27,7 @@ class Company(Base):
     areas_of_law = Column(JSON)
     team_count = Column(Integer)
     redundant_info = Column(JSON, default=lambda: {})
+    row_hash = Column(String(64))  # 最近一次写入的记录内容哈希，内容未变化时跳过UPDATE
     update_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
     create_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
     lawyers = relationship(
@@ -51,6 +52,7 @@ class Lawyer(Base):
     address = Column(Text)
     telephone = Column(String(100))
     redundant_info = Column(JSON, default=lambda: {})
+    row_hash = Column(String(64))  # 最近一次写入的记录内容哈希，内容未变化时跳过UPDATE
     update_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
     create_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
     company = relationship(
@@ -76,9 +78,41 @@ class Task(Base):
     scraped_company_count = Column(Integer)
     scraped_lawyer_count = Column(Integer)
     error_message = Column(Text)
+    result_info = Column(JSON)  # 任务执行统计（存储计数、增量统计等）
+    checkpoint = Column(JSON)  # 爬取断点（frontier、已完成及失败的条目），用于续爬
     update_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
     create_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
-    
+
+
+class CrawlFingerprint(Base):
+    """爬取条目的内容指纹，用于增量爬取时跳过未变化的公司"""
+    __tablename__ = 'crawl_fingerprint'
+    __table_args__ = (
+        UniqueConstraint('source_name', 'item_key', name='uq_crawl_fingerprint_source_item'),
+        {'schema': settings.DB_SCHEMA}
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    source_name = Column(String(50), nullable=False)
+    item_key = Column(String(255), nullable=False)  # 站点内条目标识，如lawscot公司ID、lawsocni详情页URL
+    fingerprint = Column(String(64), nullable=False)
+    update_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
+    create_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
+
+class StorageReject(Base):
+    """入库失败的记录及错误信息（每条记录在独立保存点中写入，失败的记录不影响同批次其他记录）"""
+    __tablename__ = 'storage_reject'
+    __table_args__ = {'schema': settings.DB_SCHEMA}
+
+    id = Column(BigInteger, primary_key=True)
+    source_name = Column(String(50))
+    record_type = Column(String(20))  # company / lawyer
+    record_name = Column(String(255))
+    payload = Column(JSON)  # 爬虫产出的原始记录（公司记录含lawyers）
+    error = Column(Text)
+    update_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
+    create_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
+
 # class ImmigrationAdviser(Base):
 #     __tablename__ = "immigration_adviser"
 #     __table_args__ = {'schema': settings.DB_SCHEMA}
@@ -100,6 +134,9 @@ class Task(Base):
 #     update_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
 #     create_date = Column(BigInteger, nullable=False, default=lambda: int(datetime.now().timestamp()))
     
+# 爬虫输出的公司数据中携带的爬取元信息键（条目标识、内容指纹），存储时剥离
+CRAWL_META_KEY = '_crawl_meta'
+
 class TaskStatus(str, Enum):
     IN_PROGRESS = "IN_PROGRESS"
     COMPLETED = "COMPLETED"
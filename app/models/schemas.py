@@ -68,6 +68,7 @@ class TaskResponse(BaseModel,TimeConvertMixin):
     scraped_company_count: Optional[int] = 0
     scraped_lawyer_count: Optional[int] = 0
     error_count: Optional[int] = 0
+    result_info: Optional[Dict[str, Any]] = None
 
 
 # 添加统一响应包装模型 
@@ -1,15 +1,19 @@
 from app.services.trigger_base import TriggerService
 from app.crawlers.base_crawler import BaseCrawler
-from typing import Dict, Any
-import importlib
+from typing import Dict, Any, Optional
 from app.models.data_model import Task, TaskType, TaskStatus
-from app.services.data_storage import DataStorageService
+from app.services.data_storage import DataStorageService, STORAGE_MODES
+from app.core.config import settings
+from app.crawlers.checkpoint import CrawlCheckpoint
+from app.crawlers.registry import crawler_registry
 import time
-from app.core.database import get_db
 from app.core.logger import logger
-from sqlalchemy import select
+from sqlalchemy import select, update, or_
 
 
+# 当前进程中正在执行的任务ID，防止同一任务被重复续爬
+_running_task_ids = set()
+
 
 class CrawlerTriggerService(TriggerService):
     
@@ -17,6 +21,14 @@ class CrawlerTriggerService(TriggerService):
     async def create_task(self, scrapy_id: str, scrapy_url: str, scrapy_params: dict) -> int:
         # 创建爬虫任务记录
         logger.info(f"创建爬虫任务: {scrapy_id}, URL: {scrapy_url}")
+        # 未注册的爬虫在创建任务时即拒绝，不等到后台执行时才失败
+        capabilities = crawler_registry.capabilities(scrapy_id)
+        for param in ('streaming', 'incremental', 'checkpoint'):
+            if (scrapy_params or {}).get(param) and not capabilities[param]:
+                logger.warning(f"爬虫 {scrapy_id} 不支持{param}参数，将被忽略")
+        storage_mode = (scrapy_params or {}).get('storage_mode', settings.STORAGE_MODE)
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"无效的storage_mode: {storage_mode}，可选: {', '.join(STORAGE_MODES)}")
         try:
             new_task = Task(
                 status=TaskStatus.IN_PROGRESS,
@@ -28,8 +40,8 @@ class CrawlerTriggerService(TriggerService):
                 create_date=int(time.time())
             )
             self.db_session.add(new_task)
-            self.db_session.commit()
-            self.db_session.refresh(new_task)
+            await self.db_session.commit()
+            await self.db_session.refresh(new_task)
             logger.info(f"爬虫任务创建成功，ID: {new_task.id}")
             return new_task.id
             
@@ -37,6 +49,39 @@ class CrawlerTriggerService(TriggerService):
         except Exception as e:
             logger.error(f"创建爬虫任务失败: {str(e)}")
             raise 
+
+    async def resume_task(self, task_id: int) -> Task:
+        """将未完成的任务恢复为执行中状态，随后由execute_task从断点继续"""
+        task = await self.db_session.get(Task, task_id)
+        if not task:
+            raise ValueError(f"任务ID不存在: {task_id}")
+        if task.status == TaskStatus.COMPLETED:
+            raise ValueError(f"任务 {task_id} 已完成，无需续爬")
+        if task_id in _running_task_ids:
+            raise ValueError(f"任务 {task_id} 正在执行中")
+        if not task.checkpoint:
+            raise ValueError(f"任务 {task_id} 没有可用的断点")
+        # 状态检查与更新在同一条UPDATE中完成，并发的续爬请求（包括其他进程）只有一个能成功；
+        # 执行中的任务每次保存断点都会刷新update_date，超过TASK_STALE_SECONDS未刷新的IN_PROGRESS任务视为进程重启后遗留，同样可以续爬
+        now = int(time.time())
+        claimed = await self.db_session.execute(
+            update(Task)
+            .where(
+                Task.id == task_id,
+                Task.status != TaskStatus.COMPLETED,
+                or_(Task.status != TaskStatus.IN_PROGRESS, Task.update_date < now - settings.TASK_STALE_SECONDS)
+            )
+            .values(status=TaskStatus.IN_PROGRESS, error_message=None, completion_time=None, update_date=now)
+        )
+        if claimed.rowcount != 1:
+            await self.db_session.rollback()
+            raise ValueError(f"任务 {task_id} 正在执行中")
+        await self.db_session.commit()
+        await self.db_session.refresh(task)
+        # 调度后台执行前即登记，execute_task结束时移除
+        _running_task_ids.add(task_id)
+        logger.info(f"爬虫任务 {task_id} 将从断点续爬: {CrawlCheckpoint.from_dict(task.checkpoint).stats()}")
+        return task
         
 
     async def execute_task(self, task_id: int) -> Dict[str, Any]:
@@ -48,40 +93,74 @@ class CrawlerTriggerService(TriggerService):
         """
         # 执行爬虫任务
         logger.info(f"开始执行爬虫任务，task_id: {task_id}")
-        task = self.db_session.query(Task).filter(Task.id == task_id).first()
+        task = await self.db_session.get(Task, task_id)
         if not task:
             logger.error(f"任务ID不存在: {task_id}")
             raise ValueError(f"任务ID不存在: {task_id}")
 
+        crawler = None
+        _running_task_ids.add(task_id)
         try:
-            # 动态加载爬虫
-            logger.info(f"动态加载爬虫模块: {task.scrapy_id}")
-            crawler_module = importlib.import_module(f"app.crawlers.{task.scrapy_id}")
-            if '_' in task.scrapy_id:
-                class_name = "Crawler" + "".join(part.capitalize() for part in task.scrapy_id.split('_')[1:])
-            else:
-                class_name = f"Crawler{task.scrapy_id.capitalize()}"
-            crawler_class = getattr(crawler_module, class_name)
+            # 从注册表获取启动时已加载的爬虫类
+            crawler_class = crawler_registry.get(task.scrapy_id)
             crawler = crawler_class(scrapy_url=task.scrapy_url,scrapy_params=task.scrapy_params)
+            if crawler.incremental:
+                # 增量模式：加载上次记录的内容指纹，未变化的公司由爬虫直接跳过
+                crawler.known_fingerprints = await DataStorageService.load_fingerprints(self.db_session, task.scrapy_id)
+            resumed = bool(task.checkpoint) and crawler.checkpoint is not None
+            if resumed:
+                crawler.checkpoint = CrawlCheckpoint.from_dict(task.checkpoint)
 
-            # 执行爬取
-            result = await crawler.crawl()
-            
-            logger.info(f"待存储company: {len(result.get('companies', []))}条")
             #数据存储：
             if self.db_session is None:
                 logger.error("CrawlerTriggerService数据库会话未初始化")
                 raise RuntimeError("数据库会话未初始化")
             storage_service = DataStorageService()
-            storage_result = await storage_service.save_crawled_data(
-                self.db_session,
-                source=task.scrapy_id,
-                companies=result.get('companies', [])
-            )
+            storage_mode = (task.scrapy_params or {}).get('storage_mode', settings.STORAGE_MODE)
+            if crawler.supports_streaming and (crawler.streaming or crawler.checkpoint is not None):
+                # 流式模式：爬虫每产出一家公司即进入存储批次，不在内存中累积全部结果
+                # 断点续爬同样依赖流式存储：每个批次提交后标记条目完成并保存断点
+                logger.info(f"以流式模式执行爬虫: {task.scrapy_id}")
+                result = {}
+                storage_result = await storage_service.save_crawled_stream(
+                    self.db_session,
+                    source=task.scrapy_id,
+                    stream=crawler.crawl_stream(),
+                    on_batch_saved=lambda saved_items, failed_items: self._save_checkpoint(
+                        task, crawler, saved_items, failed_items
+                    ),
+                    storage_mode=storage_mode
+                )
+            else:
+                # 执行爬取
+                result = await crawler.crawl()
+
+                logger.info(f"待存储company: {len(result.get('companies', []))}条")
+                storage_result = await storage_service.save_crawled_data(
+                    self.db_session,
+                    source=task.scrapy_id,
+                    companies=result.get('companies', []),
+                    storage_mode=storage_mode
+                )
+                storage_result.pop('saved_items', None)
             logger.info(f"数据存储完成: {storage_result}")
             
             task.scraped_company_count = storage_result.get('company_success', 0)
             task.scraped_lawyer_count = storage_result.get('lawyer_success', 0)
+            task.result_info = {'storage': storage_result}
+            speedup = await self._storage_speedup(task, storage_result)
+            if speedup is not None:
+                task.result_info['storage_speedup'] = speedup
+                logger.info(f"入库吞吐对比row模式: {speedup}")
+            if crawler.incremental:
+                task.result_info['incremental'] = crawler.incremental_stats
+                logger.info(f"增量爬取统计: {crawler.incremental_stats}")
+            if crawler.crawl_stats:
+                task.result_info['crawl'] = crawler.crawl_stats
+                logger.info(f"爬虫运行统计: {crawler.crawl_stats}")
+            if crawler.checkpoint is not None:
+                task.result_info['checkpoint'] = crawler.checkpoint.stats()
+                task.result_info['resumed'] = resumed
             task.scrapy_url = result.get('scrapy_url', task.scrapy_url)
             task.status = TaskStatus.COMPLETED
             task.completion_time = int(time.time())
@@ -89,11 +168,49 @@ class CrawlerTriggerService(TriggerService):
             return {"task_id": task_id, "status": "completed", "result": result}
 
         except Exception as e:
-            self.db_session.rollback() 
+            await self.db_session.rollback()
             task.status = TaskStatus.FAILED
             task.error_message = str(e)
             task.completion_time = int(time.time())
             logger.error(f"爬虫任务失败: {task_id}, 错误: {str(e)}", exc_info=True)
             raise
         finally:
-            self.db_session.commit()
\ No newline at end of file
+            _running_task_ids.discard(task_id)
+            if crawler is not None:
+                if crawler.checkpoint is not None:
+                    task.checkpoint = crawler.checkpoint.to_dict()
+                await crawler.close()
+            await self.db_session.commit()
+
+    async def _storage_speedup(self, task: Task, storage_result: dict) -> Optional[dict]:
+        """与同一爬虫最近一次row模式完成任务的入库吞吐（rows_per_sec）比较，没有可比的任务时返回None"""
+        if storage_result.get('storage_mode') == 'row' or not storage_result.get('rows_per_sec'):
+            return None
+        recent = await self.db_session.execute(select(Task).where(
+            Task.scrapy_id == task.scrapy_id,
+            Task.status == TaskStatus.COMPLETED,
+            Task.id != task.id
+        ).order_by(Task.id.desc()).limit(20))
+        for previous in recent.scalars():
+            baseline = (previous.result_info or {}).get('storage') or {}
+            if baseline.get('storage_mode') == 'row' and baseline.get('rows_per_sec'):
+                return {
+                    'baseline_task_id': previous.id,
+                    'baseline_rows_per_sec': baseline['rows_per_sec'],
+                    'rows_per_sec': storage_result['rows_per_sec'],
+                    'speedup': round(storage_result['rows_per_sec'] / baseline['rows_per_sec'], 2)
+                }
+        return None
+
+    async def _save_checkpoint(self, task: Task, crawler: BaseCrawler, saved_items: list, failed_items: list) -> None:
+        """存储批次写入后标记已提交的条目完成、被拒绝或随批次回滚的条目失败（续爬时重新抓取），并保存断点"""
+        if crawler.checkpoint is None:
+            return
+        for item_key in failed_items:
+            crawler.checkpoint.mark_failed(item_key)
+        for item_key in saved_items:
+            crawler.checkpoint.mark_done(item_key)
+        task.checkpoint = crawler.checkpoint.to_dict()
+        # 同时作为执行心跳，续爬据此判断IN_PROGRESS任务是否仍在执行
+        task.update_date = int(time.time())
+        await self.db_session.commit()
\ No newline at end of file
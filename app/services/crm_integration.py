@@ -9,8 +9,8 @@ import asyncio
 import datetime
 from datetime import timezone
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from concurrent.futures import ThreadPoolExecutor
 import asyncio
+from sqlalchemy import select
 from app.services.data_cleaning import DataCleaningService
 from sqlalchemy.dialects import postgresql
 from pathlib import Path
@@ -19,7 +19,8 @@ import csv
 class CRMIntegrationService:
     def __init__(self, db_session):
         self.db_session = db_session
-        self.executor = ThreadPoolExecutor(max_workers=5)  # 初始化线程池
+        # 公司同步并发执行，同一AsyncSession不允许并发查询，查询需串行
+        self.db_lock = asyncio.Lock()
         self.session = None
         #attio API限制请求频次25/s
         self.company_semaphore = asyncio.Semaphore(15)  # company级并发控制
@@ -47,7 +48,6 @@ class CRMIntegrationService:
         self.session = aiohttp.ClientSession()
         return self
     async def __aexit__(self, exc_type, exc, tb):
-        self.executor.shutdown(wait=True)
         if self.session:
             await self.session.close()
     
@@ -166,28 +166,17 @@ class CRMIntegrationService:
            
     async def get_company_data(self, sync_source: str):
         # 根据sync_source查询公司数据
-        def sync_query():
-            query = self.db_session.query(Company)
-            if sync_source != "all":
-                query = query.filter(Company.source_name == sync_source) 
-            return query.all()
-
-        # 提交同步任务到线程池执行
-        return await asyncio.get_event_loop().run_in_executor(
-            self.executor,
-            sync_query  # 传递函数对象，而非执行结果
-        )
+        stmt = select(Company)
+        if sync_source != "all":
+            stmt = stmt.where(Company.source_name == sync_source)
+        async with self.db_lock:
+            return (await self.db_session.execute(stmt)).scalars().all()
        
                 
     async def get_company_lawyers(self, company_id):
-        def sync_query():
-            return self.db_session.query(Lawyer).filter(
-                Lawyer.company_id == company_id
-            ).all()
-    
-        return await asyncio.get_running_loop().run_in_executor(
-            self.executor, sync_query
-        )
+        stmt = select(Lawyer).where(Lawyer.company_id == company_id)
+        async with self.db_lock:
+            return (await self.db_session.execute(stmt)).scalars().all()
     
     def _build_company_data(self, company):
         try:
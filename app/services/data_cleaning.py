@@ -307,6 +307,20 @@ class DataCleaningService:
         domain = parsed_url.netloc or parsed_url.path.split('/')[0]
         return DataCleaningService.clean_domain(domain)
     
+    @staticmethod
+    def normalize_company_key(name: str) -> str:
+        """生成公司名称的归一化键（公共方法），用于同一批数据内按名称归并公司
+        Args:
+            name: 公司名称
+        Returns:
+            小写、&统一为and、去除标点并合并空白后的名称，空名称返回空字符串
+        """
+        if not name:
+            return ''
+        key = name.casefold().replace('&', ' and ')
+        key = re.sub(r'[^\w\s]', ' ', key)
+        return ' '.join(key.split())
+
     @staticmethod
     def safe_extract(tree: html.HtmlElement, xpath: str) -> str:
         """安全提取单个元素文本
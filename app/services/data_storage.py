@@ -1,57 +1,109 @@
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError  
 from sqlalchemy.orm import load_only
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from app.models.data_model import Company, Lawyer, Task
+from app.models.data_model import Company, Lawyer, Task, CrawlFingerprint, StorageReject, CRAWL_META_KEY
 from app.core.logger import logger
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, or_, tuple_, text, JSON
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime
+import hashlib
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+STORAGE_MODES = ('row', 'bulk', 'copy', 'auto')
+# 写入计数（批次提交成功后才计入结果）
+_COUNTER_KEYS = ('company_success', 'company_failed', 'company_new', 'company_update', 'company_skipped',
+                 'lawyer_success', 'lawyer_failed', 'lawyer_new', 'lawyer_update', 'lawyer_skipped')
+# 已提交及失败（记录被拒绝或批次回滚）的条目标识（爬取元信息中的item_key），用于更新爬取断点
+_ITEM_KEYS = ('saved_items', 'failed_items')
+# 不参与row_hash计算的列（主键、关联键及时间戳）
+_HASH_EXCLUDED = frozenset(('id', 'company_id', 'row_hash', 'update_date', 'create_date'))
+# 模型列名，批量写入时校验爬虫产出的字段
+_COMPANY_COLUMNS = frozenset(Company.__table__.columns.keys())
+_LAWYER_COLUMNS = frozenset(Lawyer.__table__.columns.keys())
+# copy模式载入临时表的列（主键、外键及时间戳在合并时生成）
+_COPY_COMPANY_COLUMNS = [name for name in Company.__table__.columns.keys() if name not in ('id', 'update_date', 'create_date')]
+_COPY_LAWYER_COLUMNS = [
+    name for name in Lawyer.__table__.columns.keys() if name not in ('id', 'company_id', 'update_date', 'create_date')
+]
+
 
 class DataStorageService:
     # 数据存储服务类，负责将清洗后的爬虫数据存储到数据库，增强了错误处理和性能优化
 
 
-    @staticmethod   
-    @retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
+    @staticmethod
     async def _commit_batch(db, batch_size, company_counter, result):
+        """提交当前批次；失败时回滚后抛出异常（不重试：回滚后再提交的是空事务，批次数据已丢失）"""
         if db is None:
             logger.error("数据库会话对象为None，无法提交事务")
             raise ValueError(" DB session object 'db' cannot be None")
         try:
-            db.commit()
+            await db.commit()
             result['batches_committed'] += 1
             logger.info(f"Committed batch with {batch_size} records...")
             return True
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             logger.error(f"提交事务失败: {str(e)}")
             raise
 
     
+    @staticmethod
+    async def load_fingerprints(db: AsyncSession, source: str) -> dict:
+        """加载数据源已记录的条目指纹，返回{item_key: fingerprint}"""
+        stmt = select(CrawlFingerprint.item_key, CrawlFingerprint.fingerprint).where(
+            CrawlFingerprint.source_name == source
+        )
+        fingerprints = {row.item_key: row.fingerprint for row in await db.execute(stmt)}
+        logger.info(f"Loaded {len(fingerprints)} fingerprints for {source}")
+        return fingerprints
+
+    @staticmethod
+    async def _save_fingerprint(db, source: str, crawl_meta: dict) -> None:
+        """记录条目指纹，与公司数据在同一事务中提交"""
+        if not crawl_meta or not crawl_meta.get('item_key') or not crawl_meta.get('fingerprint'):
+            return
+        now = int(datetime.now().timestamp())
+        stmt = pg_insert(CrawlFingerprint).values(
+            source_name=source,
+            item_key=crawl_meta['item_key'],
+            fingerprint=crawl_meta['fingerprint'],
+            update_date=now,
+            create_date=now
+        ).on_conflict_do_update(
+            index_elements=['source_name', 'item_key'],
+            set_={'fingerprint': crawl_meta['fingerprint'], 'update_date': now}
+        )
+        await db.execute(stmt)
+
     @staticmethod
     async def save_crawled_data(
-        db, 
+        db: AsyncSession,
         source: str, 
         companies: list = None, 
         lawyers: list = None, 
-        batch_size: int = 30
+        batch_size: int = 30,
+        storage_mode: str = 'row'
         ) -> dict:
         """
         保存爬取数据到数据库（优化后的分批次提交版本）
         
         参数:
-            db: 数据库会话对象
+            db: 异步数据库会话
             source: 数据来源标识
             companies: 公司数据列表
             lawyers: 律师数据列表（未使用，保留接口兼容性）
             batch_size: 批量提交大小
+            storage_mode: row逐条查询写入；bulk按批次集合查询并批量写入（见_save_companies_bulk）；
+                copy经COPY载入临时表后集合合并（见_save_companies_copy）；auto按STORAGE_COPY_THRESHOLD选择copy或bulk
             
         返回:
-            包含操作结果的字典
+            包含操作结果的字典；saved_items/failed_items为已提交及失败的条目标识（item_key），
+            公司或其任一律师被拒绝、或所在批次提交失败时计为失败
         """
         
         result = {
@@ -60,134 +112,891 @@ class DataStorageService:
             'company_failed': 0,
             'company_new': 0,     
             'company_update': 0,
+            'company_skipped': 0,
             'lawyer_new': 0,      
             'lawyer_update': 0,  
+            'lawyer_skipped': 0,
             'lawyer_success': 0,
             'lawyer_failed': 0,
             'batches_committed': 0,
-            'total_companies': 0
+            'saved_items': [],
+            'failed_items': [],
+            'total_companies': 0,
+            'storage_mode': storage_mode,
+            'elapsed': 0.0,
+            'rows_per_sec': 0.0
         }
         if db is None:
             raise ValueError("Database session 'db' cannot be None. Check session injection.")
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Invalid storage_mode: {storage_mode}, expected one of {STORAGE_MODES}")
         if not companies:
             logger.warning(f"No company data to save from {source}")
             return result
 
         result['total_companies'] = len(companies)
+        storage_mode = DataStorageService._resolve_storage_mode(db, storage_mode, len(companies))
+        result['storage_mode'] = storage_mode
+        started = time.perf_counter()
+        if storage_mode == 'copy':
+            await DataStorageService._save_companies_copy(db, source, companies, result)
+        elif storage_mode == 'bulk':
+            await DataStorageService._save_companies_bulk(
+                db, source, companies, max(batch_size, settings.STORAGE_BULK_BATCH_SIZE), result
+            )
+        else:
+            await DataStorageService._save_companies_row(db, source, companies, batch_size, result)
+        DataStorageService._record_timing(result, time.perf_counter() - started)
+        logger.info(f"Data storage completed. Source: {source}, Results: {result}")
+        return result
+
+    @staticmethod
+    def _resolve_storage_mode(db, storage_mode: str, company_count: int) -> str:
+        """auto按公司数选择copy或bulk；copy依赖PostgreSQL的COPY，其他数据库退回bulk"""
+        if storage_mode == 'auto':
+            threshold = settings.STORAGE_COPY_THRESHOLD
+            storage_mode = 'copy' if threshold and company_count >= threshold else 'bulk'
+        if storage_mode == 'copy' and db.get_bind().dialect.name != 'postgresql':
+            logger.warning(f"storage_mode=copy requires PostgreSQL, falling back to bulk ({db.get_bind().dialect.name})")
+            storage_mode = 'bulk'
+        return storage_mode
+
+    @staticmethod
+    def _record_timing(result: dict, elapsed: float) -> None:
+        """记录入库耗时及吞吐（公司+律师行数/秒），用于比较不同写入方式"""
+        result['elapsed'] = round(elapsed, 3)
+        rows = result['company_success'] + result['lawyer_success']
+        result['rows_per_sec'] = round(rows / elapsed, 1) if elapsed > 0 else 0.0
+
+    @staticmethod
+    async def _save_companies_row(db, source: str, companies: list, batch_size: int, result: dict) -> dict:
+        """
+        逐条查询并写入公司及律师，每batch_size家公司提交一次
+
+        每家公司在独立的保存点中写入，律师先整组写入、失败时逐个重试（见_save_company_lawyers）。
+        失败的记录只回滚自身的保存点并记入storage_reject，同批次其他记录照常提交；
+        计数在批次提交成功后才计入结果。
+        """
+        pending = DataStorageService._new_counters()
+        batch_records: List[dict] = []
         company_counter = 0
-        current_batch = []  # 用于收集当前批次的公司对象
-        
+
         try:
             for company_data in companies:
+                # 提取律师数据及爬取元信息并处理
+                lawyer_list = company_data.pop('lawyers', []) or []
+                crawl_meta = company_data.pop(CRAWL_META_KEY, None)
+                batch_records.append({**company_data, 'lawyers': lawyer_list})
                 try:
-                    # 提取律师数据并处理
-                    lawyer_list = company_data.pop('lawyers', [])
-                    stmt = select(Company).where(
-                        (Company.domains == company_data.get('domains')) |
-                        ((Company.name == company_data.get('name')) & 
-                         (Company.company_address == company_data.get('company_address')))
-                    ) #同一个公司会有不同地址，不同地址办公室的律师不同，所以需要用地址区分
-                    query_result = db.execute(stmt)
-                    existing_company = query_result.scalars().first()
-
-                    # 保存/更新公司（使用批量操作优化）
-                    if existing_company:
-                        result['company_update'] += 1
-                        logger.info(f"Updating existing company: {company_data.get('name')} (ID: {existing_company.id})")
-                        for key, value in company_data.items():
-                            if value is not None:
-                                setattr(existing_company, key, value)
-                        existing_company.update_date = int(datetime.now().timestamp())
-                        company_id = existing_company.id
-                        current_batch.append(existing_company)
-                    else:
-                        result['company_new'] += 1
-                        logger.info(f"Creating new company: {company_data.get('name')}")
-                        new_company = Company(**company_data)
-                        db.add(new_company)
-                        db.flush()
-                        company_id = new_company.id
-                        current_batch.append(new_company)
-                    
-                    result['company_success'] += 1
-                    
-                    
-                    # 处理律师数据（使用批量添加优化）
-                    lawyer_objs = []
-                    for lawyer_data in lawyer_list:
-                        try:
-                            lawyer_data['company_id'] = company_id
-                            # 优化律师查询
-                            stmt = select(Lawyer).where(
-                                Lawyer.name == lawyer_data.get('name'),
-                                Lawyer.company_id == company_id
-                            )
-                            query_result =  db.execute(stmt)
-                            existing_lawyer = query_result.scalars().first()                         
-                            
-                            if existing_lawyer:
-                                result['lawyer_update'] += 1
-                                logger.info(f"Updating existing lawyer: {lawyer_data.get('name')} (ID: {existing_lawyer.id})")
-                                for key, value in lawyer_data.items():
-                                    if value is not None:
-                                        setattr(existing_lawyer, key, value)
-                                lawyer_objs.append(existing_lawyer)
-                            else:
-                                result['lawyer_new'] += 1
-                                logger.info(f"Creating new lawyer: {lawyer_data.get('name')}")
-                                new_lawyer = Lawyer(**lawyer_data)
-                                lawyer_objs.append(new_lawyer)
-                            
-                            result['lawyer_success'] += 1
-                        except Exception as e:
-                            logger.error(f"Failed to process lawyer {lawyer_data.get('name')}: {str(e)}", exc_info=True)
-                            result['lawyer_failed'] += 1
-                    
-                    if lawyer_objs:
-                        db.add_all(lawyer_objs)
-                    
-                    # 批次提交逻辑（带重试机制）
-                    result['batches_committed'] += 1
-                    company_counter += 1
-                    if company_counter % batch_size == 0:
-                        await DataStorageService._commit_batch(db, batch_size, company_counter, result)
-                        current_batch.clear()  # 使用 clear() 替代重新赋值
-                    
-                except IntegrityError as e:
-                    db.rollback()  # 回滚事务
-                    logger.error(f"Integrity error for company {company_data.get('name')}: {str(e)}", exc_info=True)
-                    result['company_failed'] += 1
-                    continue
-                except SQLAlchemyError as e:
-                    db.rollback()  # 回滚事务
-                    logger.error(f"Database error processing company {company_data.get('name')}: {str(e)}", exc_info=True)
-                    result['company_failed'] += 1
-                    continue
+                    async with db.begin_nested():
+                        company_id, outcome = await DataStorageService._upsert_company(db, company_data)
                 except Exception as e:
-                    db.rollback()
-                    logger.error(f"Unexpected error processing company {company_data.get('name')}: {str(e)}", exc_info=True)
-                    result['company_failed'] += 1
-   
-            # 提交剩余未达批次的数据
-            if current_batch:
-               await DataStorageService._commit_batch(db, batch_size, company_counter, result)
+                    logger.error(f"Failed to save company {company_data.get('name')}: {str(e)}")
+                    DataStorageService._reject(db, source, 'company', {**company_data, 'lawyers': lawyer_list}, e)
+                    pending['company_failed'] += 1
+                    pending['lawyer_failed'] += len(lawyer_list)
+                    saved = False
+                else:
+                    DataStorageService._count_outcome(pending, 'company', outcome)
+                    pending['company_success'] += 1
+                    saved = await DataStorageService._save_company_lawyers(
+                        db, source, company_id, lawyer_list, crawl_meta, pending
+                    )
+                DataStorageService._record_item(pending, crawl_meta, saved)
 
-            logger.info(f"Data storage completed. Source: {source}, Results: {result}")
+                # 批次提交
+                company_counter += 1
+                if company_counter % batch_size == 0:
+                    await DataStorageService._finish_batch(db, source, 'company', batch_records, pending, result)
+
+            # 提交剩余未达批次的数据
+            if batch_records:
+                await DataStorageService._finish_batch(db, source, 'company', batch_records, pending, result)
             return result
 
         except SQLAlchemyError as e:
-            db.rollback()
+            await db.rollback()
             logger.error(f"Database error during batch commit: {str(e)}", exc_info=True)
             raise
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             logger.error(f"Unexpected error during data save: {str(e)}", exc_info=True)
             raise
 
+    @staticmethod
+    async def _finish_batch(db, source: str, record_type: str, records: List[dict], pending: dict, result: dict) -> None:
+        """
+        提交批次：成功后才把批次计数并入结果；提交失败时批次已回滚，保存点中写入的记录全部丢失，
+        丢弃批次计数，批次中的全部记录（及其条目标识）计为失败并在新事务中记入storage_reject
+        """
+        try:
+            await DataStorageService._commit_batch(db, len(records), len(records), result)
+        except SQLAlchemyError as e:
+            for key in _COUNTER_KEYS:
+                pending[key] = 0
+            result['failed_items'].extend(pending['saved_items'] + pending['failed_items'])
+            for key in _ITEM_KEYS:
+                pending[key] = []
+            for record in records:
+                DataStorageService._reject(db, source, record_type, record, e)
+                if record_type == 'company':
+                    result['company_failed'] += 1
+                    result['lawyer_failed'] += len(record.get('lawyers') or [])
+                else:
+                    result['lawyer_failed'] += 1
+            try:
+                await db.commit()
+            except SQLAlchemyError as reject_error:
+                await db.rollback()
+                logger.error(f"Failed to record rejects of rolled back batch from {source}: {str(reject_error)}")
+        else:
+            DataStorageService._merge_counters(result, pending)
+        records.clear()
+
+    @staticmethod
+    def _new_counters() -> dict:
+        return {**{key: 0 for key in _COUNTER_KEYS}, **{key: [] for key in _ITEM_KEYS}}
+
+    @staticmethod
+    def _merge_counters(result: dict, counters: dict) -> None:
+        """把已提交批次的计数及条目标识并入结果并清零"""
+        for key in _COUNTER_KEYS:
+            result[key] += counters[key]
+            counters[key] = 0
+        for key in _ITEM_KEYS:
+            result[key].extend(counters[key])
+            counters[key] = []
+
+    @staticmethod
+    def _record_item(counters: dict, crawl_meta: Optional[dict], saved: bool) -> None:
+        """按公司及其律师是否全部写入，记录条目标识为已保存或失败（没有item_key的记录不记录）"""
+        item_key = (crawl_meta or {}).get('item_key')
+        if item_key:
+            counters['saved_items' if saved else 'failed_items'].append(item_key)
+
+    @staticmethod
+    def _reject(db, source: str, record_type: str, record: dict, error: Exception) -> None:
+        """记录写入失败的原始数据及错误，随当前批次提交"""
+        name = record.get('name')
+        db.add(StorageReject(
+            source_name=source,
+            record_type=record_type,
+            record_name=str(name)[:255] if name is not None else None,
+            payload=json.loads(json.dumps(record, ensure_ascii=False, default=str)),
+            error=str(error)
+        ))
+
+    @staticmethod
+    def _row_hash(values: dict) -> str:
+        """记录内容哈希：非空字段（不含主键、关联键及时间戳）按键排序后的JSON的sha256"""
+        content = {key: value for key, value in values.items() if value is not None and key not in _HASH_EXCLUDED}
+        return hashlib.sha256(
+            json.dumps(content, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def _count_outcome(counters: dict, kind: str, outcome: str) -> None:
+        """按写入结果（new/update/skipped）计数，跳过的UPDATE同时计为update"""
+        counters[f"{kind}_{outcome}"] += 1
+        if outcome == 'skipped':
+            counters[f"{kind}_update"] += 1
+
+    @staticmethod
+    async def _upsert_company(db, company_data: dict) -> Tuple[int, str]:
+        """
+        按domains或(name, company_address)匹配已有公司并更新，否则新建；返回(公司ID, new/update/skipped)
+
+        只用非空值覆盖已有字段；记录的row_hash与上次写入相同时内容不会变化，跳过UPDATE，update_date不变
+        """
+        stmt = select(Company).where(
+            (Company.domains == company_data.get('domains')) |
+            ((Company.name == company_data.get('name')) & 
+             (Company.company_address == company_data.get('company_address')))
+        ) #同一个公司会有不同地址，不同地址办公室的律师不同，所以需要用地址区分
+        existing_company = (await db.execute(stmt)).scalars().first()
+        row_hash = DataStorageService._row_hash(company_data)
+        if existing_company:
+            if existing_company.row_hash == row_hash:
+                logger.debug(f"Company unchanged: {company_data.get('name')} (ID: {existing_company.id})")
+                return existing_company.id, 'skipped'
+            logger.info(f"Updating existing company: {company_data.get('name')} (ID: {existing_company.id})")
+            for key, value in company_data.items():
+                if value is not None:
+                    setattr(existing_company, key, value)
+            existing_company.row_hash = row_hash
+            existing_company.update_date = int(datetime.now().timestamp())
+            return existing_company.id, 'update'
+        logger.info(f"Creating new company: {company_data.get('name')}")
+        new_company = Company(**{**company_data, 'row_hash': row_hash})
+        db.add(new_company)
+        await db.flush()
+        return new_company.id, 'new'
+
+    @staticmethod
+    async def _upsert_lawyer(db, company_id: int, lawyer_data: dict) -> str:
+        """按(company_id, name)匹配已有律师并更新，否则新建；返回new/update/skipped（规则同_upsert_company）"""
+        lawyer_data = {**lawyer_data, 'company_id': company_id}
+        stmt = select(Lawyer).where(
+            Lawyer.name == lawyer_data.get('name'),
+            Lawyer.company_id == company_id
+        )
+        existing_lawyer = (await db.execute(stmt)).scalars().first()
+        row_hash = DataStorageService._row_hash(lawyer_data)
+        if existing_lawyer:
+            if existing_lawyer.row_hash == row_hash:
+                logger.debug(f"Lawyer unchanged: {lawyer_data.get('name')} (ID: {existing_lawyer.id})")
+                return 'skipped'
+            logger.info(f"Updating existing lawyer: {lawyer_data.get('name')} (ID: {existing_lawyer.id})")
+            for key, value in lawyer_data.items():
+                if value is not None:
+                    setattr(existing_lawyer, key, value)
+            existing_lawyer.row_hash = row_hash
+            existing_lawyer.update_date = int(datetime.now().timestamp())
+            return 'update'
+        logger.info(f"Creating new lawyer: {lawyer_data.get('name')}")
+        db.add(Lawyer(**{**lawyer_data, 'row_hash': row_hash}))
+        return 'new'
+
+    @staticmethod
+    async def _save_company_lawyers(
+        db, source: str, company_id: int, lawyer_list: List[dict], crawl_meta: Optional[dict], counters: dict
+    ) -> bool:
+        """
+        在一个保存点中写入公司的全部律师及条目指纹；失败时逐个律师在各自的保存点中重试，
+        只有出错的律师记入storage_reject。有律师失败时不记录指纹，下次增量爬取仍会处理该公司。
+        返回全部律师是否写入成功。
+        """
+        try:
+            async with db.begin_nested():
+                outcomes = [await DataStorageService._upsert_lawyer(db, company_id, lawyer_data)
+                            for lawyer_data in lawyer_list]
+                await DataStorageService._save_fingerprint(db, source, crawl_meta)
+        except Exception as e:
+            logger.warning(f"Saving lawyers of company {company_id} failed, retrying one by one: {str(e)}")
+        else:
+            for outcome in outcomes:
+                DataStorageService._count_outcome(counters, 'lawyer', outcome)
+            counters['lawyer_success'] += len(outcomes)
+            return True
+
+        failed = 0
+        for lawyer_data in lawyer_list:
+            try:
+                async with db.begin_nested():
+                    outcome = await DataStorageService._upsert_lawyer(db, company_id, lawyer_data)
+            except Exception as e:
+                logger.error(f"Failed to save lawyer {lawyer_data.get('name')}: {str(e)}")
+                DataStorageService._reject(db, source, 'lawyer', lawyer_data, e)
+                counters['lawyer_failed'] += 1
+                failed += 1
+            else:
+                DataStorageService._count_outcome(counters, 'lawyer', outcome)
+                counters['lawyer_success'] += 1
+        if not failed:
+            try:
+                async with db.begin_nested():
+                    await DataStorageService._save_fingerprint(db, source, crawl_meta)
+            except Exception as e:
+                logger.error(f"Failed to save fingerprint for company {company_id}: {str(e)}")
+        return not failed
+
+    @staticmethod
+    async def _save_companies_bulk(db, source: str, companies: list, batch_size: int, result: dict) -> dict:
+        """
+        批量写入公司及律师：每个批次的数据库往返次数固定，与公司、律师数量无关
+
+        每个批次：
+            1. 一次查询按domains或(name, company_address)匹配已存在的公司
+            2. 新公司一条INSERT ... RETURNING（executemany）取得ID，已存在的公司按主键批量UPDATE（row_hash未变化的跳过）
+            3. 一次查询取出已存在公司的律师，按(company_id, name)匹配后批量INSERT/UPDATE
+            4. 条目指纹一条INSERT ... ON CONFLICT写入
+        批次内重复的公司/律师合并到同一行，计为update，与逐条写入时后者更新前者的结果一致。
+        批次写入或提交失败时回滚该批次，改为逐条写入（每条记录一个保存点），隔离出错的记录。
+        """
+        for start in range(0, len(companies), batch_size):
+            batch = companies[start:start + batch_size]
+            counters = DataStorageService._new_counters()
+            try:
+                await DataStorageService._write_bulk_batch(db, source, batch, counters)
+                await DataStorageService._commit_batch(db, len(batch), start + len(batch), result)
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.error(f"Bulk batch of {len(batch)} companies from {source} failed, retrying row by row: {str(e)}")
+                counters = DataStorageService._new_counters()
+                counters['batches_committed'] = 0
+                await DataStorageService._save_companies_row(db, source, batch, len(batch), counters)
+                result['batches_committed'] += counters.pop('batches_committed')
+            DataStorageService._merge_counters(result, counters)
+            logger.info(f"Bulk saved companies {start + 1}-{start + len(batch)} of {len(companies)} from {source}")
+        return result
+
+    @staticmethod
+    async def _find_existing_companies(
+        db, companies: List[dict]
+    ) -> Tuple[Dict[str, int], Dict[tuple, int], Dict[int, Optional[str]]]:
+        """一次查询匹配批次中已存在的公司，返回({domains: id}, {(name, company_address): id}, {id: row_hash})"""
+        domains = {company['domains'] for company in companies if company.get('domains')}
+        pairs = {(company.get('name'), company.get('company_address')) for company in companies if company.get('name')}
+        conditions = []
+        if domains:
+            conditions.append(Company.domains.in_(domains))
+        with_address = [pair for pair in pairs if pair[1] is not None]
+        if with_address:
+            conditions.append(tuple_(Company.name, Company.company_address).in_(with_address))
+        without_address = [name for name, address in pairs if address is None]
+        if without_address:
+            conditions.append(Company.name.in_(without_address) & Company.company_address.is_(None))
+
+        by_domain: Dict[str, int] = {}
+        by_name: Dict[tuple, int] = {}
+        row_hashes: Dict[int, Optional[str]] = {}
+        if conditions:
+            stmt = select(Company.id, Company.domains, Company.name, Company.company_address, Company.row_hash).where(
+                or_(*conditions)
+            ).order_by(Company.id)
+            for row in await db.execute(stmt):
+                if row.domains:
+                    by_domain.setdefault(row.domains, row.id)
+                by_name.setdefault((row.name, row.company_address), row.id)
+                row_hashes[row.id] = row.row_hash
+        return by_domain, by_name, row_hashes
+
+    @staticmethod
+    def _fill_insert_rows(rows: List[dict], now: int) -> List[dict]:
+        """补齐executemany各行的列（缺失列取None或模型默认值），保证同一条语句批量执行"""
+        columns = set().union(*rows)
+        defaults = {'redundant_info': {}, 'update_date': now, 'create_date': now}
+        columns.update(defaults)
+        return [
+            {column: row[column] if row.get(column) is not None else defaults.get(column) for column in columns}
+            for row in rows
+        ]
+
+    @staticmethod
+    async def _write_bulk_batch(db, source: str, batch: List[dict], counters: dict) -> None:
+        now = int(datetime.now().timestamp())
+        entries = []
+        crawl_metas = []
+        for company_data in batch:
+            # 不修改原始记录，批次失败时按原始记录逐条重试
+            company_data = dict(company_data)
+            lawyer_list = company_data.pop('lawyers', []) or []
+            crawl_meta = company_data.pop(CRAWL_META_KEY, None)
+            unknown = set(company_data) - _COMPANY_COLUMNS
+            if unknown:
+                logger.error(f"Skipping company {company_data.get('name')}: unknown fields {sorted(unknown)}")
+                DataStorageService._reject(db, source, 'company', {**company_data, 'lawyers': lawyer_list},
+                                           ValueError(f"unknown fields {sorted(unknown)}"))
+                counters['company_failed'] += 1
+                counters['lawyer_failed'] += len(lawyer_list)
+                DataStorageService._record_item(counters, crawl_meta, False)
+                continue
+            entries.append((company_data, lawyer_list))
+            crawl_metas.append(crawl_meta)
+
+        # 1. 解析每家公司的写入目标：已存在公司的ID，或待插入行的下标
+        by_domain, by_name, company_hashes = await DataStorageService._find_existing_companies(
+            db, [data for data, _ in entries]
+        )
+        pending_domain: Dict[str, int] = {}
+        pending_name: Dict[tuple, int] = {}
+        company_updates: Dict[int, dict] = {}
+        company_inserts: List[dict] = []
+        targets: List[Tuple[str, int]] = []
+        for company_data, _ in entries:
+            domain = company_data.get('domains')
+            pair = (company_data.get('name'), company_data.get('company_address'))
+            values = {key: value for key, value in company_data.items() if value is not None}
+            company_id = (by_domain.get(domain) if domain else None) or by_name.get(pair)
+            if company_id is not None:
+                company_updates.setdefault(company_id, {}).update(values)
+                counters['company_update'] += 1
+                targets.append(('id', company_id))
+                continue
+            index = (pending_domain.get(domain) if domain else None)
+            if index is None:
+                index = pending_name.get(pair)
+            if index is not None:
+                company_inserts[index].update(values)
+                counters['company_update'] += 1
+            else:
+                index = len(company_inserts)
+                company_inserts.append(dict(company_data))
+                counters['company_new'] += 1
+            if domain:
+                pending_domain.setdefault(domain, index)
+            pending_name.setdefault(pair, index)
+            targets.append(('new', index))
+        counters['company_success'] += len(targets)
+
+        # 2. 写入公司：合并后的内容与已有row_hash相同的公司跳过UPDATE
+        new_ids: List[int] = []
+        if company_inserts:
+            for values in company_inserts:
+                values['row_hash'] = DataStorageService._row_hash(values)
+            stmt = insert(Company).returning(Company.id, sort_by_parameter_order=True)
+            new_ids = list((await db.execute(stmt, DataStorageService._fill_insert_rows(company_inserts, now))).scalars())
+        changed_companies = []
+        for company_id, values in company_updates.items():
+            row_hash = DataStorageService._row_hash(values)
+            if row_hash == company_hashes.get(company_id):
+                counters['company_skipped'] += 1
+            else:
+                changed_companies.append({**values, 'id': company_id, 'row_hash': row_hash, 'update_date': now})
+        if changed_companies:
+            await db.execute(update(Company), changed_companies)
+        company_ids = [target if kind == 'id' else new_ids[target] for kind, target in targets]
+
+        # 3. 写入律师：只有已存在的公司可能已有律师
+        existing_lawyers: Dict[tuple, int] = {}
+        lawyer_hashes: Dict[int, Optional[str]] = {}
+        if company_updates:
+            stmt = select(Lawyer.id, Lawyer.company_id, Lawyer.name, Lawyer.row_hash).where(
+                Lawyer.company_id.in_(list(company_updates))
+            ).order_by(Lawyer.id)
+            for row in await db.execute(stmt):
+                existing_lawyers.setdefault((row.company_id, row.name), row.id)
+                lawyer_hashes[row.id] = row.row_hash
+        lawyer_updates: Dict[int, dict] = {}
+        lawyer_inserts: List[dict] = []
+        pending_lawyers: Dict[tuple, int] = {}
+        failed_companies = set()
+        for company_id, (_, lawyer_list) in zip(company_ids, entries):
+            for lawyer_data in lawyer_list:
+                try:
+                    unknown = set(lawyer_data) - _LAWYER_COLUMNS
+                    if unknown:
+                        raise ValueError(f"unknown fields {sorted(unknown)}")
+                    lawyer_data = {**lawyer_data, 'company_id': company_id}
+                    key = (company_id, lawyer_data.get('name'))
+                    values = {k: v for k, v in lawyer_data.items() if v is not None}
+                    if key in existing_lawyers:
+                        lawyer_updates.setdefault(existing_lawyers[key], {}).update(values)
+                        counters['lawyer_update'] += 1
+                    elif key in pending_lawyers:
+                        lawyer_inserts[pending_lawyers[key]].update(values)
+                        counters['lawyer_update'] += 1
+                    else:
+                        pending_lawyers[key] = len(lawyer_inserts)
+                        lawyer_inserts.append(lawyer_data)
+                        counters['lawyer_new'] += 1
+                    counters['lawyer_success'] += 1
+                except Exception as e:
+                    logger.error(f"Failed to process lawyer {lawyer_data.get('name')}: {str(e)}")
+                    DataStorageService._reject(db, source, 'lawyer', lawyer_data, e)
+                    counters['lawyer_failed'] += 1
+                    failed_companies.add(company_id)
+        if lawyer_inserts:
+            for values in lawyer_inserts:
+                values['row_hash'] = DataStorageService._row_hash(values)
+            await db.execute(insert(Lawyer), DataStorageService._fill_insert_rows(lawyer_inserts, now))
+        changed_lawyers = []
+        for lawyer_id, values in lawyer_updates.items():
+            row_hash = DataStorageService._row_hash(values)
+            if row_hash == lawyer_hashes.get(lawyer_id):
+                counters['lawyer_skipped'] += 1
+            else:
+                changed_lawyers.append({**values, 'id': lawyer_id, 'row_hash': row_hash, 'update_date': now})
+        if changed_lawyers:
+            await db.execute(update(Lawyer), changed_lawyers)
+
+        # 4. 条目指纹：有律师写入失败的公司不记录，下次增量爬取仍会处理
+        await DataStorageService._save_fingerprints(db, source, [
+            meta for meta, company_id in zip(crawl_metas, company_ids) if meta and company_id not in failed_companies
+        ])
+        for meta, company_id in zip(crawl_metas, company_ids):
+            DataStorageService._record_item(counters, meta, company_id not in failed_companies)
+
+    @staticmethod
+    async def _save_fingerprints(db, source: str, crawl_metas: List[dict]) -> None:
+        """批量记录条目指纹（同一条目只保留最后一次）"""
+        now = int(datetime.now().timestamp())
+        rows = {
+            meta['item_key']: {'source_name': source, 'item_key': meta['item_key'], 'fingerprint': meta['fingerprint'],
+                               'update_date': now, 'create_date': now}
+            for meta in crawl_metas if meta.get('item_key') and meta.get('fingerprint')
+        }
+        if not rows:
+            return
+        stmt = pg_insert(CrawlFingerprint).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['source_name', 'item_key'],
+            set_={'fingerprint': stmt.excluded.fingerprint, 'update_date': stmt.excluded.update_date}
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def _save_companies_copy(db, source: str, companies: list, result: dict) -> dict:
+        """
+        COPY载入临时表后用集合SQL合并：全部公司与律师在一个事务中写入，数据库往返次数与数据量无关
+
+        1. 在Python中校验字段并合并重复的公司/律师（规则同bulk模式）
+        2. COPY ... FROM STDIN把公司、律师分别流式写入ON COMMIT DROP的临时表
+        3. 一条UPDATE按domains或(name, company_address)为临时表中的公司匹配已有ID，
+           未匹配的从company主键序列分配ID
+        4. UPDATE ... FROM / INSERT ... SELECT合并公司，再按(company_id, name)合并律师；row_hash未变化的跳过UPDATE
+        5. 条目指纹写入后整体提交；失败时整体回滚，改用bulk模式写入以隔离出错的记录
+        """
+        counters = DataStorageService._new_counters()
+        entries, crawl_metas = DataStorageService._prepare_copy_rows(db, source, companies, counters)
+        company_rows = [company_data for company_data, _ in entries]
+        lawyer_rows = [(seq, lawyer_data) for seq, (_, lawyers) in enumerate(entries) for lawyer_data in lawyers]
+        try:
+            if company_rows:
+                await DataStorageService._merge_copy_rows(db, company_rows, lawyer_rows, counters)
+            await DataStorageService._save_fingerprints(db, source, crawl_metas)
+            await DataStorageService._commit_batch(db, len(company_rows), len(company_rows), result)
+        except Exception as e:
+            # COPY由驱动直接执行，错误不会包装为SQLAlchemyError
+            await db.rollback()
+            logger.error(f"Copy load of {len(company_rows)} companies from {source} failed, falling back to bulk: {str(e)}")
+            result['storage_mode'] = 'bulk'
+            return await DataStorageService._save_companies_bulk(
+                db, source, companies, settings.STORAGE_BULK_BATCH_SIZE, result
+            )
+        DataStorageService._merge_counters(result, counters)
+        logger.info(f"Copy loaded {len(company_rows)} companies and {len(lawyer_rows)} lawyers from {source}")
+        return result
+
+    @staticmethod
+    def _prepare_copy_rows(
+        db, source: str, companies: list, counters: dict
+    ) -> Tuple[List[Tuple[dict, List[dict]]], List[dict]]:
+        """校验字段并合并重复的公司（domains或(name, company_address)相同）及同一公司下同名的律师，
+        返回([(公司, [律师])], 爬取元信息)；合并掉的重复行计为update，字段无效的记录记入storage_reject，
+        其条目标识计为失败。
+        不修改原始记录，载入失败时按原始记录改用bulk模式写入"""
+        entries: List[Tuple[dict, Dict[Any, dict]]] = []
+        metas: List[Tuple[int, Optional[dict]]] = []
+        failed_entries = set()
+        by_domain: Dict[str, int] = {}
+        by_name: Dict[tuple, int] = {}
+        for company_data in companies:
+            company_data = dict(company_data)
+            lawyer_list = company_data.pop('lawyers', []) or []
+            crawl_meta = company_data.pop(CRAWL_META_KEY, None)
+            unknown = set(company_data) - _COMPANY_COLUMNS
+            if unknown:
+                logger.error(f"Skipping company {company_data.get('name')}: unknown fields {sorted(unknown)}")
+                DataStorageService._reject(db, source, 'company', {**company_data, 'lawyers': lawyer_list},
+                                           ValueError(f"unknown fields {sorted(unknown)}"))
+                counters['company_failed'] += 1
+                counters['lawyer_failed'] += len(lawyer_list)
+                DataStorageService._record_item(counters, crawl_meta, False)
+                continue
+            domain = company_data.get('domains')
+            pair = (company_data.get('name'), company_data.get('company_address'))
+            index = by_domain.get(domain) if domain else None
+            if index is None and pair[0]:
+                index = by_name.get(pair)
+            if index is None:
+                index = len(entries)
+                entries.append((company_data, {}))
+            else:
+                entries[index][0].update({key: value for key, value in company_data.items() if value is not None})
+                counters['company_update'] += 1
+            if domain:
+                by_domain.setdefault(domain, index)
+            if pair[0]:
+                by_name.setdefault(pair, index)
+            counters['company_success'] += 1
+            metas.append((index, crawl_meta))
+
+            lawyers = entries[index][1]
+            for lawyer_data in lawyer_list:
+                unknown = set(lawyer_data) - _LAWYER_COLUMNS
+                if unknown:
+                    logger.error(f"Failed to process lawyer {lawyer_data.get('name')}: unknown fields {sorted(unknown)}")
+                    DataStorageService._reject(db, source, 'lawyer', lawyer_data,
+                                               ValueError(f"unknown fields {sorted(unknown)}"))
+                    counters['lawyer_failed'] += 1
+                    failed_entries.add(index)
+                    continue
+                name = lawyer_data.get('name')
+                if name in lawyers:
+                    lawyers[name].update({key: value for key, value in lawyer_data.items() if value is not None})
+                    counters['lawyer_update'] += 1
+                else:
+                    lawyers[name] = dict(lawyer_data)
+                counters['lawyer_success'] += 1
+        # 有律师写入失败的公司不记录指纹，下次增量爬取仍会处理
+        crawl_metas = [meta for index, meta in metas if meta and index not in failed_entries]
+        for index, meta in metas:
+            DataStorageService._record_item(counters, meta, index not in failed_entries)
+        # 合并重复行后计算row_hash，随临时表载入
+        for company_data, lawyers in entries:
+            company_data['row_hash'] = DataStorageService._row_hash(company_data)
+            for lawyer_data in lawyers.values():
+                lawyer_data['row_hash'] = DataStorageService._row_hash(lawyer_data)
+        return [(company_data, list(lawyers.values())) for company_data, lawyers in entries], crawl_metas
+
+    @staticmethod
+    async def _copy_rows(db, table: str, key_column: str, columns: List[str], json_columns: set, rows) -> None:
+        """COPY ... FROM STDIN（文本格式）写入临时表，rows为(键, 数据字典)的迭代器，按64KB分块边生成边发送"""
+        def escape(value: Any, is_json: bool) -> str:
+            if value is None:
+                return '\\N'
+            value = json.dumps(value, ensure_ascii=False) if is_json else str(value)
+            return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+        async def chunks() -> AsyncIterator[bytes]:
+            buffer = []
+            size = 0
+            for key, data in rows:
+                fields = [str(key)] + [escape(data.get(column), column in json_columns) for column in columns]
+                line = '\t'.join(fields) + '\n'
+                buffer.append(line)
+                size += len(line)
+                if size >= 65536:
+                    yield ''.join(buffer).encode('utf-8')
+                    buffer.clear()
+                    size = 0
+            if buffer:
+                yield ''.join(buffer).encode('utf-8')
+
+        # 在会话当前事务所用的连接上直接调用驱动的COPY接口
+        connection = await db.connection()
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        if hasattr(driver_connection, 'copy_to_table'):
+            # asyncpg
+            await driver_connection.copy_to_table(table, source=chunks(), columns=[key_column, *columns], format='text')
+        else:
+            # psycopg 3（postgresql+psycopg）
+            async with driver_connection.cursor() as cursor:
+                async with cursor.copy(f"COPY {table} ({key_column}, {', '.join(columns)}) FROM STDIN") as copy:
+                    async for chunk in chunks():
+                        await copy.write(chunk)
+
+    @staticmethod
+    async def _merge_copy_rows(
+        db, company_rows: List[dict], lawyer_rows: List[Tuple[int, dict]], counters: dict
+    ) -> None:
+        """载入临时表并合并到company/lawyer，新建、更新及跳过的行数计入counters"""
+        dialect = db.get_bind().dialect
+        company_table = dialect.identifier_preparer.format_table(Company.__table__)
+        lawyer_table = dialect.identifier_preparer.format_table(Lawyer.__table__)
+        now = int(datetime.now().timestamp())
+
+        def column_defs(table, columns):
+            return ', '.join(f"{name} {table.c[name].type.compile(dialect=dialect)}" for name in columns)
+
+        def json_columns(table, columns):
+            return {name for name in columns if isinstance(table.c[name].type, JSON)}
+
+        await db.execute(text(
+            f"CREATE TEMP TABLE _stage_company (seq BIGINT PRIMARY KEY, company_id BIGINT, "
+            f"is_new BOOLEAN NOT NULL DEFAULT false, unchanged BOOLEAN NOT NULL DEFAULT false, "
+            f"{column_defs(Company.__table__, _COPY_COMPANY_COLUMNS)}) ON COMMIT DROP"
+        ))
+        await db.execute(text(
+            f"CREATE TEMP TABLE _stage_lawyer (company_seq BIGINT NOT NULL, company_id BIGINT, lawyer_id BIGINT, "
+            f"unchanged BOOLEAN NOT NULL DEFAULT false, {column_defs(Lawyer.__table__, _COPY_LAWYER_COLUMNS)}) "
+            f"ON COMMIT DROP"
+        ))
+        await DataStorageService._copy_rows(db, '_stage_company', 'seq', _COPY_COMPANY_COLUMNS,
+                                            json_columns(Company.__table__, _COPY_COMPANY_COLUMNS), enumerate(company_rows))
+        await DataStorageService._copy_rows(db, '_stage_lawyer', 'company_seq', _COPY_LAWYER_COLUMNS,
+                                            json_columns(Lawyer.__table__, _COPY_LAWYER_COLUMNS), lawyer_rows)
+        await db.execute(text("ANALYZE _stage_company"))
+        await db.execute(text("ANALYZE _stage_lawyer"))
+
+        # 匹配已有公司（domains优先，其次name + company_address，同bulk模式），未匹配的分配新ID
+        # 用连接代替逐行子查询，company表没有相应索引时也只需各扫描一次；COALESCE使NULL地址可参与哈希连接
+        await db.execute(text(
+            f"UPDATE _stage_company s SET company_id = m.id FROM ("
+            f"SELECT DISTINCT ON (c.domains) c.domains, c.id FROM {company_table} c "
+            f"JOIN (SELECT DISTINCT domains FROM _stage_company) t ON c.domains = t.domains "
+            f"ORDER BY c.domains, c.id) m WHERE s.domains <> '' AND s.domains = m.domains"
+        ))
+        await db.execute(text(
+            f"UPDATE _stage_company s SET company_id = m.id FROM ("
+            f"SELECT DISTINCT ON (c.name, c.company_address) c.name, c.company_address, c.id FROM {company_table} c "
+            f"JOIN (SELECT DISTINCT name, company_address FROM _stage_company) t ON c.name = t.name "
+            f"AND COALESCE(c.company_address, '') = COALESCE(t.company_address, '') "
+            f"AND c.company_address IS NOT DISTINCT FROM t.company_address "
+            f"ORDER BY c.name, c.company_address, c.id) m "
+            f"WHERE s.company_id IS NULL AND s.name <> '' AND s.name = m.name "
+            f"AND COALESCE(s.company_address, '') = COALESCE(m.company_address, '') "
+            f"AND s.company_address IS NOT DISTINCT FROM m.company_address"
+        ))
+        # 按不同键（如一条按domains、一条按name + company_address）匹配到同一已有公司的行合并为一行，同bulk模式
+        duplicates = (await db.execute(text(
+            "SELECT company_id, array_agg(seq ORDER BY seq) FROM _stage_company WHERE company_id IS NOT NULL "
+            "GROUP BY company_id HAVING count(*) > 1"
+        ))).all()
+        if duplicates:
+            await DataStorageService._collapse_copy_duplicates(db, company_rows, lawyer_rows, duplicates, counters)
+        await db.execute(text(
+            "UPDATE _stage_company s SET company_id = n.id, is_new = true FROM ("
+            "SELECT seq, nextval(pg_get_serial_sequence(CAST(:table_name AS TEXT), 'id')) AS id FROM _stage_company "
+            "WHERE company_id IS NULL ORDER BY seq) n WHERE s.seq = n.seq"
+        ), {'table_name': company_table})
+
+        # 已有公司只用非空值覆盖，与逐条写入一致；row_hash与已有行相同的不更新，新公司redundant_info缺省为{}
+        skipped = await db.execute(text(
+            f"UPDATE _stage_company s SET unchanged = true FROM {company_table} c "
+            f"WHERE c.id = s.company_id AND NOT s.is_new AND c.row_hash = s.row_hash"
+        ))
+        counters['company_skipped'] += skipped.rowcount
+        company_set = ', '.join(f"{name} = COALESCE(s.{name}, c.{name})" for name in _COPY_COMPANY_COLUMNS)
+        await db.execute(text(
+            f"UPDATE {company_table} c SET {company_set}, update_date = :now "
+            f"FROM _stage_company s WHERE c.id = s.company_id AND NOT s.is_new AND NOT s.unchanged"
+        ), {'now': now})
+        company_values = ', '.join(
+            "COALESCE(s.redundant_info, CAST('{}' AS JSON))" if name == 'redundant_info' else f"s.{name}"
+            for name in _COPY_COMPANY_COLUMNS
+        )
+        await db.execute(text(
+            f"INSERT INTO {company_table} (id, {', '.join(_COPY_COMPANY_COLUMNS)}, update_date, create_date) "
+            f"SELECT s.company_id, {company_values}, CAST(:now AS BIGINT), CAST(:now AS BIGINT) "
+            f"FROM _stage_company s WHERE s.is_new ORDER BY s.seq"
+        ), {'now': now})
+
+        # 律师：只有已有公司下可能存在同名律师
+        await db.execute(text(
+            "UPDATE _stage_lawyer l SET company_id = s.company_id FROM _stage_company s WHERE s.seq = l.company_seq"
+        ))
+        await db.execute(text(
+            f"UPDATE _stage_lawyer l SET lawyer_id = m.id FROM ("
+            f"SELECT DISTINCT ON (x.company_id, x.name) x.company_id, x.name, x.id FROM {lawyer_table} x "
+            f"JOIN _stage_company s ON x.company_id = s.company_id AND NOT s.is_new "
+            f"ORDER BY x.company_id, x.name, x.id) m "
+            f"WHERE l.company_id = m.company_id AND COALESCE(l.name, '') = COALESCE(m.name, '') "
+            f"AND l.name IS NOT DISTINCT FROM m.name"
+        ))
+        skipped = await db.execute(text(
+            f"UPDATE _stage_lawyer l SET unchanged = true FROM {lawyer_table} x "
+            f"WHERE x.id = l.lawyer_id AND x.row_hash = l.row_hash"
+        ))
+        counters['lawyer_skipped'] += skipped.rowcount
+        lawyer_set = ', '.join(f"{name} = COALESCE(l.{name}, x.{name})" for name in _COPY_LAWYER_COLUMNS)
+        await db.execute(text(
+            f"UPDATE {lawyer_table} x SET {lawyer_set}, update_date = :now "
+            f"FROM _stage_lawyer l WHERE x.id = l.lawyer_id AND NOT l.unchanged"
+        ), {'now': now})
+        lawyer_values = ', '.join(
+            "COALESCE(l.redundant_info, CAST('{}' AS JSON))" if name == 'redundant_info' else f"l.{name}"
+            for name in _COPY_LAWYER_COLUMNS
+        )
+        await db.execute(text(
+            f"INSERT INTO {lawyer_table} (company_id, {', '.join(_COPY_LAWYER_COLUMNS)}, update_date, create_date) "
+            f"SELECT l.company_id, {lawyer_values}, CAST(:now AS BIGINT), CAST(:now AS BIGINT) "
+            f"FROM _stage_lawyer l WHERE l.lawyer_id IS NULL"
+        ), {'now': now})
+
+        new_companies = (await db.execute(text("SELECT count(*) FROM _stage_company WHERE is_new"))).scalar()
+        new_lawyers, matched_lawyers = (await db.execute(text(
+            "SELECT count(*) FILTER (WHERE lawyer_id IS NULL), count(lawyer_id) FROM _stage_lawyer"
+        ))).one()
+        counters['company_new'] += new_companies
+        counters['company_update'] += len(company_rows) - new_companies
+        counters['lawyer_new'] += new_lawyers
+        counters['lawyer_update'] += matched_lawyers
+
+    @staticmethod
+    async def _collapse_copy_duplicates(
+        db, company_rows: List[dict], lawyer_rows: List[Tuple[int, dict]], duplicates: List[tuple], counters: dict
+    ) -> None:
+        """把匹配到同一已有公司的多条临时表记录合并到序号最小的一条：按序号依次用非空值覆盖公司及同名律师
+        （规则同bulk模式），重新计算row_hash后替换临时表中的记录；合并掉的律师计为update"""
+        lawyers_by_seq: Dict[int, List[dict]] = {}
+        for seq, lawyer_data in lawyer_rows:
+            lawyers_by_seq.setdefault(seq, []).append(lawyer_data)
+        merged_companies = []
+        merged_lawyers = []
+        dropped = []
+        for company_id, seqs in duplicates:
+            company = {}
+            lawyers: Dict[Any, dict] = {}
+            for seq in seqs:
+                company.update({key: value for key, value in company_rows[seq].items() if value is not None})
+                for lawyer_data in lawyers_by_seq.get(seq, []):
+                    name = lawyer_data.get('name')
+                    if name in lawyers:
+                        lawyers[name].update({key: value for key, value in lawyer_data.items() if value is not None})
+                        counters['lawyer_update'] += 1
+                    else:
+                        lawyers[name] = dict(lawyer_data)
+            for values in (company, *lawyers.values()):
+                values.pop('row_hash', None)
+                values['row_hash'] = DataStorageService._row_hash(values)
+            company['company_id'] = company_id
+            merged_companies.append((seqs[0], company))
+            merged_lawyers.extend((seqs[0], lawyer_data) for lawyer_data in lawyers.values())
+            dropped.extend(seqs)
+
+        await db.execute(text("DELETE FROM _stage_company WHERE seq = ANY(:seqs)"), {'seqs': dropped})
+        await db.execute(text("DELETE FROM _stage_lawyer WHERE company_seq = ANY(:seqs)"), {'seqs': dropped})
+        await DataStorageService._copy_rows(
+            db, '_stage_company', 'seq', ['company_id', *_COPY_COMPANY_COLUMNS],
+            {name for name in _COPY_COMPANY_COLUMNS if isinstance(Company.__table__.c[name].type, JSON)}, merged_companies
+        )
+        await DataStorageService._copy_rows(
+            db, '_stage_lawyer', 'company_seq', _COPY_LAWYER_COLUMNS,
+            {name for name in _COPY_LAWYER_COLUMNS if isinstance(Lawyer.__table__.c[name].type, JSON)}, merged_lawyers
+        )
+        logger.info(f"Merged {len(dropped)} staged companies into {len(duplicates)} existing companies")
+
+    @staticmethod
+    async def save_crawled_stream(
+        db: AsyncSession,
+        source: str,
+        stream: AsyncIterator[dict],
+        batch_size: int = 30,
+        on_batch_saved: Optional[Callable[[List[str], List[str]], Awaitable[None]]] = None,
+        storage_mode: str = 'row'
+        ) -> dict:
+        """
+        边爬边存：逐条消费爬虫产出的公司数据，每攒够一个批次即写入数据库
+
+        参数:
+            db: 异步数据库会话
+            source: 数据来源标识
+            stream: 爬虫crawl_stream()返回的公司数据异步迭代器
+            batch_size: 批量提交大小
+            on_batch_saved: 每个批次写入后的异步回调，参数为该批次已提交及失败的条目标识（用于更新爬取断点）
+            storage_mode: 写入方式，同save_crawled_data
+
+        返回:
+            与save_crawled_data相同结构的汇总结果（不含saved_items，failed_items为全部批次的失败条目）
+        """
+        result = None
+        batch = []
+
+        async def flush() -> None:
+            nonlocal result
+            batch_result = await DataStorageService.save_crawled_data(
+                db, source=source, companies=batch, batch_size=batch_size, storage_mode=storage_mode
+            )
+            # 已提交的条目标识只用于回调，不在汇总结果中累积
+            failed_items = set(batch_result['failed_items'])
+            saved_items = [key for key in batch_result.pop('saved_items') if key not in failed_items]
+            if result is None:
+                result = batch_result
+            else:
+                for key, value in batch_result.items():
+                    if isinstance(value, (int, list)) or key == 'elapsed':
+                        result[key] += value
+            batch.clear()
+            if on_batch_saved is not None:
+                await on_batch_saved(saved_items, batch_result['failed_items'])
+
+        async for company in stream:
+            batch.append(company)
+            if len(batch) >= batch_size:
+                await flush()
+        if batch or result is None:
+            await flush()
+
+        DataStorageService._record_timing(result, result['elapsed'])
+        logger.info(f"Stream storage completed. Source: {source}, Results: {result}")
+        return result
+
 
     @staticmethod
     async def save_lawyers(
-        db,
+        db: AsyncSession,
         source: str,
         lawyers: list = None,
         batch_size: int = 30
@@ -195,7 +1004,7 @@ class DataStorageService:
         """
         单独保存律师数据到数据库，自动关联或创建公司
         参数:
-            db: 数据库会话对象
+            db: 异步数据库会话
             source: 数据来源标识
             lawyers: 律师数据列表
             batch_size: 批量提交大小
@@ -206,9 +1015,17 @@ class DataStorageService:
             'source': source,
             'company_success': 0,
             'company_failed': 0,
+            'company_new': 0,
+            'company_update': 0,
+            'company_skipped': 0,
             'lawyer_success': 0,
             'lawyer_failed': 0,
+            'lawyer_new': 0,
+            'lawyer_update': 0,
+            'lawyer_skipped': 0,
             'batches_committed': 0,
+            'saved_items': [],
+            'failed_items': [],
             'total_lawyers': len(lawyers) if lawyers else 0
         }
 
@@ -218,97 +1035,74 @@ class DataStorageService:
             logger.warning(f"No lawyer data to save from {source}")
             return result
 
-        current_batch = []
+        # 每名律师在独立保存点中写入，计数在所在批次提交后才并入结果
+        pending = DataStorageService._new_counters()
+        batch_records: List[dict] = []
         lawyer_counter = 0
 
         try:
             for lawyer_data in lawyers:
-                try:
-                    # 1. 提取公司信息并查找/创建公司
-                    company_name = lawyer_data.get('redundant_info', {}).get('company_name')
-                    if not company_name:
-                        logger.error("Missing company_name in lawyer data")
-                        result['lawyer_failed'] += 1
-                        continue
-
-                    # 2. 查找公司（优先按名称，可扩展其他字段）
-                    stmt = select(Company).where(Company.name == company_name)
-                    query_result = db.execute(stmt)
-                    company = query_result.scalars().first()
-
-                    # 3. 公司不存在则创建（最小化字段集）
-                    
-                    if not company:
-                        logger.info(f"Creating new company for lawyer: {company_name}")
-                        company = Company(
-                            name=company_name,
-                            source_name=source,
-                            domains=['auto-created'],
-                            redundant_info={'auto_created': True}  # 标记自动创建
-                        )
-                        logger.debug(f"新增公司信息: {company}")
-                        db.add(company)
-                        db.flush()  # 获取company.id
-                        result['company_success'] += 1
-                    else:
-                        logger.debug(f"Found existing company: {company_name} (ID: {company.id})")
+                batch_records.append(lawyer_data)
+                # 1. 提取公司信息
+                company_name = (lawyer_data.get('redundant_info') or {}).get('company_name')
+                if not company_name:
+                    logger.error("Missing company_name in lawyer data")
+                    DataStorageService._reject(db, source, 'lawyer', lawyer_data, ValueError("missing company_name"))
+                    pending['lawyer_failed'] += 1
+                else:
+                    try:
+                        async with db.begin_nested():
+                            # 2. 查找公司（优先按名称，可扩展其他字段）
+                            stmt = select(Company).where(Company.name == company_name)
+                            company = (await db.execute(stmt)).scalars().first()
 
-                    # 4. 准备律师数据（添加公司关联）
-                    lawyer_data['company_id'] = company.id
-                    lawyer_data['source_name'] = source
+                            # 3. 公司不存在则创建（最小化字段集）
+                            company_created = company is None
+                            if company_created:
+                                logger.info(f"Creating new company for lawyer: {company_name}")
+                                company_data = {
+                                    'name': company_name,
+                                    'source_name': source,
+                                    'domains': 'auto-created',  # domains为字符串列（asyncpg不做列表到字符串的隐式转换）
+                                    'redundant_info': {'auto_created': True}  # 标记自动创建
+                                }
+                                company = Company(**company_data, row_hash=DataStorageService._row_hash(company_data))
+                                db.add(company)
+                                await db.flush()  # 获取company.id
+                            else:
+                                logger.debug(f"Found existing company: {company_name} (ID: {company.id})")
 
-                    # 5. 查找现有律师
-                    stmt = select(Lawyer).where(
-                        Lawyer.name == lawyer_data.get('name'),
-                        Lawyer.company_id == company.id
-                    )
-                    existing_lawyer = db.execute(stmt).scalars().first()
-
-                    # 6. 更新或创建律师
-                    if existing_lawyer:
-                        logger.info(f"Updating lawyer: {lawyer_data['name']} (ID: {existing_lawyer.id})")
-                        for key, value in lawyer_data.items():
-                            if value is not None:
-                                setattr(existing_lawyer, key, value)
-                        current_batch.append(existing_lawyer)
+                            # 4. 更新或创建律师（关联公司）
+                            outcome = await DataStorageService._upsert_lawyer(
+                                db, company.id, {**lawyer_data, 'source_name': source}
+                            )
+                    except Exception as e:
+                        logger.error(f"Failed to save lawyer {lawyer_data.get('name')}: {str(e)}")
+                        DataStorageService._reject(db, source, 'lawyer', lawyer_data, e)
+                        pending['lawyer_failed'] += 1
                     else:
-                        logger.info(f"Creating lawyer: {lawyer_data['name']}")
-                        new_lawyer = Lawyer(** lawyer_data)
-                        current_batch.append(new_lawyer)
-
-                    result['lawyer_success'] += 1
-                    lawyer_counter += 1
-
-                    # 7. 批次提交
-                    if lawyer_counter % batch_size == 0:
-                        await DataStorageService._commit_batch(db, batch_size, lawyer_counter, result)
-                        current_batch.clear()
+                        pending['company_success'] += int(company_created)
+                        pending['company_new'] += int(company_created)
+                        pending['lawyer_success'] += 1
+                        DataStorageService._count_outcome(pending, 'lawyer', outcome)
 
-                except IntegrityError as e:
-                    db.rollback()
-                    logger.error(f"Integrity error for lawyer {lawyer_data.get('name')}: {str(e)}")
-                    result['lawyer_failed'] += 1
-                except SQLAlchemyError as e:
-                    db.rollback()
-                    logger.error(f"Database error for lawyer {lawyer_data.get('name')}: {str(e)}")
-                    result['lawyer_failed'] += 1
-                except Exception as e:
-                    db.rollback()
-                    logger.error(f"Unexpected error for lawyer {lawyer_data.get('name')}: {str(e)}")
-                    result['lawyer_failed'] += 1
+                lawyer_counter += 1
+                # 5. 批次提交
+                if lawyer_counter % batch_size == 0:
+                    await DataStorageService._finish_batch(db, source, 'lawyer', batch_records, pending, result)
 
             # 提交剩余数据
-            if current_batch:
-                await DataStorageService._commit_batch(db, batch_size, lawyer_counter, result)
+            if batch_records:
+                await DataStorageService._finish_batch(db, source, 'lawyer', batch_records, pending, result)
 
             logger.info(f"Lawyer storage completed. Results: {result}")
             return result
 
         except SQLAlchemyError as e:
-            db.rollback()
+            await db.rollback()
             logger.error(f"Batch commit failed: {str(e)}")
             raise
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             logger.error(f"Data save failed: {str(e)}")
             raise
@@ -0,0 +1,126 @@
+import csv
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class GeocodeCache:
+    """邮编 -> 经纬度的持久化缓存
+
+    SQLite存储（进程重启后保留），前置进程内LRU；邮编统一格式后作为键，
+    "wc2n5dn"、"WC2N 5DN"、" wc2n  5dn "命中同一条记录。
+    可从离线邮编中心点CSV批量预加载，已知邮编不再调用地理编码接口。
+    """
+
+    def __init__(self, path: str, lru_size: int):
+        self.path = Path(path)
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {'lru_hit': 0, 'db_hit': 0, 'miss': 0}
+
+    @staticmethod
+    def normalize_postcode(postcode: str) -> str:
+        """统一邮编格式：大写、合并空白；完整英国邮编在最后3位（内码）前保留一个空格
+
+        非邮编输入（如城市名）同样大写并合并空白后作为键
+        """
+        if not postcode:
+            return ''
+        compact = re.sub(r'\s+', '', postcode).upper()
+        if re.fullmatch(r'[A-Z]{1,2}\d[A-Z\d]?\d[A-Z]{2}', compact):
+            return f"{compact[:-3]} {compact[-3:]}"
+        return ' '.join(postcode.upper().split())
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 单连接由锁保护，事件循环线程与脚本线程均可使用
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                "postcode TEXT PRIMARY KEY, lat REAL NOT NULL, lng REAL NOT NULL, "
+                "source TEXT, update_date INTEGER)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key: str, location: Tuple[float, float]) -> None:
+        self._lru[key] = location
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get(self, postcode: str) -> Optional[Tuple[float, float]]:
+        """查询缓存的经纬度，未命中返回None"""
+        key = self.normalize_postcode(postcode)
+        if not key:
+            return None
+        with self._lock:
+            location = self._lru.get(key)
+            if location is not None:
+                self._lru.move_to_end(key)
+                self.stats['lru_hit'] += 1
+                return location
+            row = self._connect().execute("SELECT lat, lng FROM geocode WHERE postcode = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['miss'] += 1
+                return None
+            location = (row[0], row[1])
+            self._remember(key, location)
+            self.stats['db_hit'] += 1
+            return location
+
+    def put(self, postcode: str, lat: float, lng: float, source: str = 'google') -> None:
+        """保存地理编码结果"""
+        key = self.normalize_postcode(postcode)
+        if not key:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode (postcode, lat, lng, source, update_date) VALUES (?, ?, ?, ?, ?)",
+                (key, float(lat), float(lng), source, int(time.time()))
+            )
+            conn.commit()
+            self._remember(key, (float(lat), float(lng)))
+
+    def preload_csv(self, csv_path: str, postcode_column: str = 'postcode', lat_column: str = 'latitude',
+                    lng_column: str = 'longitude', batch_size: int = 10000) -> int:
+        """从离线邮编中心点CSV批量导入，返回导入条数（已有记录被覆盖）"""
+        now = int(time.time())
+        imported = 0
+        batch = []
+        with self._lock, open(csv_path, newline='', encoding='utf-8-sig') as f:
+            conn = self._connect()
+            for row in csv.DictReader(f):
+                key = self.normalize_postcode(row.get(postcode_column, ''))
+                try:
+                    lat, lng = float(row[lat_column]), float(row[lng_column])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if not key:
+                    continue
+                batch.append((key, lat, lng, 'csv', now))
+                if len(batch) >= batch_size:
+                    conn.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)", batch)
+                    imported += len(batch)
+                    batch.clear()
+            if batch:
+                conn.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)", batch)
+                imported += len(batch)
+            conn.commit()
+            # 导入的数据可能覆盖LRU中的旧值
+            self._lru.clear()
+        logger.info(f"从 {csv_path} 导入 {imported} 条邮编经纬度")
+        return imported
+
+
+geocode_cache = GeocodeCache(settings.GEOCODE_CACHE_PATH, settings.GEOCODE_CACHE_LRU_SIZE)
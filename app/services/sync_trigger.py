@@ -20,12 +20,12 @@ class SyncTriggerService(TriggerService):
             create_date=int(time.time())
         )
         self.db_session.add(new_task)
-        self.db_session.commit()
+        await self.db_session.commit()
         return new_task.id
 
     async def execute_task(self, task_id: int) -> Dict[str, Any]:
         # 执行同步任务
-        task = self.db_session.query(Task).filter(Task.id == task_id).first()
+        task = await self.db_session.get(Task, task_id)
         if not task:
             raise ValueError(f"任务ID不存在: {task_id}")
          # 解析任务参数
@@ -38,7 +38,7 @@ class SyncTriggerService(TriggerService):
                 result = await sync_service.sync_companies(sync_source)
                 task.status = TaskStatus.COMPLETED
                 task.completion_time = int(time.time())
-                self.db_session.commit()  # 确保状态变更持久化
+                await self.db_session.commit()  # 确保状态变更持久化
                 companies_count = result.get('company_count', 0)
                 lawyers_count = result.get('lawyer_count', 0)
                 logger.info(f"同步任务完成: {task_id}, 同步公司数量: {companies_count}, 同步律师数量: {lawyers_count}")
@@ -1,12 +1,19 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal
 
 class TriggerService(ABC):
     # 任务触发服务抽象基类
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
+    @classmethod
+    async def execute_in_new_session(cls, task_id: int) -> Dict[str, Any]:
+        # 后台任务入口：请求的数据库会话在响应返回后即关闭，后台执行使用独立会话
+        async with AsyncSessionLocal() as db_session:
+            return await cls(db_session).execute_task(task_id)
+
     @abstractmethod
     async def create_task(self, task_id: str) -> int:
         # 创建任务记录(抽象方法)
@@ -0,0 +1,150 @@
+"""爬虫离线基准：录制一次真实爬取，之后按录制内容离线、可复现地测量吞吐与结果一致性
+
+用法（在项目根目录执行，需要与服务相同的环境变量）:
+    # 录制（访问真实站点，响应保存到CRAWLER_REPLAY_DIR/<scrapy_id>/，任务参数保存为manifest.json）
+    python -m scripts.bench_crawlers record crawler_lawscot --url "https://www.lawscot.org.uk/find-a-solicitor/?..."
+    python -m scripts.bench_crawlers record crawler_adviser_finder --params '{"postcode": "E1 6AN", "distance": 10}'
+
+    # 进程内回放（不经过网络栈，测量爬取与解析本身）
+    python -m scripts.bench_crawlers run
+    # 经本地fixture服务器回放（经过HTTP、重试与限速路径），可注入延迟与错误
+    python -m scripts.bench_crawlers run crawler_lawscot --server --latency 0.02 --error-rate 0.05
+
+每个爬虫输出请求数、记录数（公司+律师）、pages/sec、records/sec及结果摘要；
+结果摘要与公司/律师顺序无关，同一录制下两种回放方式的摘要应一致。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+from app.core.config import settings
+from app.core.http_client import http_clients
+from app.crawlers.registry import crawler_registry
+from scripts.fixture_server import create_app
+
+MANIFEST = 'manifest.json'
+
+
+def result_digest(companies: List[Dict[str, Any]]) -> str:
+    """与顺序无关的结果摘要"""
+    def canonical(value: Any) -> str:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+    normalized = []
+    for company in companies:
+        company = dict(company)
+        if isinstance(company.get('lawyers'), list):
+            company['lawyers'] = sorted(company['lawyers'], key=canonical)
+        normalized.append(canonical(company))
+    return hashlib.sha256('\n'.join(sorted(normalized)).encode('utf-8')).hexdigest()
+
+
+async def run_crawler(scrapy_id: str, scrapy_url: str, scrapy_params: Dict[str, Any], http_mode: str) -> Dict[str, Any]:
+    crawler_class = crawler_registry.get(scrapy_id)
+    crawler = crawler_class(scrapy_url=scrapy_url, scrapy_params={**scrapy_params, 'http_mode': http_mode,
+                                                                  'use_cache': False, 'checkpoint': False})
+    start = time.perf_counter()
+    try:
+        result = await crawler.crawl()
+    finally:
+        await crawler.close()
+    elapsed = time.perf_counter() - start
+    companies = result.get('companies', [])
+    records = len(companies) + sum(len(company.get('lawyers') or []) for company in companies)
+    return {
+        'elapsed': elapsed,
+        'pages': crawler.http_replay.stats['requests'],
+        'records': records,
+        'digest': result_digest(companies),
+        'stats': crawler.http_replay.stats,
+        'error': result.get('error'),
+    }
+
+
+def report(scrapy_id: str, label: str, outcome: Dict[str, Any]) -> None:
+    elapsed = outcome['elapsed'] or 1e-9
+    print(f"{scrapy_id:<24} {label:<8} {outcome['pages']:>7} pages {outcome['records']:>8} records "
+          f"{elapsed:8.3f}s {outcome['pages'] / elapsed:10,.1f} pages/s {outcome['records'] / elapsed:10,.1f} records/s "
+          f"digest {outcome['digest'][:12]}")
+    if outcome['stats'].get('missed'):
+        print(f"  警告: {outcome['stats']['missed']} 个请求没有录制")
+    if outcome['stats'].get('unrecorded'):
+        print(f"  警告: {outcome['stats']['unrecorded']} 个请求携带登录凭据，未录制")
+    if outcome['error']:
+        print(f"  错误: {outcome['error']}")
+
+
+async def record(args) -> None:
+    params = json.loads(args.params)
+    # 录制时按站点正常限速
+    outcome = await run_crawler(args.scrapy_id, args.url, params, 'record')
+    store_dir = Path(settings.CRAWLER_REPLAY_DIR) / args.scrapy_id
+    (store_dir / MANIFEST).write_text(json.dumps({'scrapy_url': args.url, 'scrapy_params': params},
+                                                 ensure_ascii=False, indent=2), encoding='utf-8')
+    report(args.scrapy_id, 'record', outcome)
+    await http_clients.close()
+
+
+async def run(args) -> None:
+    root = Path(settings.CRAWLER_REPLAY_DIR)
+    scrapy_ids = args.scrapy_ids or sorted(path.parent.name for path in root.glob(f"*/{MANIFEST}"))
+    if not scrapy_ids:
+        print(f"{root} 下没有录制，请先执行record")
+        return
+
+    runner: Optional[web.AppRunner] = None
+    http_mode = 'replay'
+    if args.server:
+        app = create_app(str(root), args.latency, args.jitter, args.error_rate, args.seed)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        settings.CRAWLER_HTTP_REWRITE = {'https://': f"http://127.0.0.1:{port}/"}
+        http_mode = 'live'
+
+    try:
+        for scrapy_id in scrapy_ids:
+            manifest = json.loads((root / scrapy_id / MANIFEST).read_text(encoding='utf-8'))
+            # 离线回放不需要按真实站点限速
+            params = {**manifest['scrapy_params'], 'rate_limit': args.rate_limit, 'max_in_flight': args.max_in_flight}
+            outcome = await run_crawler(scrapy_id, manifest['scrapy_url'], params, http_mode)
+            report(scrapy_id, 'server' if args.server else 'replay', outcome)
+    finally:
+        await http_clients.close()
+        if runner is not None:
+            print(f"fixture服务器统计: {runner.app['stats']}")
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫离线基准")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="访问真实站点并录制响应")
+    record_parser.add_argument('scrapy_id')
+    record_parser.add_argument('--url', default='', help="scrapy_url")
+    record_parser.add_argument('--params', default='{}', help="scrapy_params（JSON）")
+
+    run_parser = subparsers.add_parser('run', help="按录制内容离线回放并测量吞吐")
+    run_parser.add_argument('scrapy_ids', nargs='*', help="默认全部已录制的爬虫")
+    run_parser.add_argument('--server', action='store_true', help="经本地fixture服务器回放")
+    run_parser.add_argument('--latency', type=float, default=0.0)
+    run_parser.add_argument('--jitter', type=float, default=0.0)
+    run_parser.add_argument('--error-rate', type=float, default=0.0)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--rate-limit', type=float, default=10000, help="回放时每秒请求数上限")
+    run_parser.add_argument('--max-in-flight', type=int, default=20, help="回放时的最大在途请求数")
+    args = parser.parse_args()
+
+    crawler_registry.load()
+    asyncio.run(record(args) if args.command == 'record' else run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""字段提取微基准：逐字段字符串XPath（改造前） vs 预编译ExtractionSpec（改造后）
+
+用法（在项目根目录执行，需要与服务相同的环境变量）:
+    python -m scripts.bench_extraction
+    python -m scripts.bench_extraction --page lawsociety_company_list --file saved/company_list.html
+    python -m scripts.bench_extraction --iterations 2000
+
+未指定--file时使用内置的示例页面。两种方式使用相同的XPath表达式与后处理函数，
+差别只在表达式是否每次调用都重新解析编译。
+"""
+import argparse
+import time
+from typing import Callable, Dict, List, Tuple
+from lxml import html
+from app.crawlers.crawler_lawsocni import CrawlerLawsocni
+from app.crawlers.crawler_lawsociety import CrawlerLawsociety
+from app.crawlers.extraction import ExtractionSpec
+
+
+def sample_company_list(count: int = 50) -> str:
+    sections = []
+    for i in range(count):
+        sections.append(f"""
+<section class="solicitor-outer">
+  <h2><a class="token" href="/firm/{i}">Firm {i} LLP</a></h2>
+  <ul>
+    <li><span>Address</span> {i} High Street, Town, AB1 2CD</li>
+    <li><span>Telephone</span> 0207 000 {i:04d}</li>
+    <li><a class="show-email" data-email="info@firm{i}.co.uk">Show email</a></li>
+    <li><span>Website</span><a href="https://www.firm{i}.co.uk/">Website</a></li>
+  </ul>
+  <div class="info-panel"><span>Areas of practice</span>
+    <ul class="initial"><li>Conveyancing</li><li>Wills and probate</li></ul>
+    <div class="more-holder"><ul><li>Family</li><li>Crime</li></ul></div>
+  </div>
+  <div class="info-panel"><span>Accreditations</span><ul class="initial"><li>Lexcel</li></ul></div>
+  <ul class="more-info-list">
+    <li><i class="icon-office-blue"></i><a>{i % 5 + 1} offices</a></li>
+    <li><i class="icon-people-blue"></i><a>{i * 3} people</a></li>
+  </ul>
+</section>""")
+    return f"<html><body>{''.join(sections)}</body></html>"
+
+
+def sample_lawyer_detail() -> str:
+    return """<html><body><h1>Jane Doe</h1>
+<dl><dt>Email</dt><dd><a data-email="jane@firm.co.uk">Show email</a></dd>
+<dt>Telephone</dt><dd>0207 111 2222</dd><dd class="address">1 High Street
+Town
+AB1 2CD</dd></dl>
+<section><h2>Areas of practice</h2><ul class="two-cols"><li>Family</li><li>Wills</li></ul></section>
+<p>Admitted as a solicitor: <span class="related">01/02/15</span></p>
+<dl class="multi-line ul"><dd><ul><li>Partner</li></ul></dd></dl>
+<section><h2>Languages spoken</h2><ul class="three-cols"><li>English</li><li>French</li></ul></section>
+<ul><li><em class="highlight">Accredited</em> Family law panel</li></ul>
+<p><strong>Works at</strong> <a>Firm LLP</a></p>
+</body></html>"""
+
+
+def sample_lawsocni_detail() -> str:
+    solicitors = "".join(f"<span class='font-bold '>JOHN SMITH{i} LLB</span>" for i in range(12))
+    return f"""<html><body><div class="section-heading"><h1><span>Firm Solicitors</span></h1></div>
+<a href="mailto:info@firm.com">Send Enquiry</a><a href="tel:028 9000 0000">Call Now</a>
+<a href="https://www.firm.com">Visit the Website</a>
+<address>1 Main Street,
+  Belfast,
+  County Antrim, BT1 1AA</address>
+{solicitors}
+<span class="font-bold leading-[24px]">Conveyancing</span><span class="font-bold leading-[24px]">Probate</span>
+</body></html>"""
+
+
+# 页面类型 -> (示例页面, 字段规则, 从整页获取条目元素的函数)
+PAGES: Dict[str, Tuple[Callable[[], str], ExtractionSpec, Callable]] = {
+    'lawsociety_company_list': (
+        sample_company_list, CrawlerLawsociety.company_list_spec, CrawlerLawsociety._company_elements
+    ),
+    'lawsociety_lawyer_detail': (
+        sample_lawyer_detail, CrawlerLawsociety.lawyer_detail_spec, lambda tree: [tree]
+    ),
+    'lawsocni_detail': (
+        sample_lawsocni_detail, CrawlerLawsocni.detail_spec, lambda tree: [tree]
+    ),
+}
+
+
+def extract_uncompiled(spec: ExtractionSpec, element) -> Dict:
+    """改造前的方式：每个字段每次都以字符串表达式调用element.xpath"""
+    data = {}
+    for name, field in spec.fields.items():
+        values = []
+        for xpath in field.xpaths:
+            values.extend(element.xpath(xpath))
+        value = field.post(values) if field.post is not None else values
+        if field.default is not None and (value is None or value == '' or value == []):
+            value = field.default
+        data[name] = value
+    return data
+
+
+def bench(label: str, extract: Callable, elements: List, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for element in elements:
+            extract(element)
+    elapsed = time.perf_counter() - start
+    rate = iterations * len(elements) / elapsed
+    print(f"  {label:<10} {elapsed:8.3f}s  {rate:12,.0f} records/sec")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字段提取微基准")
+    parser.add_argument('--page', choices=sorted(PAGES), help="页面类型，默认全部")
+    parser.add_argument('--file', help="保存的页面HTML文件（需同时指定--page）")
+    parser.add_argument('--iterations', type=int, default=500, help="每种方式重复解析的轮数")
+    args = parser.parse_args()
+    if args.file and not args.page:
+        parser.error("--file需要同时指定--page")
+
+    for page in ([args.page] if args.page else sorted(PAGES)):
+        sample, spec, get_elements = PAGES[page]
+        if args.file:
+            with open(args.file, encoding='utf-8') as f:
+                content = f.read()
+        else:
+            content = sample()
+        elements = get_elements(html.fromstring(content))
+        if not elements:
+            print(f"{page}: 页面中没有可提取的条目")
+            continue
+        assert extract_uncompiled(spec, elements[0]) == spec.extract(elements[0]), "两种方式提取结果不一致"
+
+        print(f"{page}: {len(elements)} 个条目/页, {len(spec.fields)} 个字段, {args.iterations} 轮")
+        before = bench('before', lambda element: extract_uncompiled(spec, element), elements, args.iterations)
+        after = bench('after', spec.extract, elements, args.iterations)
+        print(f"  speedup    {after / before:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""lawscot公司条目索引基准：按公司ID索引 vs 线性扫描
+
+用法（在项目根目录执行，需要与服务相同的环境变量）:
+    python -m scripts.bench_lawscot_index
+    python -m scripts.bench_lawscot_index --firms 1000 --solicitors 12000
+
+1. 关联查找：每个律师结果按公司ID查找公司条目（每个律师查找两次：关联数据、递减待处理计数），
+   对比改造前的线性扫描与改造后的字典索引
+2. 离线完整爬取：用内存中的模拟数据替代网络请求，运行CrawlerLawscot完整流程，
+   CPU时间应主要花在JSON解析与数据构建上
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+from app.crawlers.crawler_lawscot import CrawlerLawscot
+
+
+def build_registry(firm_count: int, solicitor_count: int) -> Dict[str, str]:
+    """生成模拟的搜索页、公司详情与律师详情响应，返回{url: 响应内容}"""
+    rng = random.Random(42)
+    firm_ids = [f"F{i:05d}" for i in range(firm_count)]
+    # 律师按随机权重分配到公司，模拟大小不一的律所
+    weights = [rng.paretovariate(1.2) for _ in firm_ids]
+    owners = rng.choices(firm_ids, weights=weights, k=solicitor_count)
+    solicitors: Dict[str, List[str]] = {firm_id: [] for firm_id in firm_ids}
+    for i, firm_id in enumerate(owners):
+        solicitors[firm_id].append(f"S{i:06d}")
+
+    base_url = CrawlerLawscot.base_url
+    responses = {
+        'search': "<html><body>" + "".join(
+            f"<button class='print' data-list-item-id='{firm_id}'></button>" for firm_id in firm_ids
+        ) + "</body></html>"
+    }
+    for firm_id in firm_ids:
+        responses[f"{base_url}/GetLegalFirmDetail?id={firm_id}"] = json.dumps({
+            'Company': f"Firm {firm_id}",
+            'Email': f"info@{firm_id.lower()}.co.uk",
+            'Telephone': '0131 000 0000',
+            'FullAddress': '1 High Street\rEdinburgh\rEH1 1AA',
+            'City': 'EDINBURGH',
+            'Postcode': 'EH1 1AA',
+            'TotalSolicitorCount': len(solicitors[firm_id]),
+            'ScottishPartnerCount': 1,
+            'CategoriesOfWork': [{'Parent': {'PublicDescription': 'Conveyancing'}}],
+            'SolicitorsAtOffice': [{'Id': sid} for sid in solicitors[firm_id]]
+        })
+        for sid in solicitors[firm_id]:
+            responses[f"{base_url}/GetSolicitorDetail?id={sid}"] = json.dumps({
+                'Id': sid,
+                'Name': f"Solicitor {sid}",
+                'Email': f"{sid.lower()}@{firm_id.lower()}.co.uk",
+                'Telephone': '0131 111 1111',
+                'FullAddress': '1 High Street\rEdinburgh',
+                'CategoriesOfWork': [{'Parent': {'PublicDescription': 'Family'}}],
+                'AdmissionDate': '2001-01-01'
+            })
+    return responses
+
+
+def bench_lookup(firm_count: int, solicitor_count: int) -> None:
+    rng = random.Random(7)
+    entries = [{'firm_id': f"F{i:05d}", 'parsed_solicitors': [], 'pending_solicitors': 0} for i in range(firm_count)]
+    lookups = [rng.choice(entries)['firm_id'] for _ in range(solicitor_count)]
+
+    start = time.perf_counter()
+    for firm_id in lookups:
+        for _ in range(2):
+            next((f for f in entries if f['firm_id'] == firm_id), None)
+    scan = time.perf_counter() - start
+
+    index = {entry['firm_id']: entry for entry in entries}
+    start = time.perf_counter()
+    for firm_id in lookups:
+        for _ in range(2):
+            index.get(firm_id)
+    indexed = time.perf_counter() - start
+
+    print(f"关联查找 ({firm_count} 家公司, {solicitor_count} 名律师):")
+    print(f"  线性扫描   {scan:8.3f}s")
+    print(f"  字典索引   {indexed:8.3f}s  ({scan / indexed:,.0f}x)")
+
+
+async def bench_crawl(responses: Dict[str, str]) -> None:
+    crawler = CrawlerLawscot('search', {
+        'use_cache': False,
+        'max_concurrency': 50
+    })
+
+    async def fetch(url: str) -> str:
+        return responses[url]
+
+    crawler._fetch_page_content = fetch
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = await crawler.crawl()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    lawyers = sum(len(company['lawyers']) for company in result['companies'])
+    print(f"离线完整爬取: {len(result['companies'])} 家公司, {lawyers} 名律师")
+    print(f"  耗时 {elapsed:.3f}s, CPU {cpu:.3f}s, {(len(responses) - 1) / elapsed:,.0f} 响应/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="lawscot公司条目索引基准")
+    parser.add_argument('--firms', type=int, default=1000)
+    parser.add_argument('--solicitors', type=int, default=12000)
+    args = parser.parse_args()
+
+    bench_lookup(args.firms, args.solicitors)
+    asyncio.run(bench_crawl(build_registry(args.firms, args.solicitors)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""本地fixture服务器：通过HTTP提供录制的爬虫响应，可配置延迟与错误率
+
+用法（在项目根目录执行，需要与服务相同的环境变量）:
+    python -m scripts.fixture_server
+    python -m scripts.fixture_server --port 8900 --latency 0.05 --jitter 0.02 --error-rate 0.05 --seed 1
+
+爬虫通过URL改写访问本服务器（live模式）:
+    CRAWLER_HTTP_REWRITE='{"https://": "http://127.0.0.1:8900/"}'
+请求 http://127.0.0.1:8900/www.lawscot.org.uk/... 还原为 https://www.lawscot.org.uk/... 后，
+按方法、URL与请求体在CRAWLER_REPLAY_DIR下各爬虫的录制目录中查找响应。
+错误率按固定随机种子注入503（Retry-After: 0），同一种子下的错误序列可复现。
+"""
+import argparse
+import asyncio
+import random
+from pathlib import Path
+from typing import List
+from aiohttp import web
+from app.core.config import settings
+from app.crawlers.replay import ReplayStore, request_key
+
+ORIGINAL_SCHEME = 'https://'
+
+
+def create_app(root: str, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+               seed: int = 0) -> web.Application:
+    stores: List[ReplayStore] = [ReplayStore(path) for path in sorted(Path(root).iterdir()) if path.is_dir()]
+    rng = random.Random(seed)
+    stats = {'served': 0, 'errors': 0, 'missed': 0}
+
+    async def handle(request: web.Request) -> web.Response:
+        url = ORIGINAL_SCHEME + str(request.rel_url)[1:]
+        body = await request.read()
+        delay = latency + (rng.uniform(0, jitter) if jitter else 0)
+        inject_error = error_rate > 0 and rng.random() < error_rate
+        if delay:
+            await asyncio.sleep(delay)
+        if inject_error:
+            stats['errors'] += 1
+            return web.Response(status=503, headers={'Retry-After': '0'}, text='injected error')
+
+        key = request_key(request.method, url, body or None)
+        for store in stores:
+            entry = store.get(key)
+            if entry is not None:
+                stats['served'] += 1
+                return web.Response(status=entry['status'], headers=dict(entry['headers']), body=entry['body'])
+        stats['missed'] += 1
+        return web.Response(status=404, text=f"no recording for {request.method} {url}")
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app['stats'] = stats
+    app.router.add_route('*', '/{tail:.*}', handle)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地fixture服务器")
+    parser.add_argument('--dir', default=settings.CRAWLER_REPLAY_DIR, help="录制目录（每个爬虫一个子目录）")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.0, help="每个响应的固定延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.0, help="额外随机延迟上限（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="注入503错误的概率")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.dir, args.latency, args.jitter, args.error_rate, args.seed)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""从离线邮编中心点CSV批量预加载邮编经纬度缓存
+
+用法（在项目根目录执行，需要与服务相同的环境变量）:
+    python -m scripts.preload_geocode_cache path/to/postcodes.csv
+    python -m scripts.preload_geocode_cache path/to/ONSPD.csv --postcode-column pcds --lat-column lat --lng-column long
+"""
+import argparse
+import time
+from app.services.geocode_cache import geocode_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预加载邮编经纬度缓存")
+    parser.add_argument('csv_path', help="邮编中心点CSV文件")
+    parser.add_argument('--postcode-column', default='postcode')
+    parser.add_argument('--lat-column', default='latitude')
+    parser.add_argument('--lng-column', default='longitude')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    imported = geocode_cache.preload_csv(args.csv_path, args.postcode_column, args.lat_column, args.lng_column)
+    print(f"导入 {imported} 条邮编经纬度到 {geocode_cache.path}，耗时 {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
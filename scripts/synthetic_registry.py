@@ -0,0 +1,239 @@
+"""合成注册库服务器：按指定规模生成lawsocni、lawscot页面，并模拟Attio CRM接口
+
+用法（在项目根目录执行，需要与服务相同的环境变量）:
+    python -m scripts.synthetic_registry --firms 10000 --solicitors 200000 --port 8901
+
+爬虫通过URL改写访问本服务器:
+    CRAWLER_HTTP_REWRITE='{"https://": "http://127.0.0.1:8901/"}'
+    CRM_URL=http://127.0.0.1:8901/attio/v2
+
+页面按请求即时生成（同一种子下内容固定），内存占用与规模基本无关:
+    https://www.lawsoc-ni.org/solicitors-search                     lawsocni搜索列表页（全部公司链接）
+    https://www.lawsoc-ni.org/solicitors/<n>/<slug>                 lawsocni公司详情页（含律师姓名）
+    https://www.lawscot.org.uk/find-a-solicitor/                    lawscot搜索页（全部公司ID）
+    https://www.lawscot.org.uk/umbraco/surface/Imis/GetLegalFirmDetail?id=F<n>
+    https://www.lawscot.org.uk/umbraco/surface/Imis/GetSolicitorDetail?id=S<n>
+    /attio/v2/objects/<object>/records[/<record_id>|/query]         Attio记录写入与查询
+"""
+import argparse
+import bisect
+import itertools
+import json
+import multiprocessing
+import random
+import socket
+import time
+import urllib.request
+from typing import Dict, List, Optional
+from aiohttp import web
+
+LAWSOCNI_HOST = 'www.lawsoc-ni.org'
+LAWSCOT_HOST = 'www.lawscot.org.uk'
+LAWSOCNI_SEARCH_URL = f"https://{LAWSOCNI_HOST}/solicitors-search"
+LAWSCOT_SEARCH_URL = f"https://{LAWSCOT_HOST}/find-a-solicitor/"
+
+_TOWNS = ['Belfast', 'Derry', 'Newry', 'Lisburn', 'Armagh', 'Omagh', 'Edinburgh', 'Glasgow', 'Aberdeen', 'Dundee']
+_AREAS = ['Conveyancing', 'Probate', 'Family', 'Crime', 'Employment', 'Immigration', 'Personal Injury', 'Commercial']
+_SURNAMES = ['SMITH', 'BROWN', 'WILSON', 'CAMPBELL', 'STEWART', 'THOMSON', 'ROBERTSON', 'ANDERSON', 'MURRAY', 'REID']
+
+
+class SyntheticRegistry:
+    """按公司序号即时生成页面内容的合成注册库
+
+    律师按帕累托权重分配到公司（大小不一的律所），每家公司的律师序号连续，
+    由前缀和即可从律师序号反查所属公司。
+    """
+
+    def __init__(self, firm_count: int, solicitor_count: int, seed: int = 42):
+        rng = random.Random(seed)
+        weights = [rng.paretovariate(1.2) for _ in range(firm_count)]
+        total = sum(weights)
+        counts = [int(solicitor_count * weight / total) for weight in weights]
+        # 取整误差补到最大的公司
+        counts[max(range(firm_count), key=counts.__getitem__)] += solicitor_count - sum(counts)
+        self.firm_count = firm_count
+        self.solicitor_count = solicitor_count
+        self.seed = seed
+        self.counts = counts
+        self.offsets = list(itertools.accumulate(counts, initial=0))
+
+    def _rng(self, *key) -> random.Random:
+        return random.Random(f"{self.seed}:{':'.join(map(str, key))}")
+
+    def _areas(self, rng: random.Random) -> List[str]:
+        return rng.sample(_AREAS, rng.randint(1, 4))
+
+    def firm_of(self, solicitor: int) -> int:
+        return bisect.bisect_right(self.offsets, solicitor) - 1
+
+    # lawsocni ------------------------------------------------------------
+
+    def lawsocni_search(self) -> str:
+        links = ''.join(
+            f"<li><a class='print' href='https://{LAWSOCNI_HOST}/solicitors/{n}/firm-{n}'>Firm {n}</a></li>"
+            for n in range(self.firm_count)
+        )
+        return f"<html><body><ul>{links}</ul></body></html>"
+
+    def lawsocni_detail(self, n: int) -> str:
+        rng = self._rng('lawsocni', n)
+        town = rng.choice(_TOWNS[:6])
+        solicitors = ''.join(
+            f"<span class='font-bold '>{rng.choice(_SURNAMES)} JOHN{s} LLB</span>"
+            for s in range(self.offsets[n], self.offsets[n + 1])
+        )
+        areas = ''.join(f"<span class='font-bold leading-[24px]'>{area}</span>" for area in self._areas(rng))
+        return f"""<html><body><div class="section-heading"><h1><span>Firm {n} Solicitors</span></h1></div>
+<a href="mailto:info@firm{n}.example.com">Send Enquiry</a><a href="tel:028 9{n:07d}">Call Now</a>
+<a href="https://www.firm{n}.example.com">Visit the Website</a>
+<address>{n} Main Street,
+  {town},
+  County Antrim, BT{n % 90 + 1} {n % 9 + 1}AA</address>
+{solicitors}
+{areas}
+</body></html>"""
+
+    # lawscot -------------------------------------------------------------
+
+    def lawscot_search(self) -> str:
+        buttons = ''.join(
+            f"<button class='print' data-list-item-id='F{n:06d}'></button>" for n in range(self.firm_count)
+        )
+        return f"<html><body>{buttons}</body></html>"
+
+    def lawscot_firm(self, n: int) -> str:
+        rng = self._rng('lawscot', n)
+        town = rng.choice(_TOWNS[6:])
+        return json.dumps({
+            'Company': f"Firm {n} LLP",
+            'Email': f"info@firm{n}.example.co.uk",
+            'Telephone': f"0131 {n:07d}",
+            'FullAddress': f"{n} High Street\r{town}\rEH{n % 99 + 1} 1AA",
+            'City': town.upper(),
+            'Postcode': f"EH{n % 99 + 1} 1AA",
+            'TotalSolicitorCount': self.counts[n],
+            'ScottishPartnerCount': rng.randint(1, 5),
+            'CategoriesOfWork': [{'Parent': {'PublicDescription': area}} for area in self._areas(rng)],
+            'SolicitorsAtOffice': [{'Id': f"S{s:07d}"} for s in range(self.offsets[n], self.offsets[n + 1])]
+        })
+
+    def lawscot_solicitor(self, s: int) -> str:
+        rng = self._rng('solicitor', s)
+        n = self.firm_of(s)
+        return json.dumps({
+            'Id': f"S{s:07d}",
+            'Name': f"{rng.choice(_SURNAMES).capitalize()} Solicitor{s}",
+            'Email': f"s{s}@firm{n}.example.co.uk",
+            'Telephone': f"0131 {s:07d}",
+            'FullAddress': f"{n} High Street\rEdinburgh",
+            'CategoriesOfWork': [{'Parent': {'PublicDescription': area}} for area in self._areas(rng)],
+            'AdmissionDate': f"{2000 + s % 24}-01-01"
+        })
+
+
+def create_app(registry: SyntheticRegistry) -> web.Application:
+    stats: Dict[str, int] = {'pages': 0, 'crm_requests': 0, 'not_found': 0}
+    record_ids = itertools.count(1)
+
+    def not_found(request: web.Request) -> web.Response:
+        stats['not_found'] += 1
+        return web.Response(status=404, text=f"unknown path {request.path}")
+
+    def parse_index(value: str, prefix: str = '') -> Optional[int]:
+        try:
+            return int(value[len(prefix):]) if value.startswith(prefix) else None
+        except ValueError:
+            return None
+
+    async def site(request: web.Request) -> web.Response:
+        host, path = request.match_info['host'], '/' + request.match_info['path']
+        stats['pages'] += 1
+        if host == LAWSOCNI_HOST:
+            if path == '/solicitors-search':
+                return web.Response(text=registry.lawsocni_search(), content_type='text/html')
+            parts = path.strip('/').split('/')
+            n = parse_index(parts[1]) if len(parts) >= 2 and parts[0] == 'solicitors' else None
+            if n is not None and 0 <= n < registry.firm_count:
+                return web.Response(text=registry.lawsocni_detail(n), content_type='text/html')
+        elif host == LAWSCOT_HOST:
+            if path == '/find-a-solicitor/':
+                return web.Response(text=registry.lawscot_search(), content_type='text/html')
+            item_id = request.query.get('id', '')
+            if path.endswith('/GetLegalFirmDetail'):
+                n = parse_index(item_id, 'F')
+                if n is not None and 0 <= n < registry.firm_count:
+                    return web.Response(text=registry.lawscot_firm(n), content_type='application/json')
+            elif path.endswith('/GetSolicitorDetail'):
+                s = parse_index(item_id, 'S')
+                if s is not None and 0 <= s < registry.solicitor_count:
+                    return web.Response(text=registry.lawscot_solicitor(s), content_type='application/json')
+        stats['pages'] -= 1
+        return not_found(request)
+
+    async def attio(request: web.Request) -> web.Response:
+        """模拟Attio：查询始终无匹配，写入返回新的record_id"""
+        stats['crm_requests'] += 1
+        await request.read()
+        if request.match_info.get('tail') == 'query':
+            return web.json_response({'data': []})
+        record_id = request.match_info.get('tail') or f"{request.match_info['object']}-{next(record_ids)}"
+        return web.json_response({'data': {'id': {'record_id': record_id}}})
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get('/_stats', get_stats)
+    app.router.add_route('*', '/attio/v2/objects/{object}/records', attio)
+    app.router.add_route('*', '/attio/v2/objects/{object}/records/{tail}', attio)
+    app.router.add_route('*', '/{host}/{path:.*}', site)
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _serve(firm_count: int, solicitor_count: int, seed: int, port: int) -> None:
+    web.run_app(create_app(SyntheticRegistry(firm_count, solicitor_count, seed)),
+                host='127.0.0.1', port=port, print=None, access_log=None)
+
+
+def start_server_process(firm_count: int, solicitor_count: int, seed: int = 42,
+                         port: Optional[int] = None) -> tuple[multiprocessing.Process, int]:
+    """在子进程中启动服务器（不计入调用进程的CPU与内存），返回(进程, 端口)"""
+    port = port or free_port()
+    process = multiprocessing.Process(target=_serve, args=(firm_count, solicitor_count, seed, port), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stats", timeout=1).read()
+            return process, port
+        except OSError:
+            if time.monotonic() > deadline or not process.is_alive():
+                process.terminate()
+                raise RuntimeError("合成注册库服务器启动失败")
+            time.sleep(0.1)
+
+
+def server_stats(port: int) -> Dict[str, int]:
+    return json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/_stats", timeout=5).read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成注册库服务器")
+    parser.add_argument('--firms', type=int, default=10000)
+    parser.add_argument('--solicitors', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--port', type=int, default=8901)
+    args = parser.parse_args()
+
+    print(f"合成注册库: {args.firms} 家公司, {args.solicitors} 名律师, http://127.0.0.1:{args.port}")
+    _serve(args.firms, args.solicitors, args.seed, args.port)
+
+
+if __name__ == '__main__':
+    main()
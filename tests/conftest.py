@@ -0,0 +1,90 @@
+import os
+import tempfile
+
+# Settings在导入时读取环境变量，测试只需要能构造配置，外部服务地址均不会被访问
+_TEST_ENV = {
+    'DATABASE_URL': f"sqlite:///{os.path.join(tempfile.gettempdir(), 'crawler_tests.sqlite3')}",
+    'DB_SCHEMA': 'main',
+    'OPENAI_API_KEY': 'test',
+    'CRM_API_URL': 'http://127.0.0.1:1',
+    'CRM_API_KEY': 'test',
+    'CRAWLER_A_URL': 'http://127.0.0.1:1',
+    'CRAWLER_B_URL': 'http://127.0.0.1:1',
+    'CRAWLER_C_URL': 'http://127.0.0.1:1',
+    'AF_GOOGLE_MAPS_API_KEY': 'test',
+    'AF_FUID': 'test',
+    'AF_BASE_URL': 'http://127.0.0.1:1',
+    'AF_GOOGLE_BASE_URL': 'http://127.0.0.1:1',
+    'CRM_URL': 'http://127.0.0.1:1',
+    'LAWSOCIETY_BASE_URL': 'http://127.0.0.1:1',
+    'CRAWLER_LAWSOCNI_ID': 'lawsocni',
+    'CRAWLER_LAWSCOT_ID': 'lawscot',
+    'CRAWLER_ADVISER_FINDER_ID': 'adviser_finder',
+    'CRAWLER_LAWSOCIETY_ID': 'lawsociety',
+    'LOG_PATH': os.path.join(tempfile.gettempdir(), 'crawler_tests.log'),
+}
+for _name, _value in _TEST_ENV.items():
+    os.environ.setdefault(_name, _value)
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import BigInteger, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from app.core.config import settings
+from app.core.database import Base, async_database_url, enable_sqlite_savepoints
+
+
+@compiles(BigInteger, 'sqlite')
+def _compile_big_integer_sqlite(type_, compiler, **kw):
+    # SQLite只有INTEGER PRIMARY KEY会自动分配ID，BigInteger主键需按INTEGER建表
+    return 'INTEGER'
+
+
+@pytest_asyncio.fixture
+async def make_db_sessionmaker(tmp_path):
+    """创建独立SQLite数据库（模型中的schema映射到默认库）的工厂，返回异步会话工厂；同一测试需要多个数据库时使用"""
+    engines = []
+
+    async def make(name: str = 'test'):
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / f'{name}.sqlite3'}",
+            execution_options={'schema_translate_map': {settings.DB_SCHEMA: None}}
+        )
+        enable_sqlite_savepoints(engine)
+        engines.append(engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+    yield make
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def db_sessionmaker(make_db_sessionmaker):
+    """每个测试独立的SQLite数据库"""
+    return await make_db_sessionmaker()
+
+
+@pytest_asyncio.fixture
+async def make_pg_sessionmaker():
+    """TEST_POSTGRES_URL指定的PostgreSQL测试库（未设置时跳过）：每次调用清空并重建DB_SCHEMA中的表，返回异步会话工厂。
+    copy模式的合并SQL直接引用DB_SCHEMA中的表名，不经过schema_translate_map，测试库需使用该schema"""
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip("未设置TEST_POSTGRES_URL")
+    engine = create_async_engine(async_database_url(url))
+
+    async def make():
+        async with engine.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {settings.DB_SCHEMA}"))
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        return async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+    yield make
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
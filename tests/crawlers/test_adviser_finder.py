@@ -0,0 +1,148 @@
+import json
+import math
+import random
+import time
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.crawlers import crawler_adviser_finder
+from app.crawlers.crawler_adviser_finder import CrawlerAdviserFinder
+from app.crawlers.registry import CrawlerRegistry
+from app.models.data_model import Task, TaskStatus, TaskType
+from app.services import crawler_trigger
+from app.services.crawler_trigger import CrawlerTriggerService
+
+
+def aura_response(*numbers: str) -> dict:
+    """aura接口响应：actions[].returnValue.returnValue[]为顾问条目"""
+    return {'actions': [{'returnValue': {'returnValue': [{
+        'accObj': {'BusinessName__c': f"Adviser {number}", 'Organisation_Reference_Number__c': number,
+                   'BillingAddress': {'street': f"{number} Street"}},
+        'locObj': {},
+    } for number in numbers]}}]}
+
+
+def make_crawler(**params) -> CrawlerAdviserFinder:
+    return CrawlerAdviserFinder(scrapy_url='', scrapy_params=params)
+
+
+def stub_centres(monkeypatch, failing: set):
+    """每个中心点返回以纬度命名的顾问，failing中的纬度请求失败"""
+    async def iter_adviser_list(self, lat, lng):
+        if round(lat, 1) in failing:
+            raise aiohttp.ClientConnectionError("connection reset")
+        yield self._parse_adviser_item(aura_response(f"{lat}")['actions'][0]['returnValue']['returnValue'][0])
+
+    monkeypatch.setattr(CrawlerAdviserFinder, '_iter_adviser_list', iter_adviser_list)
+
+
+# 3行x1列的网格：半径50英里时每行跨约1.02纬度
+BBOX = [51.0, -1.0, 54.0, -0.9]
+
+
+@pytest.mark.asyncio
+async def test_sweep_reports_failed_centres(monkeypatch):
+    crawler = make_crawler(bbox=BBOX)
+    centres = crawler._build_sweep_grid(tuple(BBOX), 50.0)
+    stub_centres(monkeypatch, {round(centres[0][0], 1)})
+    result = await crawler.crawl()
+    assert len(result['companies']) == len(centres) - 1
+    assert result['sweep'] == {'centres': len(centres), 'failed': 1, 'raw': len(centres) - 1, 'unique': len(centres) - 1}
+
+
+@pytest.mark.asyncio
+async def test_sweep_fails_when_every_centre_fails(monkeypatch):
+    crawler = make_crawler(bbox=BBOX)
+    stub_centres(monkeypatch, {round(lat, 1) for lat, _ in crawler._build_sweep_grid(tuple(BBOX), 50.0)})
+    with pytest.raises(RuntimeError, match="中心点查询失败"):
+        await crawler.crawl()
+
+
+@pytest.mark.asyncio
+async def test_postcode_query_failure_fails_crawl(monkeypatch):
+    async def lat_lng(self, postcode):
+        return 51.5, -0.1
+
+    monkeypatch.setattr(CrawlerAdviserFinder, '_get_lat_lng_from_postcode', lat_lng)
+    stub_centres(monkeypatch, {51.5})
+    with pytest.raises(RuntimeError, match="查询失败"):
+        await make_crawler(postcode='SW1A 1AA').crawl()
+
+
+@pytest.mark.asyncio
+async def test_sweep_stats_are_saved_in_task_result(db_sessionmaker, monkeypatch):
+    registry = CrawlerRegistry()
+    registry.load([])
+    registry.register(CrawlerAdviserFinder.scrapy_id, CrawlerAdviserFinder)
+    monkeypatch.setattr(crawler_trigger, 'crawler_registry', registry)
+    crawler = make_crawler(bbox=BBOX)
+    centres = crawler._build_sweep_grid(tuple(BBOX), 50.0)
+    stub_centres(monkeypatch, {round(centres[-1][0], 1)})
+
+    async with db_sessionmaker() as db:
+        task = Task(status=TaskStatus.IN_PROGRESS, type=TaskType.SCRAPY_COMPANY, scrapy_id=CrawlerAdviserFinder.scrapy_id,
+                    scrapy_params={'bbox': BBOX}, start_time=int(time.time()))
+        db.add(task)
+        await db.commit()
+        await CrawlerTriggerService(db).execute_task(task.id)
+        assert task.status == TaskStatus.COMPLETED
+        assert task.result_info['crawl']['sweep']['failed'] == 1
+        assert task.scraped_company_count == len(centres) - 1
+
+
+@pytest.mark.asyncio
+async def test_aura_request_retries_transient_failures(monkeypatch):
+    monkeypatch.setattr(crawler_adviser_finder.BaseCrawler, '_retry_backoff', staticmethod(lambda *args: 0))
+    requests = []
+
+    async def aura(request):
+        requests.append(await request.post())
+        if len(requests) < 3:
+            return web.Response(status=503)
+        return web.json_response(aura_response('A1', 'A2'))
+
+    app = web.Application()
+    app.router.add_post('/s/sfsites/aura', aura)
+    async with TestServer(app) as server:
+        crawler = make_crawler(bbox=BBOX)
+        crawler.base_url = str(server.make_url('')).rstrip('/')
+        try:
+            assert await crawler._collect_advisers(51.5, -0.1) == 2
+        finally:
+            await crawler.close()
+    assert len(requests) == 3
+    # 重试发送相同的查询
+    assert len({json.loads(form['message'])['actions'][0]['params']['params']['lat'] for form in requests}) == 1
+    assert [adviser['name'] for adviser in crawler.advisers] == ['Adviser A1', 'Adviser A2']
+
+
+def distance_miles(a: tuple, b: tuple) -> float:
+    """球面距离（英里），地球半径与网格计算使用的每纬度MILES_PER_DEGREE英里一致"""
+    earth_radius = crawler_adviser_finder.MILES_PER_DEGREE * 180 / math.pi
+    lat1, lng1, lat2, lng2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * earth_radius * math.asin(math.sqrt(h))
+
+
+@pytest.mark.parametrize('bbox, radius', [
+    (crawler_adviser_finder.UK_BBOX, 50.0),
+    (crawler_adviser_finder.UK_BBOX, 25.0),
+    ((51.28, -0.51, 51.69, 0.33), 5.0),
+    ((58.0, -7.0, 60.9, 1.8), 20.0),
+])
+def test_sweep_grid_covers_bbox(bbox, radius):
+    centres = CrawlerAdviserFinder._build_sweep_grid(bbox, radius)
+    south, west, north, east = bbox
+    rng = random.Random(0)
+    # 随机点及四个角（高纬度一侧的角离圆心最远）
+    points = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(2000)]
+    points += [(south, west), (south, east), (north, west), (north, east)]
+    worst = max(min(distance_miles(point, centre) for centre in centres) for point in points)
+    # 网格角点恰好落在圆上，圆心坐标保留5位小数（约0.001英里）
+    assert worst <= radius + 0.01
+
+
+def test_uk_sweep_grid_size():
+    # 50英里半径覆盖英国需要66次查询
+    assert len(CrawlerAdviserFinder._build_sweep_grid(crawler_adviser_finder.UK_BBOX, 50.0)) == 66
@@ -0,0 +1,146 @@
+import os
+import time
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.crawlers import base_crawler
+from app.crawlers.base_crawler import BaseCrawler
+from app.crawlers.http_cache import HttpCache
+
+
+class CrawlerCached(BaseCrawler):
+    scrapy_id = 'crawler_cached'
+
+
+def make_cache(root, **options) -> HttpCache:
+    return HttpCache(str(root), **{'ttl': 3600, 'max_bytes': 1024 * 1024, 'max_age': 7 * 24 * 3600, **options})
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path / 'http')
+    monkeypatch.setattr(base_crawler, 'http_cache', cache)
+    return cache
+
+
+@pytest_asyncio.fixture
+async def server():
+    """返回带ETag的页面，If-None-Match匹配时返回304；记录每个请求的路径及请求头"""
+    requests = []
+
+    async def page(request):
+        requests.append((request.path_qs, dict(request.headers)))
+        etag = f'"{request.path}-v1"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=f"body of {request.path}", headers={'ETag': etag})
+
+    app = web.Application()
+    app.router.add_get('/{name}', page)
+    async with TestServer(app) as server:
+        server.requests = requests
+        yield server
+
+
+@pytest_asyncio.fixture
+async def crawler():
+    crawler = CrawlerCached(scrapy_url='', scrapy_params={'use_cache': True, 'rate_limit': 1000})
+    yield crawler
+    await crawler.close()
+
+
+@pytest.mark.asyncio
+async def test_fresh_entry_is_served_from_cache(cache, server, crawler):
+    url = str(server.make_url('/a'))
+    assert await crawler._fetch_async(url) == 'body of /a'
+    assert await crawler._fetch_async(url) == 'body of /a'
+    assert len(server.requests) == 1
+    assert crawler.cache_stats == {'hit': 1, 'revalidated': 0, 'miss': 1, 'bypassed': 0}
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_revalidated(cache, server, crawler):
+    cache.ttl = 0
+    url = str(server.make_url('/a'))
+    await crawler._fetch_async(url)
+    fetched_at = cache.lookup(url)['fetched_at']
+    assert await crawler._fetch_async(url) == 'body of /a'
+
+    # 第二次请求携带ETag，服务器返回304，沿用缓存内容并刷新获取时间
+    assert server.requests[1][1].get('If-None-Match') == '"/a-v1"'
+    assert crawler.cache_stats == {'hit': 0, 'revalidated': 1, 'miss': 1, 'bypassed': 0}
+    assert cache.lookup(url)['fetched_at'] > fetched_at
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('path, headers', [
+    ('/a', {'Cookie': 'session=secret'}),
+    ('/a', {'Authorization': 'Bearer secret'}),
+    ('/a?key=secret', None),
+], ids=['cookie', 'authorization', 'key-param'])
+async def test_credentialed_requests_bypass_cache(cache, server, crawler, path, headers):
+    url = str(server.make_url(path))
+    # 同一URL已有未过期的缓存（如未登录时的内容）
+    cache.store(url, 'cached body')
+    for _ in range(2):
+        assert await crawler._fetch_async(url, headers=headers) == 'body of /a'
+    assert len(server.requests) == 2
+    assert crawler.cache_stats == {'hit': 0, 'revalidated': 0, 'miss': 0, 'bypassed': 2}
+    # 响应没有写入缓存，也没有条件请求头泄露缓存信息
+    assert cache.lookup(url)['body'] == 'cached body'
+    assert all('If-None-Match' not in request_headers for _, request_headers in server.requests)
+    assert len(list((cache.root / 'objects').iterdir())) == 1
+
+
+@pytest.mark.asyncio
+async def test_credentialed_response_is_never_written(tmp_path, cache, server, crawler):
+    url = str(server.make_url('/a'))
+    await crawler._fetch_async(url, headers={'Cookie': 'session=secret'})
+    await crawler._fetch_async(str(server.make_url('/b?api_key=secret')))
+    assert not (cache.root / 'index').exists() or not list((cache.root / 'index').iterdir())
+    assert b'secret' not in b''.join(path.read_bytes() for path in tmp_path.rglob('*') if path.is_file())
+
+
+def test_store_evicts_least_recently_used_bodies(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=250)
+    now = time.time()
+    for age, name in ((300, 'used'), (200, 'old'), (100, 'recent')):
+        url = f"http://example.com/{name}"
+        cache.store(url, name[0] * 60)
+        os.utime(cache._object_path(cache.lookup(url)['body_sha']), (now - age, now - age))
+    # 304后touch刷新最近使用时间，最早写入的used不再是最久未使用的
+    cache.touch('http://example.com/used', cache.lookup('http://example.com/used'))
+    # 超过上限后淘汰到上限的90%（225字节）：只需淘汰最久未使用的old
+    cache.store('http://example.com/new', 'n' * 100)
+
+    assert cache.lookup('http://example.com/old') is None
+    assert {name: (cache.lookup(f"http://example.com/{name}") or {}).get('body') for name in ('used', 'recent', 'new')} == {
+        'used': 'u' * 60, 'recent': 'r' * 60, 'new': 'n' * 100
+    }
+    assert cache._total_bytes == 220
+
+
+def test_prune_removes_entries_older_than_max_age(tmp_path):
+    cache = make_cache(tmp_path, max_age=3600)
+    cache.store('http://example.com/stale', 'stale body')
+    cache.store('http://example.com/fresh', 'fresh body')
+    cache.store('http://example.com/orphan', 'orphan body')
+    stale = cache.lookup('http://example.com/stale')
+    long_ago = time.time() - 7200
+    cache._write_index('http://example.com/stale', {**{k: v for k, v in stale.items() if k != 'body'}, 'fetched_at': long_ago})
+    os.utime(cache._object_path(stale['body_sha']), (long_ago, long_ago))
+    # 响应体已被淘汰的索引
+    orphan = cache.lookup('http://example.com/orphan')
+    cache._object_path(orphan['body_sha']).unlink()
+    cache._total_bytes -= len('orphan body')
+
+    # 距上次清理超过PRUNE_INTERVAL时，下一次store触发清理
+    cache._last_pruned = 0
+    cache.store('http://example.com/other', 'other body')
+    assert len(list((tmp_path / 'index').iterdir())) == 2
+    assert not cache._index_path('http://example.com/orphan').exists()
+    assert cache.lookup('http://example.com/stale') is None
+    assert cache.lookup('http://example.com/fresh')['body'] == 'fresh body'
+    assert not cache._object_path(stale['body_sha']).exists()
+    assert cache._total_bytes == len('fresh body') + len('other body')
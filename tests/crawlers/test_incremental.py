@@ -0,0 +1,143 @@
+import json
+import time
+import pytest
+from sqlalchemy import select
+from app.crawlers.crawler_lawscot import CrawlerLawscot
+from app.crawlers.crawler_lawsocni import CrawlerLawsocni
+from app.crawlers.registry import CrawlerRegistry
+from app.models.data_model import Company, Lawyer, Task, TaskStatus, TaskType
+from app.services import crawler_trigger
+from app.services.crawler_trigger import CrawlerTriggerService
+from app.services.data_storage import DataStorageService
+
+
+class FakeSite:
+    """按URL返回固定内容并记录请求；broken中的URL请求失败"""
+
+    def __init__(self, pages: dict):
+        self.pages = pages
+        self.broken = set()
+        self.requested = []
+
+    def stub(self, monkeypatch, crawler_class, method: str) -> None:
+        """替换爬虫的请求方法"""
+        async def fetch(crawler, url: str, *args, **kwargs) -> str:
+            self.requested.append(url)
+            if url in self.broken:
+                raise RuntimeError(f"503 for {url}")
+            return self.pages[url]
+
+        monkeypatch.setattr(crawler_class, method, fetch)
+
+
+def lawscot_pages() -> dict:
+    """3家公司：firm-1有2名律师，firm-2、firm-3各1名"""
+    base = CrawlerLawscot.base_url
+    firms = {'firm-1': ['sol-1a', 'sol-1b'], 'firm-2': ['sol-2a'], 'firm-3': ['sol-3a']}
+    pages = {'search': ''.join(f'<button class="print" data-list-item-id="{firm_id}"></button>' for firm_id in firms)}
+    for firm_id, solicitor_ids in firms.items():
+        pages[f"{base}/GetLegalFirmDetail?id={firm_id}"] = json.dumps({
+            'Company': f"Firm {firm_id}", 'Email': f"info@{firm_id}.example", 'FullAddress': f"1 {firm_id} Street",
+            'TotalSolicitorCount': len(solicitor_ids), 'SolicitorsAtOffice': [{'Id': sid} for sid in solicitor_ids],
+        })
+        for sid in solicitor_ids:
+            pages[f"{base}/GetSolicitorDetail?id={sid}"] = json.dumps({'Id': sid, 'Name': f"Solicitor {sid}"})
+    return pages
+
+
+@pytest.fixture(autouse=True)
+def incremental_registry(monkeypatch):
+    registry = CrawlerRegistry()
+    registry.load([])
+    registry.register(CrawlerLawscot.scrapy_id, CrawlerLawscot)
+    registry.register(CrawlerLawsocni.scrapy_id, CrawlerLawsocni)
+    monkeypatch.setattr(crawler_trigger, 'crawler_registry', registry)
+
+
+async def run_task(db_sessionmaker, scrapy_id: str, scrapy_url: str, **params) -> Task:
+    async with db_sessionmaker() as db:
+        task = Task(status=TaskStatus.IN_PROGRESS, type=TaskType.SCRAPY_COMPANY, scrapy_id=scrapy_id, scrapy_url=scrapy_url,
+                    scrapy_params={'incremental': True, **params}, start_time=int(time.time()))
+        db.add(task)
+        await db.commit()
+        await CrawlerTriggerService(db).execute_task(task.id)
+        return task
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('streaming', [False, True], ids=['batch', 'stream'])
+async def test_lawscot_skips_unchanged_firms(db_sessionmaker, monkeypatch, streaming):
+    site = FakeSite(lawscot_pages())
+    site.stub(monkeypatch, CrawlerLawscot, '_fetch_page_content')
+    base = CrawlerLawscot.base_url
+    site.broken.add(f"{base}/GetSolicitorDetail?id=sol-3a")
+
+    task = await run_task(db_sessionmaker, CrawlerLawscot.scrapy_id, 'search', streaming=streaming)
+    assert task.status == TaskStatus.COMPLETED
+    assert task.result_info['incremental'] == {'new': 3, 'changed': 0, 'unchanged': 0}
+    async with db_sessionmaker() as db:
+        fingerprints = await DataStorageService.load_fingerprints(db, CrawlerLawscot.scrapy_id)
+    # firm-3的律师未获取成功：公司已入库，但不记录指纹
+    assert set(fingerprints) == {'firm-1', 'firm-2'}
+
+    # 第二次运行：firm-1未变化，firm-2详情变化，firm-3的律师恢复正常
+    site.broken.clear()
+    site.requested.clear()
+    firm_2 = json.loads(site.pages[f"{base}/GetLegalFirmDetail?id=firm-2"])
+    site.pages[f"{base}/GetLegalFirmDetail?id=firm-2"] = json.dumps({**firm_2, 'Telephone': '0131 000 0000'})
+
+    task = await run_task(db_sessionmaker, CrawlerLawscot.scrapy_id, 'search', streaming=streaming)
+    assert task.status == TaskStatus.COMPLETED
+    assert task.result_info['incremental'] == {'new': 1, 'changed': 1, 'unchanged': 1}
+    # 未变化的公司不再请求律师详情，也不进入存储
+    assert not [url for url in site.requested if 'sol-1' in url]
+    assert f"{base}/GetSolicitorDetail?id=sol-3a" in site.requested
+    assert task.scraped_company_count == 2
+    async with db_sessionmaker() as db:
+        fingerprints = await DataStorageService.load_fingerprints(db, CrawlerLawscot.scrapy_id)
+        assert set(fingerprints) == {'firm-1', 'firm-2', 'firm-3'}
+        phones = dict((await db.execute(select(Company.name, Company.company_phone))).all())
+        assert phones['Firm firm-2'] == '0131 000 0000'
+        lawyers = (await db.execute(select(Lawyer.name).order_by(Lawyer.name))).scalars().all()
+        assert lawyers == ['Solicitor sol-1a', 'Solicitor sol-1b', 'Solicitor sol-2a', 'Solicitor sol-3a']
+
+
+def lawsocni_detail(name: str, phone: str) -> str:
+    return (f'<div class="section-heading"><h1><span>{name}</span></h1></div>'
+            f'<a href="tel:{phone}">Call Now</a><a href="https://{name.replace(" ", "").lower()}.example">Visit the Website</a>'
+            f'<address>1 {name} Street, Belfast</address>'
+            f'<span class="font-bold ">Solicitor of {name}</span>')
+
+
+@pytest.mark.asyncio
+async def test_lawsocni_skips_unchanged_detail_pages(db_sessionmaker, monkeypatch):
+    search = 'http://lawsocni.example/search?limit=10'
+    site = FakeSite({
+        search: ''.join(f'<a class="print" href="http://lawsocni.example/firm-{num}"></a>' for num in (1, 2)),
+        'http://lawsocni.example/firm-1': lawsocni_detail('Firm 1', '028 0000 0001'),
+        'http://lawsocni.example/firm-2': lawsocni_detail('Firm 2', '028 0000 0002'),
+    })
+    site.stub(monkeypatch, CrawlerLawsocni, '_fetch_async')
+    parsed = []
+    parse_in_pool = CrawlerLawsocni._parse_in_pool
+
+    async def record_parse(self, name, html_content):
+        parsed.append(html_content)
+        return await parse_in_pool(self, name, html_content)
+
+    monkeypatch.setattr(CrawlerLawsocni, '_parse_in_pool', record_parse)
+
+    task = await run_task(db_sessionmaker, CrawlerLawsocni.scrapy_id, search, stream_list=False)
+    assert task.result_info['incremental'] == {'new': 2, 'changed': 0, 'unchanged': 0}
+    assert task.scraped_company_count == 2
+
+    site.pages['http://lawsocni.example/firm-2'] = lawsocni_detail('Firm 2', '028 0000 0022')
+    parsed.clear()
+    task = await run_task(db_sessionmaker, CrawlerLawsocni.scrapy_id, search, stream_list=False)
+    assert task.result_info['incremental'] == {'new': 0, 'changed': 1, 'unchanged': 1}
+    # 未变化的详情页不解析、不入库
+    assert parsed == [site.pages['http://lawsocni.example/firm-2']]
+    assert task.scraped_company_count == 1
+    async with db_sessionmaker() as db:
+        phones = dict((await db.execute(select(Company.name, Company.company_phone))).all())
+    assert phones == {'Firm 1': '028 0000 0001', 'Firm 2': '028 0000 0022'}
@@ -0,0 +1,75 @@
+from urllib.parse import parse_qs, urlparse
+import pytest
+from lxml import html
+from app.crawlers.crawler_lawsociety import CrawlerLawsociety, parse_company_list_page
+
+TOTAL_PAGES = 12
+BASE_URL = 'https://solicitors.example'
+
+
+def pager_html(page: int, window: int = 2, last_link: bool = False, numbered: bool = True) -> str:
+    """模拟只显示当前页前后window页的分页栏"""
+    links = []
+    if numbered:
+        for num in range(max(1, page - window), min(TOTAL_PAGES, page + window) + 1):
+            if num != page:
+                links.append(f"<li><a href='/find?q=x&page={num}'>{num}</a></li>")
+    if page < TOTAL_PAGES:
+        links.append(f"<li><a href='/find?q=x&page={page + 1}'>Next</a></li>")
+        if last_link:
+            links.append(f"<li><a href='/find?q=x&page={TOTAL_PAGES}'>Last</a></li>")
+    return f"<html><body><ul class='pagination'>{''.join(links)}</ul></body></html>"
+
+
+def make_crawler(**pager_options):
+    crawler = CrawlerLawsociety(scrapy_url=f"{BASE_URL}/find?q=x",
+                                scrapy_params={'page_type': 'company_list', 'page_concurrency': 3})
+    crawler.base_url = BASE_URL
+    crawler.fetched = []
+
+    async def fetch_and_parse(url):
+        page_num = int(parse_qs(urlparse(url).query).get('page', ['1'])[0])
+        crawler.fetched.append(page_num)
+        page = parse_company_list_page(pager_html(page_num, **pager_options))
+        page['records'] = [page_num]
+        return page
+
+    crawler._fetch_and_parse_page = fetch_and_parse
+    return crawler
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('pager_options', [
+    {'last_link': True},
+    {'last_link': False},
+    {'window': 0, 'numbered': False},
+], ids=['last-link', 'windowed', 'next-only'])
+async def test_pagination_collects_every_page_in_order(pager_options):
+    crawler = make_crawler(**pager_options)
+    collected = []
+    await crawler._handle_pagination(f"{BASE_URL}/find?q=x", collected.extend)
+    assert collected == list(range(1, TOTAL_PAGES + 1))
+    assert sorted(crawler.fetched) == list(range(1, TOTAL_PAGES + 1))
+
+
+def test_windowed_pager_does_not_claim_last_page():
+    tree = html.fromstring(pager_html(1))
+    assert CrawlerLawsociety._extract_total_pages(tree) == ('page', 3, False)
+
+
+def test_last_link_gives_total_pages():
+    tree = html.fromstring(pager_html(1, last_link=True))
+    assert CrawlerLawsociety._extract_total_pages(tree) == ('page', TOTAL_PAGES, True)
+
+
+@pytest.mark.parametrize('markup, is_last', [
+    ("<a href='?page=9'>Last</a>", True),
+    ("<a href='?page=9'>Last &#187;</a>", True),
+    ("<a href='?page=9'>&gt;&gt;</a>", True),
+    ("<a href='?page=9' class='page-link last'>9</a>", True),
+    ("<a href='?page=9' aria-label='Last page'></a>", True),
+    ("<a href='?page=9'>9</a>", False),
+    ("<a href='?page=2'>Next</a>", False),
+])
+def test_is_last_page_link(markup, is_last):
+    assert CrawlerLawsociety._is_last_page_link(html.fragment_fromstring(markup)) is is_last
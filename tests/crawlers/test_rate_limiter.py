@@ -0,0 +1,89 @@
+import asyncio
+import gc
+import time
+import pytest
+from app.crawlers.rate_limiter import HostRateLimiter, RateLimiterRegistry
+
+
+class _Owner:
+    """代替爬虫实例登记限速参数"""
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_request_rate():
+    limiter = HostRateLimiter('example.com', rate=20, max_in_flight=100)
+    # 桶容量等于速率，先耗尽初始突发令牌
+    for _ in range(20):
+        async with limiter:
+            pass
+    start = time.monotonic()
+    for _ in range(10):
+        async with limiter:
+            pass
+    # 之后每个请求需等待约1/rate秒
+    assert time.monotonic() - start >= 9 / 20
+
+
+@pytest.mark.asyncio
+async def test_max_in_flight_caps_concurrent_requests():
+    limiter = HostRateLimiter('example.com', rate=1000, max_in_flight=3)
+    running = peak = 0
+
+    async def request():
+        nonlocal running, peak
+        async with limiter:
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(request() for _ in range(20)))
+    assert peak == 3
+
+
+@pytest.mark.parametrize('rate, max_in_flight', [(0, 1), (-1, 1), (1, 0)])
+def test_invalid_limits_are_rejected(rate, max_in_flight):
+    with pytest.raises(ValueError):
+        HostRateLimiter('example.com', rate, max_in_flight)
+    with pytest.raises(ValueError):
+        RateLimiterRegistry().get('http://example.com/', rate, max_in_flight, owner=_Owner())
+
+
+def test_registry_applies_strictest_limits_per_host():
+    registry = RateLimiterRegistry()
+    fast, slow = _Owner(), _Owner()
+    limiter = registry.get('http://example.com/a', 10, 5, owner=fast)
+    assert registry.get('https://EXAMPLE.com/b', 2, 8, owner=slow) is limiter
+    # 后来的调用者不能放宽其他任务设置的限制
+    registry.get('http://example.com/c', 10, 5, owner=fast)
+    assert (limiter.rate, limiter.max_in_flight) == (2, 5)
+    assert registry.get('http://other.com/', 10, 5, owner=fast) is not limiter
+
+    registry.unregister(slow)
+    assert (limiter.rate, limiter.max_in_flight) == (10, 5)
+
+
+def test_registry_drops_limits_of_collected_owners():
+    registry = RateLimiterRegistry()
+    owner, transient = _Owner(), _Owner()
+    limiter = registry.get('http://example.com/', 10, 5, owner=owner)
+    registry.get('http://example.com/', 1, 1, owner=transient)
+    assert (limiter.rate, limiter.max_in_flight) == (1, 1)
+    del transient
+    gc.collect()
+    registry.get('http://example.com/', 10, 5, owner=owner)
+    assert (limiter.rate, limiter.max_in_flight) == (10, 5)
+
+
+@pytest.mark.asyncio
+async def test_raising_max_in_flight_wakes_waiters():
+    limiter = HostRateLimiter('example.com', rate=1000, max_in_flight=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    limiter.configure(1000, 2)
+    await asyncio.wait_for(waiter, timeout=1)
+    await limiter.release()
+    await limiter.release()
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.crawlers.scheduler import CrawlScheduler
+
+
+class Recorder:
+    """记录任务执行顺序及同时执行的任务数"""
+
+    def __init__(self):
+        self.order = []
+        self.running = 0
+        self.peak = 0
+
+    def job(self, name: str, delay: float = 0.01, then=None):
+        async def run():
+            self.order.append(name)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            await asyncio.sleep(delay)
+            self.running -= 1
+            if then is not None:
+                then()
+        return run
+
+
+@pytest.mark.asyncio
+async def test_peak_concurrency_equals_max_concurrency():
+    scheduler = CrawlScheduler(3)
+    recorder = Recorder()
+    for num in range(20):
+        scheduler.submit(f"group-{num % 4}", recorder.job(f"job-{num}"))
+    await scheduler.run()
+    assert recorder.peak == 3
+    assert scheduler.stats == {'submitted': 20, 'completed': 20, 'failed': 0, 'peak_running': 3}
+
+
+@pytest.mark.asyncio
+async def test_jobs_submitted_while_running_are_executed():
+    scheduler = CrawlScheduler(4)
+    recorder = Recorder()
+    children_ran = asyncio.Event()
+
+    def child(num: int):
+        async def run():
+            await recorder.job(f"child-{num}", delay=0.05)()
+            if recorder.order.count('parent') and len(recorder.order) == 4:
+                children_ran.set()
+        return run
+
+    async def parent():
+        recorder.order.append('parent')
+        # 此时其余worker已因队列为空进入等待
+        await asyncio.sleep(0.01)
+        for num in range(6):
+            scheduler.submit('firm-1', child(num))
+        # 父任务仍在执行：子任务只能由提交时的唤醒交给空闲worker
+        await asyncio.wait_for(children_ran.wait(), timeout=1)
+
+    scheduler.submit('firms', parent)
+    await asyncio.wait_for(scheduler.run(), timeout=5)
+    assert recorder.order == ['parent'] + [f"child-{num}" for num in range(6)]
+    # 父任务占用一个worker，其余3个worker并发执行子任务
+    assert recorder.peak == 3
+    assert scheduler.stats == {'submitted': 7, 'completed': 7, 'failed': 0, 'peak_running': 4}
+    # 唤醒任务在完成后释放
+    assert not scheduler._notify_tasks
+
+
+@pytest.mark.asyncio
+async def test_failed_job_does_not_stop_other_jobs():
+    scheduler = CrawlScheduler(2)
+    recorder = Recorder()
+
+    async def fail():
+        raise RuntimeError("detail page 500")
+
+    scheduler.submit('firm-1', fail)
+    for num in range(3):
+        scheduler.submit('firm-2', recorder.job(f"job-{num}"))
+    await scheduler.run()
+    assert len(recorder.order) == 3
+    assert (scheduler.stats['completed'], scheduler.stats['failed']) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_small_group_is_not_starved_behind_large_group():
+    scheduler = CrawlScheduler(1)
+    recorder = Recorder()
+    for num in range(20):
+        scheduler.submit('large', recorder.job('large', delay=0))
+    for num in range(2):
+        scheduler.submit('small', recorder.job('small', delay=0))
+    await scheduler.run()
+    # 分组轮转：小分组的任务穿插在大分组的前几个任务之间，而不是排在20个任务之后
+    assert recorder.order[:5] == ['large', 'small', 'large', 'small', 'large']
+    assert recorder.order.count('large') == 20
@@ -0,0 +1,198 @@
+import asyncio
+import time
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from app.core.config import settings
+from app.crawlers.base_crawler import BaseCrawler
+from app.crawlers.checkpoint import CrawlCheckpoint
+from app.crawlers.registry import CrawlerRegistry
+from app.models.data_model import CRAWL_META_KEY, Company, Task, TaskStatus, TaskType
+from app.services import crawler_trigger
+from app.services.crawler_trigger import CrawlerTriggerService
+from app.services.data_storage import DataStorageService
+
+FIRM_COUNT = 35
+
+
+class CrawlerFlaky(BaseCrawler):
+    """搜索页发现FIRM_COUNT家公司，处理到第fail_after家时站点出错"""
+    scrapy_id = 'crawler_flaky'
+    supports_streaming = True
+    supports_checkpoint = True
+    fail_after = None
+    processed = []
+
+    async def _crawl_into_stream(self) -> None:
+        todo = self._resume_items()
+        if todo is None:
+            todo = self._checkpoint_frontier([f"firm-{i}" for i in range(FIRM_COUNT)])
+            self._checkpoint_frontier_complete()
+        for num, key in enumerate(todo):
+            if num == self.fail_after:
+                raise RuntimeError("站点返回503")
+            self.processed.append(key)
+            await self._emit_company({
+                'name': key,
+                'domains': f"{key}.example",
+                'source_name': 'flaky',
+                'lawyers': [],
+                CRAWL_META_KEY: {'item_key': key, 'fingerprint': key}
+            })
+
+
+@pytest.fixture(autouse=True)
+def flaky_registry(monkeypatch):
+    registry = CrawlerRegistry()
+    registry.load([])
+    registry.register(CrawlerFlaky.scrapy_id, CrawlerFlaky)
+    monkeypatch.setattr(crawler_trigger, 'crawler_registry', registry)
+    monkeypatch.setattr(CrawlerFlaky, 'processed', [])
+    yield
+    crawler_trigger._running_task_ids.clear()
+
+
+async def add_task(db_sessionmaker, **values) -> int:
+    now = int(time.time())
+    values = {'status': TaskStatus.FAILED, 'type': TaskType.SCRAPY_COMPANY, 'scrapy_id': CrawlerFlaky.scrapy_id,
+              'scrapy_params': {'checkpoint': True}, 'start_time': now, 'update_date': now, **values}
+    async with db_sessionmaker() as db:
+        task = Task(**values)
+        db.add(task)
+        await db.commit()
+        return task.id
+
+
+async def resume(db_sessionmaker, task_id: int):
+    async with db_sessionmaker() as db:
+        return await CrawlerTriggerService(db).resume_task(task_id)
+
+
+def test_checkpoint_round_trip_retries_failed_items():
+    checkpoint = CrawlCheckpoint()
+    assert checkpoint.add_frontier(['a', 'b', 'c', 'a']) == ['a', 'b', 'c', 'a']
+    checkpoint.complete_frontier()
+    checkpoint.mark_done('a')
+    checkpoint.mark_failed('b')
+    checkpoint.mark_done('b')
+
+    restored = CrawlCheckpoint.from_dict(checkpoint.to_dict())
+    assert restored.frontier == ['a', 'b', 'c']
+    assert restored.stats() == {'frontier': 3, 'done': 1, 'failed': 1, 'pending': 2}
+    assert restored.start_run() == ['b', 'c']
+    assert restored.failed == set()
+
+
+def test_incomplete_frontier_restarts_from_search_page():
+    checkpoint = CrawlCheckpoint(frontier=['a', 'b'], done=['a'])
+    assert checkpoint.start_run() is None
+    assert checkpoint.add_frontier(['a', 'b', 'c']) == ['b', 'c']
+
+
+@pytest.mark.asyncio
+async def test_resume_continues_from_checkpoint(db_sessionmaker, monkeypatch):
+    monkeypatch.setattr(CrawlerFlaky, 'fail_after', 32)
+    task_id = await add_task(db_sessionmaker, status=TaskStatus.IN_PROGRESS)
+    async with db_sessionmaker() as db:
+        with pytest.raises(RuntimeError):
+            await CrawlerTriggerService(db).execute_task(task_id)
+
+    async with db_sessionmaker() as db:
+        task = await db.get(Task, task_id)
+        assert task.status == TaskStatus.FAILED
+        # 每批30家公司，第一批提交后标记完成，第二批未提交
+        assert CrawlCheckpoint.from_dict(task.checkpoint).stats()['done'] == 30
+
+    monkeypatch.setattr(CrawlerFlaky, 'fail_after', None)
+    CrawlerFlaky.processed.clear()
+    await resume(db_sessionmaker, task_id)
+    assert task_id in crawler_trigger._running_task_ids
+    async with db_sessionmaker() as db:
+        result = await CrawlerTriggerService(db).execute_task(task_id)
+    assert result['status'] == 'completed'
+    assert task_id not in crawler_trigger._running_task_ids
+    assert CrawlerFlaky.processed == [f"firm-{i}" for i in range(30, FIRM_COUNT)]
+
+    async with db_sessionmaker() as db:
+        task = await db.get(Task, task_id)
+        assert task.status == TaskStatus.COMPLETED
+        assert task.result_info['resumed'] is True
+        assert task.result_info['checkpoint'] == {'frontier': FIRM_COUNT, 'done': FIRM_COUNT, 'failed': 0, 'pending': 0}
+        assert (await db.execute(select(func.count()).select_from(Company))).scalar() == FIRM_COUNT
+
+
+@pytest.mark.asyncio
+async def test_resume_refetches_items_of_failed_batch_commit(db_sessionmaker, monkeypatch):
+    commit_batch = DataStorageService._commit_batch
+    calls = 0
+
+    async def commit_failing_once(db, *args):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await db.rollback()
+            raise OperationalError('COMMIT', {}, Exception('disk I/O error'))
+        return await commit_batch(db, *args)
+
+    monkeypatch.setattr(DataStorageService, '_commit_batch', staticmethod(commit_failing_once))
+    monkeypatch.setattr(CrawlerFlaky, 'fail_after', 32)
+    task_id = await add_task(db_sessionmaker, status=TaskStatus.IN_PROGRESS)
+    async with db_sessionmaker() as db:
+        with pytest.raises(RuntimeError):
+            await CrawlerTriggerService(db).execute_task(task_id)
+
+    async with db_sessionmaker() as db:
+        task = await db.get(Task, task_id)
+        # 第一批30家公司随提交失败回滚，标记为失败而不是完成
+        assert CrawlCheckpoint.from_dict(task.checkpoint).stats() == {'frontier': FIRM_COUNT, 'done': 0, 'failed': 30,
+                                                                       'pending': FIRM_COUNT}
+        assert (await db.execute(select(func.count()).select_from(Company))).scalar() == 0
+
+    monkeypatch.setattr(CrawlerFlaky, 'fail_after', None)
+    CrawlerFlaky.processed.clear()
+    await resume(db_sessionmaker, task_id)
+    async with db_sessionmaker() as db:
+        await CrawlerTriggerService(db).execute_task(task_id)
+    assert CrawlerFlaky.processed == [f"firm-{i}" for i in range(FIRM_COUNT)]
+    async with db_sessionmaker() as db:
+        task = await db.get(Task, task_id)
+        assert task.result_info['checkpoint'] == {'frontier': FIRM_COUNT, 'done': FIRM_COUNT, 'failed': 0, 'pending': 0}
+        assert (await db.execute(select(func.count()).select_from(Company))).scalar() == FIRM_COUNT
+
+
+@pytest.mark.asyncio
+async def test_concurrent_resume_claims_task_once(db_sessionmaker):
+    task_id = await add_task(db_sessionmaker, checkpoint=CrawlCheckpoint(['a']).to_dict())
+    outcomes = await asyncio.gather(*(resume(db_sessionmaker, task_id) for _ in range(3)), return_exceptions=True)
+    assert sum(isinstance(outcome, Task) for outcome in outcomes) == 1
+    # PostgreSQL上其余请求等待第一个UPDATE提交后匹配不到行；SQLite上并发写事务直接失败（database is locked）
+    assert all(isinstance(outcome, (Task, ValueError, OperationalError)) for outcome in outcomes), outcomes
+
+
+@pytest.mark.asyncio
+async def test_resume_rejects_running_task_of_other_process(db_sessionmaker):
+    task_id = await add_task(db_sessionmaker, status=TaskStatus.IN_PROGRESS, checkpoint=CrawlCheckpoint(['a']).to_dict())
+    # 不在本进程的_running_task_ids中，但断点刚刚保存过
+    with pytest.raises(ValueError, match="正在执行中"):
+        await resume(db_sessionmaker, task_id)
+
+
+@pytest.mark.asyncio
+async def test_resume_accepts_stale_in_progress_task(db_sessionmaker):
+    stale = int(time.time()) - settings.TASK_STALE_SECONDS - 1
+    task_id = await add_task(db_sessionmaker, status=TaskStatus.IN_PROGRESS, update_date=stale,
+                             checkpoint=CrawlCheckpoint(['a']).to_dict())
+    task = await resume(db_sessionmaker, task_id)
+    assert task.status == TaskStatus.IN_PROGRESS
+    assert task.update_date > stale
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('values, message', [
+    ({'status': TaskStatus.COMPLETED, 'checkpoint': {'frontier': ['a']}}, "已完成"),
+    ({'status': TaskStatus.FAILED, 'checkpoint': None}, "没有可用的断点"),
+])
+async def test_resume_rejects_unresumable_task(db_sessionmaker, values, message):
+    task_id = await add_task(db_sessionmaker, **values)
+    with pytest.raises(ValueError, match=message):
+        await resume(db_sessionmaker, task_id)
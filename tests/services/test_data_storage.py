@@ -0,0 +1,239 @@
+import copy
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from app.models.data_model import CRAWL_META_KEY, Company, CrawlFingerprint, Lawyer, StorageReject
+from app.services.data_storage import DataStorageService
+
+SOURCE = 'test_source'
+
+
+def make_companies(count: int = 12, lawyers: int = 3, variant: int = 0) -> list:
+    """模拟爬虫产出：每家公司带律师列表与爬取元信息，末尾追加一条同批次内的重复公司"""
+    companies = []
+    for i in range(count):
+        companies.append({
+            'name': f"Firm {i}",
+            'domains': f"firm{i}.example",
+            'company_address': f"{i} High Street" if i % 3 else None,
+            'company_phone': f"0{i}-{variant}",
+            'areas_of_law': ['Conveyancing', f"Area {variant}"],
+            'total_solicitors': lawyers,
+            'source_name': SOURCE,
+            'lawyers': [{
+                'name': f"Solicitor {i}-{j}",
+                'email_addresses': f"s{i}.{j}@firm{i}.example",
+                'telephone': f"{variant}{j}" if j else None,
+                'source_name': SOURCE
+            } for j in range(lawyers)],
+            CRAWL_META_KEY: {'item_key': f"firm-{i}", 'fingerprint': f"fp-{i}-{variant}"}
+        })
+    duplicate = copy.deepcopy(companies[1])
+    duplicate['company_phone'] = f"dup-{variant}"
+    duplicate['lawyers'] = duplicate['lawyers'][:1] + [{'name': 'Solicitor new', 'source_name': SOURCE}]
+    companies.append(duplicate)
+    return companies
+
+
+async def dump_tables(sessionmaker) -> tuple:
+    """与主键、写入时间无关的表内容"""
+    async with sessionmaker() as db:
+        companies = sorted(
+            (row.domains, row.name, row.company_phone, row.company_address, tuple(row.areas_of_law or []),
+             row.total_solicitors)
+            for row in (await db.execute(select(Company))).scalars()
+        )
+        lawyers = sorted(
+            (domains, row.name, row.email_addresses, row.telephone)
+            for row, domains in await db.execute(select(Lawyer, Company.domains).join(Company, Lawyer.company_id == Company.id))
+        )
+        fingerprints = sorted(
+            (row.item_key, row.fingerprint) for row in (await db.execute(select(CrawlFingerprint))).scalars()
+        )
+    return companies, lawyers, fingerprints
+
+
+async def load_rejects(sessionmaker) -> list:
+    async with sessionmaker() as db:
+        return [
+            (row.record_type, row.record_name, row.error)
+            for row in (await db.execute(select(StorageReject).order_by(StorageReject.id))).scalars()
+        ]
+
+
+async def save(sessionmaker, companies: list, storage_mode: str, batch_size: int = 5) -> dict:
+    async with sessionmaker() as db:
+        return await DataStorageService.save_crawled_data(
+            db, SOURCE, companies=companies, batch_size=batch_size, storage_mode=storage_mode
+        )
+
+
+@pytest.mark.asyncio
+async def test_storage_modes_write_identical_rows(make_db_sessionmaker):
+    dumps = {}
+    for storage_mode in ('row', 'bulk', 'copy'):
+        sessionmaker = await make_db_sessionmaker(storage_mode)
+        first = await save(sessionmaker, make_companies(variant=0), storage_mode)
+        second = await save(sessionmaker, make_companies(variant=1), storage_mode)
+        # SQLite不支持COPY，copy退回bulk
+        assert first['storage_mode'] == ('row' if storage_mode == 'row' else 'bulk')
+        assert (first['company_success'], first['company_failed']) == (13, 0)
+        assert (first['lawyer_success'], first['lawyer_failed']) == (38, 0)
+        assert (second['company_new'], second['lawyer_new']) == (0, 0)
+        dumps[storage_mode] = await dump_tables(sessionmaker)
+
+    companies, lawyers, fingerprints = dumps['row']
+    assert len(companies) == 12
+    assert len(lawyers) == 37
+    assert fingerprints == [(f"firm-{i}", f"fp-{i}-1") for i in sorted(range(12), key=str)]
+    assert dumps['bulk'] == dumps['row']
+    assert dumps['copy'] == dumps['row']
+
+
+def with_cross_key_duplicate(companies: list) -> list:
+    """Firm 2搬到新地址（按domains匹配已有公司），另追加一条domains不同、仍为旧地址的分所记录（按(name, company_address)
+    匹配同一家公司）：两条记录在批次内没有相同的键，入库时解析到同一家已有公司，且带有同名的新律师"""
+    moved = companies[2]
+    branch = copy.deepcopy(moved)
+    moved['company_address'] = '2 New Street'
+    moved['lawyers'].append({'name': 'Solicitor joined', 'telephone': 'moved', 'source_name': SOURCE})
+    branch['domains'] = 'firm2-branch.example'
+    branch['company_phone'] = f"branch-{branch['company_phone']}"
+    branch['lawyers'] = [{'name': 'Solicitor 2-0', 'telephone': 'branch', 'source_name': SOURCE},
+                         {'name': 'Solicitor joined', 'email_addresses': 'joined@firm2.example', 'source_name': SOURCE}]
+    branch[CRAWL_META_KEY] = {'item_key': 'firm-2-branch', 'fingerprint': 'fp-branch'}
+    return companies + [branch]
+
+
+@pytest.mark.asyncio
+async def test_copy_mode_matches_bulk_on_postgres(make_pg_sessionmaker):
+    dumps = {}
+    results = {}
+    # row模式逐条写入，后一条记录匹配的是前一条更新后的公司，此场景下与bulk不同，不参与比较
+    for storage_mode in ('bulk', 'copy'):
+        sessionmaker = await make_pg_sessionmaker()
+        await save(sessionmaker, make_companies(variant=0), storage_mode)
+        results[storage_mode] = await save(sessionmaker, with_cross_key_duplicate(make_companies(variant=1)), storage_mode)
+        # copy失败时会退回bulk写入，storage_mode随之改为bulk
+        assert results[storage_mode]['storage_mode'] == storage_mode
+        dumps[storage_mode] = await dump_tables(sessionmaker)
+
+    companies, lawyers, _ = dumps['bulk']
+    assert len(companies) == 12
+    assert [row[:4] for row in companies if row[1] == 'Firm 2'] == [
+        ('firm2-branch.example', 'Firm 2', 'branch-02-1', '2 High Street')
+    ]
+    # 两条记录合并到同一公司，同名律师只有一行
+    firm2 = [row for row in lawyers if row[0] == 'firm2-branch.example']
+    assert sorted(row[1:] for row in firm2) == [
+        ('Solicitor 2-0', 's2.0@firm2.example', 'branch'), ('Solicitor 2-1', 's2.1@firm2.example', '11'),
+        ('Solicitor 2-2', 's2.2@firm2.example', '12'), ('Solicitor joined', 'joined@firm2.example', 'moved')
+    ]
+    assert dumps['copy'] == dumps['bulk']
+    counters = ('company_success', 'company_new', 'company_update', 'company_skipped',
+                'lawyer_success', 'lawyer_new', 'lawyer_update', 'lawyer_skipped')
+    assert {key: results['copy'][key] for key in counters} == {key: results['bulk'][key] for key in counters}
+    assert sorted(results['copy']['saved_items']) == sorted(results['bulk']['saved_items'])
+
+
+@pytest.mark.asyncio
+async def test_bulk_mode_does_not_modify_input(db_sessionmaker):
+    companies = make_companies()
+    snapshot = copy.deepcopy(companies)
+    await save(db_sessionmaker, companies, 'bulk')
+    assert companies == snapshot
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('storage_mode', ['row', 'bulk'])
+async def test_failed_records_are_rejected_without_losing_the_batch(db_sessionmaker, storage_mode):
+    companies = make_companies()
+    companies[4]['unknown_field'] = 1
+    companies[7]['lawyers'][0]['unknown_field'] = 1
+    result = await save(db_sessionmaker, companies, storage_mode)
+
+    assert (result['company_success'], result['company_failed']) == (12, 1)
+    # 失败公司的3名律师及1名字段错误的律师
+    assert (result['lawyer_success'], result['lawyer_failed']) == (34, 4)
+    rejects = await load_rejects(db_sessionmaker)
+    assert [(record_type, name) for record_type, name, _ in rejects] == [('company', 'Firm 4'), ('lawyer', 'Solicitor 7-0')]
+    assert all('unknown_field' in error for _, _, error in rejects)
+
+    companies, lawyers, fingerprints = await dump_tables(db_sessionmaker)
+    assert 'Firm 4' not in {company[1] for company in companies}
+    assert len(companies) == 11
+    assert sorted(name for domains, name, _, _ in lawyers if domains == 'firm7.example') == ['Solicitor 7-1', 'Solicitor 7-2']
+    # 有记录失败的公司不记录指纹，下次增量爬取仍会处理
+    assert {key for key, _ in fingerprints} == {f"firm-{i}" for i in range(12)} - {'firm-4', 'firm-7'}
+    assert sorted(result['failed_items']) == ['firm-4', 'firm-7']
+    assert set(result['saved_items']) == {f"firm-{i}" for i in range(12)} - {'firm-4', 'firm-7'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('storage_mode', ['row', 'bulk'])
+async def test_failed_commit_is_not_counted_as_saved(db_sessionmaker, storage_mode):
+    async with db_sessionmaker() as db:
+        commit = db.commit
+        calls = 0
+
+        async def commit_failing_once():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise OperationalError('COMMIT', {}, Exception('disk I/O error'))
+            await commit()
+
+        db.commit = commit_failing_once
+        result = await DataStorageService.save_crawled_data(
+            db, SOURCE, companies=make_companies(), batch_size=5, storage_mode=storage_mode
+        )
+
+    companies, lawyers, _ = await dump_tables(db_sessionmaker)
+    rejects = await load_rejects(db_sessionmaker)
+    if storage_mode == 'bulk':
+        # 批量写入提交失败后回滚该批次并逐条重写，数据不丢失
+        assert (result['company_success'], result['company_failed']) == (13, 0)
+        assert (len(companies), len(lawyers), rejects) == (12, 37, [])
+        assert (set(result['saved_items']), result['failed_items']) == ({f"firm-{i}" for i in range(12)}, [])
+        return
+
+    # 第一批5家公司随提交失败回滚，计为失败并记入storage_reject，之后的批次照常写入
+    assert (result['company_success'], result['company_failed']) == (8, 5)
+    assert (result['lawyer_success'], result['lawyer_failed']) == (23, 15)
+    assert result['batches_committed'] == 2
+    assert [name for _, name, _ in rejects] == [f"Firm {i}" for i in range(5)]
+    assert all('disk I/O error' in error for _, _, error in rejects)
+    assert sorted(company[1] for company in companies) == sorted(['Firm 1'] + [f"Firm {i}" for i in range(5, 12)])
+    # 回滚批次中的条目计为失败，批次内重复的Firm 1在后续批次中写入
+    assert result['failed_items'] == [f"firm-{i}" for i in range(5)]
+    assert result['saved_items'] == [f"firm-{i}" for i in range(5, 12)] + ['firm-1']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('storage_mode', ['row', 'bulk'])
+async def test_unchanged_rows_skip_update(db_sessionmaker, storage_mode):
+    # 不含批次内重复公司：重复公司在bulk模式下先合并再比较row_hash，跳过计数与row模式不同
+    await save(db_sessionmaker, make_companies()[:-1], storage_mode)
+    async with db_sessionmaker() as db:
+        for model in (Company, Lawyer):
+            for row in (await db.execute(select(model))).scalars():
+                row.update_date = 1
+        await db.commit()
+
+    result = await save(db_sessionmaker, make_companies()[:-1], storage_mode)
+    assert (result['company_skipped'], result['company_update'], result['company_new']) == (12, 12, 0)
+    assert (result['lawyer_skipped'], result['lawyer_update'], result['lawyer_new']) == (36, 36, 0)
+
+    changed = make_companies()[:-1]
+    changed[3]['company_phone'] = 'changed'
+    changed[5]['lawyers'][1]['telephone'] = 'changed'
+    result = await save(db_sessionmaker, changed, storage_mode)
+    assert (result['company_skipped'], result['company_update']) == (11, 12)
+    assert (result['lawyer_skipped'], result['lawyer_update']) == (35, 36)
+
+    async with db_sessionmaker() as db:
+        touched = {row.name: row.company_phone for row in (await db.execute(select(Company).where(Company.update_date != 1))).scalars()}
+        touched_lawyers = {row.name: row.telephone for row in (await db.execute(select(Lawyer).where(Lawyer.update_date != 1))).scalars()}
+    # 内容未变化的行不发出UPDATE，update_date保持不变
+    assert touched == {'Firm 3': 'changed'}
+    assert touched_lawyers == {'Solicitor 5-1': 'changed'}